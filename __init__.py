@@ -1,5 +1,6 @@
 # Basic
 import os, sys, json, logging
+import multiprocessing as mp
 
 # Flask
 from flask import Flask, Blueprint
@@ -63,7 +64,9 @@ def init_flask():
     # initialize logger
     with open( os.environ[ENV_CONF_KEY], 'r' ) as f:
         data = json.load(f)
-        config_logger(log_name=data["LOGGER"], write_mode='a', level='debug', clear_log=True)
+        # The worker process of the task imports this package again, it appends to the log of the web service
+        config_logger(log_name=data["LOGGER"], write_mode='a', level='debug', 
+            clear_log=(mp.current_process().name == "MainProcess"))
 
     # initialize flask
     app = Flask(__name__)
@@ -0,0 +1,140 @@
+import time, logging, threading
+from collections import deque
+
+# Define Key of the statistic
+INFLIGHT    = "inflight"
+THROUGHPUT  = "throughput"
+LATENCY     = "latency"
+BLOCKED     = "blocked"
+COMPLETED   = "completed"
+
+STATS_WINDOW = 2        # seconds
+
+
+class InferRequest():
+    """ One frame which is in flight """
+
+    def __init__(self, frame) -> None:
+        self.frame      = frame
+        self.result     = None
+        self.error      = None
+        self.t_submit   = time.time()
+        self.t_done     = None
+        self.event      = threading.Event()
+
+    def get_latency(self) -> float:
+        return ((self.t_done or time.time()) - self.t_submit) * 1000
+
+
+class InferQueue():
+    """ The inference request of the task, it runs the inference of one frame in a worker thread
+    while the next frame is captured, and the result belongs to the submitted frame.
+
+    The frame is submitted by `submit` which blocks if the previous request is still in flight,
+    and the result is taken by `wait`. The AI model object is called in sync mode,
+    so the pooled model could be shared with other tasks and cached after the task stops.
+
+    - Arguments
+        - trg
+            - type: object
+            - desc: the AI model object
+    """
+    def __init__(self, trg) -> None:
+
+        self.trg        = trg
+        self.requests   = deque()
+        self.cond       = threading.Condition()
+        self.inflight   = 0
+        self.is_stop    = False
+
+        # Statistic of the window
+        self.completed  = 0
+        self.latency    = deque(maxlen=100)
+        self.t_window   = time.time()
+        self.n_window   = 0
+        self.t_blocked  = 0
+        self.throughput = 0
+        self.blocked    = 0
+
+        self.worker = threading.Thread(target=self.worker_thread, daemon=True)
+        self.worker.start()
+
+    def submit(self, frame) -> InferRequest:
+        """ Submit the frame, block until the previous request is done """
+        req = InferRequest(frame)
+        t1 = time.time()
+        with self.cond:
+            while self.inflight > 0 and not self.is_stop:
+                self.cond.wait(0.1)
+            if self.is_stop:
+                raise RuntimeError('Inference queue is stopped')
+            self.t_blocked += time.time() - t1
+            self.inflight += 1
+            self.requests.append(req)
+            self.cond.notify_all()
+        return req
+
+    def wait(self, req, timeout=None):
+        """ Wait for the result of the request """
+        if not req.event.wait(timeout):
+            raise TimeoutError('Inference request timeout')
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def worker_thread(self):
+        while True:
+            with self.cond:
+                while not self.requests and not self.is_stop:
+                    self.cond.wait()
+                if self.is_stop:
+                    break
+                req = self.requests.popleft()
+
+            try:
+                req.result = self.trg.inference(req.frame)
+            except Exception as e:
+                req.error = e
+
+            req.t_done = time.time()
+            with self.cond:
+                self.inflight -= 1
+                self.completed += 1
+                self.n_window += 1
+                self.latency.append(req.get_latency())
+                self.update_window()
+                self.cond.notify_all()
+            req.event.set()
+
+        logging.info('Stop the inference queue')
+
+    def update_window(self):
+        """ Measure the throughput and the ratio of time the submitter waits, called with the lock """
+        t_now = time.time()
+        t_window = t_now - self.t_window
+        if t_window < STATS_WINDOW:
+            return
+        self.throughput = self.n_window / t_window
+        self.blocked = min(self.t_blocked / t_window, 1)
+        self.t_window, self.n_window, self.t_blocked = t_now, 0, 0
+
+    def stop(self):
+        """ Stop the worker, the request which is not started gets an error """
+        with self.cond:
+            self.is_stop = True
+            requests, self.requests = list(self.requests), deque()
+            self.cond.notify_all()
+
+        for req in requests:
+            req.error = RuntimeError('Inference queue is stopped')
+            req.event.set()
+
+    def get_stats(self) -> dict:
+        latency = list(self.latency)
+        return {
+            INFLIGHT    : self.inflight,
+            COMPLETED   : self.completed,
+            THROUGHPUT  : round(self.throughput, 3),
+            BLOCKED     : round(self.blocked, 3),
+            LATENCY     : round(sum(latency) / len(latency), 3) if latency else 0
+        }
@@ -0,0 +1,141 @@
+import time, logging, threading
+
+# Define Status of the load
+QUEUED      = "queued"
+LOADING     = "loading"
+READY       = "ready"
+ERROR       = "error"
+
+# Define Key of the statistic
+STATUS      = "status"
+DEVICE      = "device"
+ELAPSED     = "elapsed"
+LIMIT       = "limit"
+TASKS       = "tasks"
+
+
+class LoadJob():
+    """ The loading of one task """
+
+    def __init__(self, task_uuid, device, on_progress=None) -> None:
+        self.task_uuid  = task_uuid
+        self.device     = device
+        self.on_progress= on_progress
+        self.status     = QUEUED
+        self.t_start    = time.time()
+        self.t_done     = None
+        self.done       = threading.Event()
+
+    def get_info(self) -> dict:
+        return {
+            STATUS  : self.status,
+            DEVICE  : self.device,
+            ELAPSED : round((self.t_done or time.time()) - self.t_start, 3)
+        }
+
+
+class DeviceSlot():
+    """ The context which holds one loading slot of the device """
+
+    def __init__(self, semaphore, on_enter=None) -> None:
+        self.semaphore  = semaphore
+        self.on_enter   = on_enter
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        if self.on_enter is not None:
+            self.on_enter()
+        return self
+
+    def __exit__(self, *args):
+        self.semaphore.release()
+
+
+class ModelLoader():
+    """ Load the AI models in background threads, the loads of different tasks run in parallel,
+    but the number of the loads on the same device is limited.
+
+    - Arguments
+        - limit
+            - type: int
+            - desc: the maximum number of the models loading on the same device at the same time
+    """
+    def __init__(self, limit=1) -> None:
+        self.limit      = max(1, int(limit))
+        self.jobs       = dict()
+        self.semaphores = dict()
+        self.lock       = threading.Lock()
+
+    def get_semaphore(self, device):
+        with self.lock:
+            if not (device in self.semaphores):
+                self.semaphores[device] = threading.Semaphore(self.limit)
+            return self.semaphores[device]
+
+    def limit_device(self, device, task_uuid=None):
+        """ Return a context which waits for the free slot of the device, used to wrap the real loading """
+        return DeviceSlot(self.get_semaphore(device), 
+            on_enter = lambda: self.update(task_uuid, LOADING))
+
+    def update(self, task_uuid, status):
+        job = self.jobs.get(task_uuid)
+        if job is None:
+            return
+        job.status = status
+        if job.on_progress is not None:
+            job.on_progress(task_uuid, job.get_info())
+
+    def submit(self, task_uuid, device, load_func, on_done, on_progress=None):
+        """
+        Load the model in a background thread.
+
+        - Arguments
+            - load_func
+                - type: function
+                - desc: return the model object
+            - on_done
+                - type: function
+                - desc: receive ( task_uuid, model, error ), the error is None if success
+            - on_progress
+                - type: function
+                - desc: receive ( task_uuid, info ) when the status is changed
+        """
+        with self.lock:
+            if self.is_loading(task_uuid):
+                raise RuntimeError('The AI model of the task ({}) is loading'.format(task_uuid))
+            job = self.jobs[task_uuid] = LoadJob(task_uuid, device, on_progress)
+
+        def load_thread():
+            trg, err = None, None
+            try:
+                trg = load_func()
+                job.t_done = time.time()
+                self.update(task_uuid, READY)
+            except Exception as e:
+                logging.exception(e)
+                err = e
+                job.t_done = time.time()
+                self.update(task_uuid, ERROR)
+            finally:
+                on_done(task_uuid, trg, err)
+                job.done.set()
+                logging.info('Finish loading the AI model of the task ({}, {:.3f}s)'.format(
+                    task_uuid, job.t_done - job.t_start))
+
+        self.update(task_uuid, QUEUED)
+        threading.Thread(target=load_thread, name=f"load-{task_uuid}", daemon=True).start()
+
+    def is_loading(self, task_uuid) -> bool:
+        job = self.jobs.get(task_uuid)
+        return (job is not None) and (not job.done.is_set())
+
+    def wait(self, task_uuid, timeout=None) -> bool:
+        """ Wait for the loading of the task, return False if timeout """
+        job = self.jobs.get(task_uuid)
+        return True if job is None else job.done.wait(timeout)
+
+    def get_stats(self) -> dict:
+        return {
+            LIMIT   : self.limit,
+            TASKS   : { task_uuid: job.get_info() for task_uuid, job in self.jobs.items() }
+        }
@@ -0,0 +1,224 @@
+import os, time, json, hashlib, logging, threading
+from collections import OrderedDict
+
+# Define Key of the statistic
+HOLDERS     = "holders"
+LOAD_TIME   = "load_time"
+SIZE        = "size"
+MODELS      = "models"
+CACHE       = "cache"
+HITS        = "hits"
+MISSES      = "misses"
+EVICTIONS   = "evictions"
+HIT_RATE    = "hit_rate"
+BUDGET      = "budget"
+
+MB          = 1024 * 1024
+
+# The name of batch inference function in the AI model object
+BATCH_FUNC  = "inference_batch"
+
+
+def get_model_size(model_path) -> int:
+    """ Estimate the memory of the loaded model by the files with the same name, e.g. the .xml and .bin of IR model """
+    if not os.path.isfile(model_path):
+        return 0
+    model_dir, model_name = os.path.split(os.path.abspath(model_path))
+    stem = os.path.splitext(model_name)[0]
+    return sum([ os.path.getsize(os.path.join(model_dir, name)) 
+        for name in os.listdir(model_dir) if os.path.splitext(name)[0] == stem ])
+
+
+class PoolEntry():
+    """ One loaded AI model object and the tasks which hold it """
+
+    def __init__(self, key, trg, load_time=0, size=0) -> None:
+        self.key        = key
+        self.trg        = trg
+        self.holders    = set()
+        self.cond       = threading.Condition()
+        self.inflight   = 0
+        self.load_time  = load_time
+        self.size       = size
+
+
+class PooledModel():
+    """ The proxy of the shared AI model object for each task.
+
+    The inference is serialized between tasks,
+    and `release` only drops the reference of the task, the model is released by the last one.
+    """
+    def __init__(self, pool, entry, task_uuid) -> None:
+        self.pool       = pool
+        self.entry      = entry
+        self.task_uuid  = task_uuid
+
+    def __getattr__(self, name):
+        # The batch inference is serialized with `inference`, it is only provided if the model has it
+        if name == BATCH_FUNC:
+            func = getattr(self.entry.trg, name)
+            return lambda *args, **kwargs: self.run(func, *args, **kwargs)
+        return getattr(self.entry.trg, name)
+
+    def run(self, func, *args, **kwargs):
+        """ Call the function of the model object, the calls of the tasks are serialized """
+        entry = self.entry
+        with entry.cond:
+            while entry.inflight > 0:
+                entry.cond.wait()
+            entry.inflight += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with entry.cond:
+                entry.inflight -= 1
+                entry.cond.notify_all()
+
+    def inference(self, *args, **kwargs):
+        return self.run(self.entry.trg.inference, *args, **kwargs)
+
+    def set_async_mode(self):
+        """ The model object is kept in sync mode, so it could be shared and cached for other tasks,
+        the task overlaps the inference with the capture by its own request instead, e.g. InferQueue """
+        logging.warning('The pooled model keeps sync mode')
+
+    def release(self):
+        self.pool.release(self.entry, self.task_uuid)
+
+
+class ModelPool():
+    """ Share the loaded AI model object between tasks with the same ( model_path, device, framework, config ).
+
+    The model which is not held by any task is kept in a LRU cache until the memory budget is exceeded,
+    so restarting a task doesn't have to load the model again.
+
+    - Arguments
+        - budget
+            - type: int
+            - desc: the memory budget of the cache in MB, set 0 to release the model immediately
+    """
+    def __init__(self, budget=0) -> None:
+        self.entries    = dict()
+        self.loading    = dict()
+        self.idle       = OrderedDict()
+        self.budget     = max(0, budget) * MB
+        self.lock       = threading.Lock()
+
+        self.hits       = 0
+        self.misses     = 0
+        self.evictions  = 0
+
+    @staticmethod
+    def get_key(model_path, device, framework, model_conf=None) -> tuple:
+        """ The model object is loaded with the config, so the different config will get a different model """
+        digest = hashlib.md5(json.dumps(model_conf, sort_keys=True, default=str).encode()).hexdigest()[:8]
+        return ( model_path, device, framework, digest )
+
+    def find_entry(self, key):
+        """ Find the entry which could be shared """
+        entries = self.entries.get(key)
+        return entries[0] if entries else None
+
+    def find_idle(self, key):
+        """ Pop the idle entry from the cache """
+        for entry in self.idle:
+            if entry.key == key:
+                self.idle.pop(entry)
+                self.entries.setdefault(key, []).append(entry)
+                return entry
+        return None
+
+    def get_idle_size(self) -> int:
+        return sum([ entry.size for entry in self.idle ])
+
+    def acquire(self, task_uuid, key, load_func) -> PooledModel:
+        """ Return the shared model, `load_func` is called to load a new one if not exist """
+        while True:
+            with self.lock:
+                entry = self.find_entry(key) or self.find_idle(key)
+                if entry is not None:
+                    entry.holders.add(task_uuid)
+                    self.hits += 1
+                    logging.info('Share the AI model {} with {}'.format(key, entry.holders))
+                    return PooledModel(self, entry, task_uuid)
+
+                # Wait for the same model which is loading by other task
+                event = self.loading.get(key)
+                if event is None:
+                    self.loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            event.wait()
+
+        try:
+            t_load = time.time()
+            trg = load_func()
+            entry = PoolEntry(key, trg, time.time() - t_load, get_model_size(key[0]))
+            entry.holders.add(task_uuid)
+            with self.lock:
+                self.entries.setdefault(key, []).append(entry)
+            logging.info('Load the AI model {} ({:.3f}s)'.format(key, entry.load_time))
+            return PooledModel(self, entry, task_uuid)
+
+        finally:
+            with self.lock:
+                self.loading.pop(key).set()
+
+    def release(self, entry, task_uuid):
+        """ Drop the reference of the task, keep the model in cache if no task is holding it """
+        with self.lock:
+            if not (task_uuid in entry.holders):
+                return
+            entry.holders.discard(task_uuid)
+            if entry.holders:
+                return
+            self.entries[entry.key].remove(entry)
+            if not self.entries[entry.key]:
+                self.entries.pop(entry.key)
+
+            self.idle[entry] = None
+
+            # Evict the least recently used model if the budget is exceeded
+            evicted = []
+            while self.idle and ((not self.budget) or self.get_idle_size() > self.budget):
+                evicted.append(self.idle.popitem(last=False)[0])
+            self.evictions += len([ item for item in evicted if item is not entry ])
+
+        for item in evicted:
+            self.release_entry(item)
+
+    def release_entry(self, entry):
+        logging.warning('Release the AI model {}'.format(entry.key))
+        with entry.cond:
+            while entry.inflight > 0:
+                entry.cond.wait()
+            entry.trg.release()
+
+    def clear(self):
+        """ Release all the idle models """
+        with self.lock:
+            evicted = list(self.idle.keys())
+            self.idle.clear()
+        for entry in evicted:
+            self.release_entry(entry)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                MODELS: {
+                    ':'.join(key): [ {
+                        HOLDERS     : list(entry.holders),
+                        LOAD_TIME   : round(entry.load_time, 3)
+                    } for entry in entries ] for key, entries in self.entries.items()
+                },
+                CACHE: {
+                    MODELS      : [ ':'.join(entry.key) for entry in self.idle ],
+                    HITS        : self.hits,
+                    MISSES      : self.misses,
+                    EVICTIONS   : self.evictions,
+                    HIT_RATE    : round(self.hits / requests, 3) if requests else 0,
+                    SIZE        : round(self.get_idle_size() / MB, 3),
+                    BUDGET      : self.budget / MB
+                }
+            }
@@ -0,0 +1,196 @@
+import time, logging, threading
+from collections import deque
+from .pool import BATCH_FUNC
+
+# Define Key of the statistic
+BATCHES     = "batches"
+FRAMES      = "frames"
+AVG_BATCH   = "avg_batch"
+EFFICIENCY  = "efficiency"
+MAX_BATCH   = "max_batch"
+MAX_WAIT    = "max_wait"
+BATCHING    = "batching"
+TASKS       = "tasks"
+
+
+def get_scheduler_key(trg) -> str:
+    """ The tasks which hold the same model object share one scheduler, the pooled model is keyed by the model pool,
+    which includes the model path, the device, the framework and the config """
+    entry = getattr(trg, "entry", None)
+    if entry is None:
+        return "{}:{}".format(type(trg).__name__, id(trg))
+    return "{}:{}".format(':'.join(entry.key), id(entry))
+
+
+class InferenceRequest():
+    """ One frame which is waiting for the result """
+
+    def __init__(self, frame) -> None:
+        self.frame  = frame
+        self.result = None
+        self.error  = None
+        self.event  = threading.Event()
+
+
+class InferenceScheduler():
+    """ Collect the frames from the tasks which share the same model into micro batches
+
+    A batch is dispatched when it reaches `max_batch`, when each registered task has one frame waiting,
+    or when the first frame waited for `max_wait` milliseconds.
+    The model without `inference_batch` does not support batching, each frame is dispatched without waiting.
+
+    - Arguments
+        - max_batch
+            - type: int
+        - max_wait
+            - type: float
+            - desc: milliseconds
+    """
+    def __init__(self, max_batch=4, max_wait=10) -> None:
+
+        self.max_batch  = max(1, int(max_batch))
+        self.max_wait   = max(0, float(max_wait)) / 1000
+        self.models     = dict()
+        self.trg        = None
+        self.requests   = deque()
+        self.cond       = threading.Condition()
+        self.run_lock   = threading.Lock()
+        self.is_stop    = False
+
+        self.batches    = 0
+        self.frames     = 0
+
+        self.worker = threading.Thread( target=self.schedule_thread, daemon=True )
+
+    def register(self, task_uuid, trg):
+        """ Register the task and its model object, the first one is used to run the batch """
+        with self.run_lock, self.cond:
+            self.models[task_uuid] = trg
+            if self.trg is None:
+                self.trg = trg
+
+        if not self.worker.is_alive():
+            self.worker.start()
+
+        return ScheduledModel(self, task_uuid)
+
+    def unregister(self, task_uuid) -> bool:
+        """ Unregister the task, return True if there is no task using the scheduler """
+        with self.run_lock, self.cond:
+            trg = self.models.pop(task_uuid, None)
+
+            # Switch to the model of other task because this one will be released
+            if trg is self.trg:
+                self.trg = next(iter(self.models.values()), None)
+
+            if not self.models:
+                self.is_stop = True
+                self.cond.notify_all()
+
+            return not self.models
+
+    def submit(self, frame, timeout=None):
+        """ Put the frame into the queue and wait for the result """
+        req = InferenceRequest(frame)
+        with self.cond:
+            if self.is_stop:
+                raise RuntimeError('Inference scheduler is stopped')
+            self.requests.append(req)
+            self.cond.notify_all()
+
+        if not req.event.wait(timeout):
+            raise TimeoutError('Inference scheduler timeout')
+
+        if req.error is not None:
+            raise req.error
+
+        return req.result
+
+    def is_batch_supported(self) -> bool:
+        return getattr(self.trg, BATCH_FUNC, None) is not None
+
+    def get_max_batch(self) -> int:
+        """ The batch size which the model could run, 1 if it does not support batching """
+        return self.max_batch if self.is_batch_supported() else 1
+
+    def get_batch(self) -> list:
+        """ Wait for the batch is ready and pop it """
+        with self.cond:
+            while not self.requests and not self.is_stop:
+                self.cond.wait(0.1)
+
+            max_batch = self.get_max_batch()
+            deadline = time.time() + self.max_wait
+            while(not self.is_stop):
+                ready = len(self.requests) >= min(max_batch, max(1, len(self.models)))
+                remain = deadline - time.time()
+                if ready or remain <= 0:
+                    break
+                self.cond.wait(remain)
+
+            size = min(max_batch, len(self.requests))
+            return [ self.requests.popleft() for _ in range(size) ]
+
+    def run_batch(self, batch):
+        with self.run_lock:
+            try:
+                batch_func = getattr(self.trg, BATCH_FUNC, None)
+                if batch_func is not None and len(batch) > 1:
+                    results = batch_func([ req.frame for req in batch ])
+                else:
+                    results = [ self.trg.inference(req.frame) for req in batch ]
+
+                for req, result in zip(batch, results):
+                    req.result = result
+
+            except Exception as e:
+                for req in batch:
+                    req.error = e
+
+        self.batches += 1
+        self.frames += len(batch)
+        [ req.event.set() for req in batch ]
+
+    def schedule_thread(self):
+        logging.info('Start the inference scheduler')
+        while(not self.is_stop):
+            batch = self.get_batch()
+            if batch:
+                self.run_batch(batch)
+
+        # Wake up the requests which are not processed
+        with self.cond:
+            for req in self.requests:
+                req.error = RuntimeError('Inference scheduler is stopped')
+                req.event.set()
+            self.requests.clear()
+
+        logging.info('Stop the inference scheduler')
+
+    def get_stats(self) -> dict:
+        avg_batch = (self.frames / self.batches) if self.batches else 0
+        supported = self.is_batch_supported()
+        return {
+            TASKS       : list(self.models.keys()),
+            BATCHING    : supported,
+            BATCHES     : self.batches,
+            FRAMES      : self.frames,
+            AVG_BATCH   : round(avg_batch, 3),
+            EFFICIENCY  : round(avg_batch / self.max_batch, 3) if supported else None,
+            MAX_BATCH   : self.max_batch,
+            MAX_WAIT    : self.max_wait * 1000 if supported else 0,
+        }
+
+
+class ScheduledModel():
+    """ Provide the same `inference` with the AI model object but submit the frame to the scheduler """
+
+    def __init__(self, scheduler, task_uuid) -> None:
+        self.scheduler = scheduler
+        self.task_uuid = task_uuid
+
+    def inference(self, frame):
+        return self.scheduler.submit(frame)
+
+    def get_stats(self) -> dict:
+        return self.scheduler.get_stats()
@@ -1,11 +1,24 @@
 from flask import abort, request
-import cv2, time, logging, base64, threading, os, sys, copy, json
+import time, logging, threading, os, sys, copy, json
 from werkzeug.utils import secure_filename
 
 from .. import sock, app, mqtt
 from ivit_i.common.pipeline import Source, Pipeline
 from ivit_i.utils.err_handler import handle_exception
 
+from ..tools.hub import SourceHub
+from ..tools.viewers import ViewerRegistry
+from ..tools.rtsp import get_sub_name
+from ..tools.mjpeg import MjpegBroadcaster
+from ..tools.frame_cache import FrameCache, EncodedFrame, FULL, THUMB
+from ..tools.capture import get_profile, negotiate_profiles, apply_profile, SCALE
+from ..tools.common import json_exception
+from ..tools.handler import get_tasks
+from ..ai.scheduler import InferenceScheduler, get_scheduler_key
+from ..ai.pool import ModelPool
+from ..ai.loader import ModelLoader
+from ..ai.get_api import get_api
+
 # Define app config key
 AF              = "AF"
 TASK_LIST       = "TASK_LIST"
@@ -48,6 +61,7 @@ RUN         = "run"
 STOP        = "stop"
 ERROR       = "error"
 STATUS      = "status"
+LOADING     = "loading"
 
 # Define Key which in app.config
 TASK        = "TASK"
@@ -60,6 +74,52 @@ SRC         = "SRC"
 OBJECT      = "object"
 TYPE        = "type"
 PROC        = "proc"
+HUB         = "hub"
+PROFILE     = "profile"
+
+# Define Key of the source hub in app.config
+HUB_RING_SIZE   = "HUB_RING_SIZE"
+FRAME_POOL_SIZE = "FRAME_POOL_SIZE"
+
+# Define Key of the inference scheduler in app.config
+INFER_SCHEDULER = "INFER_SCHEDULER"
+INFER_MAX_BATCH = "INFER_MAX_BATCH"
+INFER_MAX_WAIT  = "INFER_MAX_WAIT"
+SCHED_LOCK      = threading.Lock()
+
+# Define Key of the model pool in app.config
+MODEL_POOL      = "MODEL_POOL"
+MODEL_CACHE_BUDGET  = "MODEL_CACHE_BUDGET"
+MODEL_LOADER        = "MODEL_LOADER"
+MODEL_LOAD_LIMIT    = "MODEL_LOAD_LIMIT"
+IVIT_WS_POOL        = "IVIT_WS_POOL"
+POOL_LOCK       = threading.Lock()
+
+# Define Key of the viewer registry in app.config
+VIEWERS         = "VIEWERS"
+VIEWER_LEASE    = "VIEWER_LEASE"
+RTSP_API_URL    = "RTSP_API_URL"
+LAZY_RENDER     = "LAZY_RENDER"
+MJPEG_POOL      = "MJPEG_POOL"
+MJPEG_QUALITY   = "MJPEG_QUALITY"
+FRAME_CACHE     = "FRAME_CACHE"
+FRAME_VARIANTS  = "FRAME_VARIANTS"
+SNAPSHOT_TIMEOUT= "SNAPSHOT_TIMEOUT"
+SNAPSHOT        = "snapshot"
+LIVE            = "live"
+ANNOTATED       = "annotated"
+HEADLESS        = "headless"
+STREAM_HEADLESS = "STREAM_HEADLESS"
+
+# Define Key of the capture profile
+CAPTURE         = "capture"
+CAPTURE_PROFILE = "CAPTURE_PROFILE"
+
+# Define Key of the stream mode
+PIPELINE        = "pipeline"
+MODE            = "mode"
+STREAM_MODE     = "STREAM_MODE"
+HUB_LOCK        = threading.Lock()
 
 # Define Key which declared in each task
 FRAMEWORK   = "framework"
@@ -75,6 +135,7 @@ STATUS      = "status"
 THRES       = "thres"
 START_TIME  = "start_time"
 DETS        = "detections"
+MODEL_PATH  = "model_path"
 
 
 # Define AI Inference Parameters
@@ -186,13 +247,22 @@ def print_data(data, title='Check request data'):
     logging.debug(title)
     [ logging.debug(" - {}: {}".format(key, val)) for key, val in data.items() ]
 
-def frame2btye(frame):
+def frame2btye(frame, key=None, idx=None, variant=FULL):
     """
-    Convert the image with numpy array format to btye ( base64 )
+    Convert the image with numpy array format to btye ( base64 ), the JPEG is cached so the same frame is encoded once
 
     - Arguments
         - frame
             - type: numpy.array
+        - key
+            - type: string
+            - desc: the task or the source which the frame belongs to
+        - idx
+            - type: int
+            - desc: the frame index, None means the frame is matched by the identity of the array
+        - variant
+            - type: string
+            - desc: the quality and size of the image, e.g. full, thumb
     - Output
         - ret
             - type: dict
@@ -210,19 +280,76 @@ def frame2btye(frame):
                     - type: int
                     - desc: the orginal image channel
     """
-    ret, (h,w,c) = None, frame.shape
-    frame_base64 = base64.encodebytes(
-        cv2.imencode('.jpg', frame)[1].tobytes()
-    ).decode("utf-8")
+    return encoded2btye(get_frame_cache().get(key, frame, idx, variant))
+
+def encoded2btye(encoded):
+    """ Convert the cached JPEG to the same format of `frame2btye` """
+    (h, w, c) = encoded.shape
 
     ret = {
-        "image"     : frame_base64,
+        "image"     : encoded.to_base64(),
         "height"    : h,
         "width"     : w,
         "channel"   : c
     }
     return ret
 
+def get_snapshot(task_uuid, annotated=False, variant=FULL):
+    """ 
+    Return the latest frame of the task from the live source hub without opening the source again,
+    the stopped source returns the cached thumbnail.
+
+    - Arguments
+        - task_uuid
+            - type: string
+        - annotated
+            - type: bool
+            - desc: wait for the next frame which is rendered by the running task, the raw frame is returned in headless mode
+        - variant
+            - type: string
+            - desc: the variant of the raw frame, the annotated frame is the MJPEG frame of the task
+    - Output
+        - encoded
+            - type: EncodedFrame
+            - desc: None if there is no frame
+        - info
+            - type: dict
+            - desc: { "live": bool, "annotated": bool }
+    """
+    src_name = app.config[TASK][task_uuid][SOURCE]
+    cache = get_frame_cache()
+    hub = app.config[SRC][src_name].get(HUB)
+
+    # The stopped source only returns the cached one, the thumbnail is preferred
+    seq, buf = hub.get_latest(with_seq=True) if (hub is not None) and hub.is_running() else (None, None)
+    if buf is None:
+        return cache.peek(src_name, [ THUMB, variant, FULL ]), { LIVE: False, ANNOTATED: False }
+
+    try:
+        # Keep the thumbnail for the time the source is stopped, it is encoded once per frame
+        idx = (id(hub), seq)
+        cache.get(src_name, buf.array, idx, THUMB)
+        encoded = cache.get(src_name, buf.array, idx, variant)
+        shape = buf.shape
+    finally:
+        buf.release()
+
+    if annotated and app.config[TASK][task_uuid][STATUS] == RUN and not is_headless(task_uuid):
+        # The lease keeps the lazy task rendering, so the polling client gets the next frame quickly
+        get_viewers().touch(task_uuid, SNAPSHOT)
+        jpeg = get_mjpeg(task_uuid).snapshot(app.config[SNAPSHOT_TIMEOUT])
+        if jpeg is not None:
+            return EncodedFrame(None, None, jpeg, shape), { LIVE: True, ANNOTATED: True }
+
+    return encoded, { LIVE: True, ANNOTATED: False }
+
+def get_frame_cache():
+    """ Return the encoded frame cache in app.config, create it at the first time """
+    with POOL_LOCK:
+        if app.config.get(FRAME_CACHE) is None:
+            app.config[FRAME_CACHE] = FrameCache(variants=app.config[FRAME_VARIANTS])
+        return app.config[FRAME_CACHE]
+
 def stop_task_thread(task_uuid, err=''):
     """ Stop Task Thread Event 
     ---
@@ -234,9 +361,27 @@ def stop_task_thread(task_uuid, err=''):
     app.config[TASK][task_uuid][STATUS] = STOP if err=='' else ERROR
     app.config[TASK][task_uuid][ERROR] = err
 
+def get_capture_profile(src_name):
+    """ 
+    Negotiate the capture profile of the source, each value is the maximum one which the tasks sharing the source need
+
+    - Arguments
+        - src_name
+            - type: string
+    - Output
+        - profile
+            - type: dict
+            - desc: e.g. { "width": 1280, "height": 720, "fps": 30, "format": None, "scale": 1 }
+    """
+    default = app.config[CAPTURE_PROFILE]
+    profiles = [ get_profile(app.config[TASK][uuid][CONFIG].get(CAPTURE), default) 
+        for uuid in app.config[SRC][src_name][PROC] 
+            if (uuid in app.config[TASK]) and (app.config[TASK][uuid].get(CONFIG) is not None) ]
+    return negotiate_profiles(profiles, default)
+
 def get_src(task_uuid, reload_src=False):
     """ 
-    Setup the source object and run 
+    Setup the source object and run, the camera is opened with the capture profile of the tasks sharing the source
 
     - Arguments
         - task_uuid
@@ -255,6 +400,16 @@ def get_src(task_uuid, reload_src=False):
     
     # if source is None or reload_src==True then create a new source
     src_obj = app.config[SRC][src_name][OBJECT]
+    profile = get_capture_profile(src_name)
+
+    # the source which is not running is reopened if the profile is changed
+    if ( src_obj != None ) and ( profile != app.config[SRC][src_name].get(PROFILE) ):
+        if app.config[SRC][src_name][STATUS] != RUN:
+            logging.info('Reopen the source with the new capture profile.')
+            src_obj.release()
+            reload_src = True
+        else:
+            logging.warning('The source is running, the new capture profile will be applied after it stopped.')
 
     if ( src_obj == None ) or reload_src:
         logging.info('Initialize a new source.')
@@ -263,7 +418,8 @@ def get_src(task_uuid, reload_src=False):
         app.config[SRC][src_name][OBJECT] = Pipeline(src_name, app.config[SRC][src_name][TYPE])
 
         # setup camera
-        app.config[SRC][src_name][OBJECT].set_cam(height=720, width=1280, fps=30)
+        apply_profile(app.config[SRC][src_name][OBJECT], profile)
+        app.config[SRC][src_name][PROFILE] = profile
 
         app.config[SRC][src_name][OBJECT].start()
     
@@ -278,6 +434,217 @@ def get_src(task_uuid, reload_src=False):
     # return object
     return app.config[SRC][src_name][OBJECT]
 
+def get_hub(task_uuid):
+    """ 
+    Get the source hub which decodes the source once and share frames to each task, 
+    the source object will be initialized if needed.
+
+    - Arguments
+        - task_uuid
+            - type: string
+    - Output
+        - hub
+            - type: SourceHub
+            - desc: the hub object same with app.config["SRC"][{src_name}][hub]
+    """
+    with HUB_LOCK:
+        src = get_src(task_uuid)
+        src_name = app.config[TASK][task_uuid][SOURCE]
+        hub = app.config[SRC][src_name].get(HUB)
+
+        # Create a new hub if the source is changed or the hub is stopped
+        if (hub is None) or (hub.src is not src) or (not hub.is_running()):
+            logging.info('Initialize a new source hub.')
+            hub = SourceHub(src, 
+                ring_size = app.config[HUB_RING_SIZE], 
+                pool_size = app.config[FRAME_POOL_SIZE],
+                scale     = app.config[SRC][src_name][PROFILE][SCALE] )
+            hub.start()
+            app.config[SRC][src_name][HUB] = hub
+
+        return hub
+
+def get_model_pool():
+    """ Return the model pool in app.config, create it at the first time """
+    with POOL_LOCK:
+        if app.config.get(MODEL_POOL) is None:
+            app.config[MODEL_POOL] = ModelPool(budget=app.config[MODEL_CACHE_BUDGET])
+        return app.config[MODEL_POOL]
+
+def get_model(task_uuid, model_conf):
+    """ 
+    Get the AI model object from the model pool, the tasks with the same model, device and framework share one object,
+    and the model which was released recently is taken from the cache.
+
+    - Arguments
+        - task_uuid
+            - type: string
+        - model_conf
+            - type: dict
+            - desc: the config of the task which is used to load the model if it is not in the pool
+    - Output
+        - model
+            - type: PooledModel
+            - desc: has the same usage with the AI model object, but `release` only drops the reference of the task
+    """
+    task = app.config[TASK][task_uuid]
+    af = task.get(FRAMEWORK, app.config[AF])
+    init_ai_model = get_api(af)
+    loader = get_model_loader()
+
+    # Only the model block of the config is used to load the model
+    key = ModelPool.get_key(task[MODEL_PATH], task[DEVICE], af, 
+        { TAG: model_conf.get(TAG), af: model_conf.get(af) })
+
+    # Wait for the free slot of the device if the model is not in the pool
+    def load_model():
+        with loader.limit_device(task[DEVICE], task_uuid):
+            return init_ai_model(model_conf)
+
+    return get_model_pool().acquire(task_uuid, key, load_model)
+
+def get_model_loader():
+    """ Return the model loader in app.config, create it at the first time """
+    with POOL_LOCK:
+        if app.config.get(MODEL_LOADER) is None:
+            app.config[MODEL_LOADER] = ModelLoader(limit=app.config[MODEL_LOAD_LIMIT])
+        return app.config[MODEL_LOADER]
+
+def get_viewers():
+    """ Return the viewer registry in app.config, create it at the first time """
+    with POOL_LOCK:
+        if app.config.get(VIEWERS) is None:
+            app.config[VIEWERS] = ViewerRegistry(
+                probe_url   = app.config[RTSP_API_URL], 
+                lease       = app.config[VIEWER_LEASE] )
+        return app.config[VIEWERS]
+
+def is_headless(task_uuid) -> bool:
+    """ Return True if the task runs without the video output, the runtime setting overrides the "pipeline" block """
+    headless = app.config[TASK][task_uuid].get(HEADLESS)
+    if headless is None:
+        headless = app.config[TASK][task_uuid][CONFIG].get(PIPELINE, {}).get(HEADLESS, app.config[STREAM_HEADLESS])
+    return bool(headless)
+
+def get_watch_func(task_uuid):
+    """ Return the function which checks if the output of the task is watched, None if lazy rendering is disabled """
+    if not app.config[LAZY_RENDER]:
+        return None
+    viewers = get_viewers()
+    return lambda: viewers.is_watched(task_uuid)
+
+def get_mjpeg(task_uuid):
+    """ Return the MJPEG broadcaster of the task, it is reused by the next run of the task """
+    with POOL_LOCK:
+        if app.config.get(MJPEG_POOL) is None:
+            app.config[MJPEG_POOL] = dict()
+        if app.config[MJPEG_POOL].get(task_uuid) is None:
+            app.config[MJPEG_POOL][task_uuid] = MjpegBroadcaster(quality=app.config[MJPEG_QUALITY])
+        return app.config[MJPEG_POOL][task_uuid]
+
+def get_sub_watch_func(task_uuid):
+    """ Return the function which checks if the substream of the task is watched, it works without lazy rendering """
+    viewers = get_viewers()
+    return lambda: viewers.is_watched(get_sub_name(task_uuid))
+
+def send_load_progress(task_uuid, info):
+    """ Push the progress of the model loading via IVIT_WS_POOL """
+    app.config[IVIT_WS_POOL].setdefault(LOADING, {})[task_uuid] = info
+
+def finish_load_model(task_uuid, trg, err):
+    """ Update the task after the model is loaded: keep the model and set status to stop, or set status to error """
+    task = app.config[TASK][task_uuid]
+
+    # The task was stopped while loading
+    if task[STATUS] != LOADING:
+        if trg is not None: trg.release()
+        return
+
+    if err is not None:
+        err_mesg = json_exception(err)
+        task[STATUS], task[ERROR] = ERROR, err_mesg
+        app.config[IVIT_WS_POOL].update({
+            ERROR: dict(err_mesg, uuid=task_uuid, stop_task=True)
+        })
+    else:
+        task[API] = trg
+        task[STATUS] = STOP
+    
+    with app.app_context():
+        app.config[TASK_LIST] = get_tasks()
+
+def load_model_async(task_uuid, model_conf):
+    """ 
+    Load the AI model in background and set the status of the task to loading,
+    the progress is pushed via IVIT_WS_POOL, and the status is set to stop when the model is ready.
+
+    - Arguments
+        - task_uuid
+            - type: string
+        - model_conf
+            - type: dict
+    """
+    # Set the status before submitting, the model in the pool could be ready immediately
+    prev_status = app.config[TASK][task_uuid][STATUS]
+    app.config[TASK][task_uuid][STATUS] = LOADING
+    try:
+        get_model_loader().submit( task_uuid, 
+            device      = app.config[TASK][task_uuid][DEVICE],
+            load_func   = lambda: get_model(task_uuid, model_conf), 
+            on_done     = finish_load_model,
+            on_progress = send_load_progress )
+    except Exception:
+        app.config[TASK][task_uuid][STATUS] = prev_status
+        raise
+
+def wait_model(task_uuid, timeout=None) -> bool:
+    """ Wait for the model of the task is loaded, return False if timeout """
+    return get_model_loader().wait(task_uuid, timeout)
+
+def release_model(task_uuid):
+    """ Drop the reference of the AI model which is held by the task """
+    trg = app.config[TASK][task_uuid].get(API)
+    if trg is not None:
+        trg.release()
+
+def get_scheduler(task_uuid, trg):
+    """ 
+    Register the task into the inference scheduler which collects the frames of the tasks with same model into micro batches.
+
+    - Arguments
+        - task_uuid
+            - type: string
+        - trg
+            - type: object
+            - desc: the AI model object of the task
+    - Output
+        - model
+            - type: ScheduledModel
+            - desc: provide `inference(frame)` which submits the frame to the scheduler
+    """
+    with SCHED_LOCK:
+        sched_key = get_scheduler_key(trg)
+        scheduler = app.config[INFER_SCHEDULER].get(sched_key)
+
+        if (scheduler is None) or scheduler.is_stop:
+            logging.info('Initialize a new inference scheduler ({})'.format(sched_key))
+            scheduler = InferenceScheduler(
+                max_batch   = app.config[INFER_MAX_BATCH], 
+                max_wait    = app.config[INFER_MAX_WAIT] )
+            app.config[INFER_SCHEDULER][sched_key] = scheduler
+
+        return scheduler.register(task_uuid, trg)
+
+def release_scheduler(task_uuid, trg):
+    """ Unregister the task from the inference scheduler, the scheduler is removed if no task is using it """
+    with SCHED_LOCK:
+        sched_key = get_scheduler_key(trg)
+        scheduler = app.config[INFER_SCHEDULER].get(sched_key)
+
+        if scheduler is not None and scheduler.unregister(task_uuid):
+            app.config[INFER_SCHEDULER].pop(sched_key, None)
+            logging.info('Remove the inference scheduler ({})'.format(sched_key))
+
 def stop_src(task_uuid, release=False):
     """ 
     Stop the source and release it if needed, but if the source still be accesed by process, then it won't be stopped. 
@@ -311,6 +678,11 @@ def stop_src(task_uuid, release=False):
         logging.info('Stopping source object ...')
         app.config[SRC][src_name][STATUS] = STOP
 
+        # stop the hub before the source is released
+        if app.config[SRC][src_name].get(HUB) is not None:
+            app.config[SRC][src_name][HUB].stop()
+            app.config[SRC][src_name][HUB] = None
+
         if app.config[SRC][src_name][OBJECT] != None: 
             # need release source
             if release:
@@ -323,6 +695,11 @@ def stop_src(task_uuid, release=False):
     else:
         logging.warning("Stop failed, source ({}) accessed by {} ".format(src_name, access_proc))
 
+def get_stream_mode(task_uuid):
+    """ Return the stream mode of the task, `thread` or `process` """
+    pipe_conf = app.config[TASK][task_uuid][CONFIG].get(PIPELINE, {})
+    return pipe_conf.get(MODE, app.config[STREAM_MODE])
+
 def check_uuid_in_config(uuid):
     """ Check UUID is in config """
     if app.config[TASK].__contains__(uuid):
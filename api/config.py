@@ -24,6 +24,99 @@ class config(object):
     IVIT_WS_POOL    = dict()
     INFER_WS_POOL   = dict()
 
+    STREAM_QUEUE_SIZE   = 2
+    STREAM_DROP_POLICY  = "drop_oldest"
+    HUB_RING_SIZE       = 8
+    HUB_READ_MODE       = "latest"
+    FRAME_POOL_SIZE     = 16
+    DRAW_POOL_SIZE      = 4
+
+    # The default capture profile of the source, each task could declare the "capture" block in task.json,
+    # the tasks sharing one source are negotiated to the maximum, scale downscales the frame after decoding
+    CAPTURE_PROFILE     = { "width": 1280, "height": 720, "fps": 30, "format": None, "scale": 1 }
+
+    # The pacing of each task: "max" ( as fast as possible ), "source" ( source FPS ) or "fixed" ( the target_fps in task.json )
+    STREAM_PACING       = "source"
+
+    # "thread" or "process", the task in process mode runs in a worker process,
+    # the worker is started by "spawn" or "forkserver" since forking the multithreaded web service is not safe
+    STREAM_MODE         = "thread"
+    STREAM_PROC_SLOTS   = 4
+    STREAM_PROC_METHOD  = "spawn"
+
+    # Micro batching of the tasks which share the same model, max wait is in milliseconds
+    INFER_SCHEDULER     = dict()
+    INFER_BATCHING      = False
+    INFER_MAX_BATCH     = 4
+    INFER_MAX_WAIT      = 10
+
+    # Run the detector every N frames and propagate the boxes on the other frames, "auto" fits the frame budget
+    INFER_STRIDE        = 1
+    INFER_MAX_STRIDE    = 8
+
+    # Add the track ID into each detection with the IoU tracker before the application
+    STREAM_TRACKER      = False
+
+    # Only do inference on the area_points of the application, "rect" crops the bounding rectangle of all zones
+    # and "zones" crops each zone
+    STREAM_ROI          = False
+
+    # Split the high resolution frame into the overlapped tiles and merge the results by NMS,
+    # the tile_size, tile_overlap and max_tiles could be set in the "pipeline" block of each task
+    STREAM_TILING       = False
+
+    # The loaded AI models which are shared by the tasks with the same model, device and framework,
+    # the released models are cached until the budget ( MB ) is exceeded, set 0 to disable the cache
+    MODEL_POOL          = None
+    MODEL_CACHE_BUDGET  = 1024
+
+    # The models are loaded in background, the number of loads on the same device is limited,
+    # starting the stream of a loading task waits for the timeout in seconds
+    MODEL_LOADER        = None
+    MODEL_LOAD_LIMIT    = 1
+    MODEL_LOAD_TIMEOUT  = 60
+
+    # Only render and encode the output while someone is watching, otherwise the stream is kept alive at 1 FPS,
+    # the RTSP readers are polled from the API of the RTSP server and the other endpoints take a lease in seconds
+    LAZY_RENDER         = False
+    VIEWERS             = None
+    VIEWER_LEASE        = 5
+    RTSP_API_URL        = "http://localhost:9997/v1/paths/list"
+
+    # The headless task has no RTSP output, only the results are sent, it could be switched by /task/<uuid>/headless
+    STREAM_HEADLESS     = False
+
+    # The frames waiting for the RTSP encoder, the full queue drops the oldest or the newest frame,
+    # rtsp_queue_size and rtsp_drop_policy could be set in the "pipeline" block of each task
+    RTSP_QUEUE_SIZE     = 2
+    RTSP_DROP_POLICY    = "drop_oldest"
+
+    # The "auto" encoder steps the preset, bitrate and key frame interval down when it could not keep the FPS
+    # or the CPU load is over the limit, "fixed" keeps the settings, they could be set in the "pipeline" block
+    RTSP_ENCODER        = "auto"
+    RTSP_CPU_LIMIT      = 0.85
+
+    # The low resolution substream is published to rtsp://.../<uuid>/sub and only encoded while it is watched,
+    # the bitrate is in kbps, substream, sub_scale and sub_bitrate could be set in the "pipeline" block
+    RTSP_SUBSTREAM      = False
+    RTSP_SUB_SCALE      = 0.5
+    RTSP_SUB_BITRATE    = 1024
+
+    # The MJPEG stream of /task/<uuid>/mjpeg, each frame is encoded once for all clients and only while it has clients
+    MJPEG_POOL          = None
+    MJPEG_QUALITY       = 80
+
+    # The latest JPEG of each task and source is cached and encoded once per frame for all clients,
+    # each variant has the quality and the maximum width ( None means the original size ), e.g. ?variant=thumb
+    FRAME_CACHE         = None
+    FRAME_VARIANTS      = {
+        "full"  : { "quality": 95, "width": None },
+        "thumb" : { "quality": 70, "width": 320 }
+    }
+
+    # /task/<uuid>/snapshot waits for the next annotated frame of the running task in seconds
+    SNAPSHOT_TIMEOUT    = 1
+
     MQTT_BROKER_URL = ""
     MQTT_USERNAME   = ""
     MQTT_PASSWORD   = ""
@@ -2,7 +2,7 @@ import logging, os, sys, time
 
 from flask import Blueprint, current_app
 from flasgger import swag_from
-from .common import PASS_CODE, FAIL_CODE
+from .common import PASS_CODE, FAIL_CODE, get_model_pool, get_model_loader
 from ..tools.common import http_msg
 from ..tools.handler import update_model_relation
 
@@ -100,4 +100,17 @@ def get_model_app():
         return http_msg( current_app.config[MODEL_APP_KEY], PASS_CODE)
     
     except Exception as e:
-        return http_msg(e, FAIL_CODE)
\ No newline at end of file
+        return http_msg(e, FAIL_CODE)
+
+
+@bp_model.route("/model_cache", methods=['GET'])
+@swag_from(f'{YAML_PATH}/get_model_cache.yml')
+def get_model_cache():
+
+    try:
+        stats = get_model_pool().get_stats()
+        stats["loader"] = get_model_loader().get_stats()
+        return http_msg( stats, PASS_CODE)
+    
+    except Exception as e:
+        return http_msg(e, FAIL_CODE)
@@ -1,16 +1,26 @@
-import cv2, time, logging, base64, threading, os, copy, sys, json
-from flask import Blueprint, abort, jsonify, app, request
+import time, logging, base64, threading, os, copy, sys, json
+from flask import Blueprint, abort, jsonify, app, request, Response
 from werkzeug.utils import secure_filename
 from flasgger import swag_from
 
 # Load Module from `web/api`
-from .common import frame2btye, get_src, stop_src, stop_task_thread, check_uuid_in_config
+from .common import frame2btye, get_src, get_hub, get_stream_mode, stop_src, stop_task_thread, check_uuid_in_config
+from .common import get_scheduler, release_scheduler, wait_model, get_watch_func, get_sub_watch_func, is_headless
+from .common import get_mjpeg, get_snapshot, encoded2btye
 from .common import sock, app
 from .icap import KEY_TB_STATS, send_basic_attr
 
 from ..tools.common import handle_exception, simple_exception, http_msg, json_exception
 from ..tools.handler import get_tasks
-from ..tools.parser import get_pure_jsonify
+from ..tools.parser import str_to_json
+from ..tools.capture import get_profile, apply_profile
+from ..tools.rtsp import RtspWritter, OutputWriter, Substream, is_substream_enabled, any_watched
+from ..tools.rtsp import SUB_PATH, SUB_SCALE, SUB_BITRATE
+from ..tools.encoder import get_encoder, BITRATE
+from ..tools.mjpeg import MIMETYPE
+from ..tools.frame_cache import FULL
+from ..tools.runner import StreamRunner, init_application
+from ..tools.worker import TaskProcess
 from ..ai.get_api import get_api
 
 # Get Application Module From iVIT-I
@@ -18,12 +28,6 @@ sys.path.append(os.getcwd())
 from ivit_i.common.pipeline import Source, Pipeline
 from ivit_i.utils.err_handler import InferenceError, ApplicationError
 
-# Legacy
-from ivit_i.app.handler import get_application
-
-# New
-from ivit_i.app.handler import ivitAppHandler
-
 # Define API Docs yaml
 YAML_PATH   = ""
 BP_NAME     = "stream"
@@ -36,12 +40,14 @@ RUN         = "run"
 STOP        = "stop"
 ERROR       = "error"
 STATUS      = "status"
+LOADING     = "loading"
 
 # Define Key which in app.config
 TASK        = "TASK"
 TASK_LIST   = "TASK_LIST"
 UUID        = "UUID"
 APP_DIR     = "APP_DIR"
+MODEL_LOAD_TIMEOUT  = "MODEL_LOAD_TIMEOUT"
 
 TAG         = "tag"
 
@@ -50,6 +56,7 @@ SRC         = "SRC"
 OBJECT      = "object"
 TYPE        = "type"
 PROC        = "proc"
+HUB         = "hub"
 
 # Define Key which declared in each task
 AF = FRAMEWORK   = "framework"
@@ -74,6 +81,58 @@ DRAW_TOOLS  = "draw_tools"
 PALETTE     = "palette"
 FRAME_IDX   = "frame_index"
 STREAM      = "stream"
+PERF        = "perf"
+
+# Define Stream Pipeline Parameters
+PIPELINE            = "pipeline"
+QUEUE_SIZE          = "queue_size"
+DROP_POLICY         = "drop_policy"
+READ_MODE           = "read_mode"
+HUB_READ_MODE       = "HUB_READ_MODE"
+STREAM_QUEUE_SIZE   = "STREAM_QUEUE_SIZE"
+STREAM_DROP_POLICY  = "STREAM_DROP_POLICY"
+RESULT              = "result"
+DRAW_POOL_SIZE      = "DRAW_POOL_SIZE"
+PROCESS             = "process"
+STREAM_PROC_SLOTS   = "STREAM_PROC_SLOTS"
+STREAM_PROC_METHOD  = "STREAM_PROC_METHOD"
+BATCHING            = "batching"
+INFER_BATCHING      = "INFER_BATCHING"
+BATCH               = "batch"
+STREAM_PACING       = "STREAM_PACING"
+PACING              = "pacing"
+SRC_FPS             = "src_fps"
+STRIDE              = "stride"
+MAX_STRIDE          = "max_stride"
+INFER_STRIDE        = "INFER_STRIDE"
+INFER_MAX_STRIDE    = "INFER_MAX_STRIDE"
+TRACKER             = "tracker"
+STREAM_TRACKER      = "STREAM_TRACKER"
+ROI                 = "roi"
+STREAM_ROI          = "STREAM_ROI"
+TILING              = "tiling"
+STREAM_TILING       = "STREAM_TILING"
+CAPTURE             = "capture"
+CAPTURE_PROFILE     = "CAPTURE_PROFILE"
+HEADLESS            = "headless"
+RTSP_QUEUE_SIZE     = "RTSP_QUEUE_SIZE"
+RTSP_DROP_POLICY    = "RTSP_DROP_POLICY"
+PIPE_RTSP_QUEUE     = "rtsp_queue_size"
+PIPE_RTSP_POLICY    = "rtsp_drop_policy"
+RTSP_ENCODER        = "RTSP_ENCODER"
+RTSP_CPU_LIMIT      = "RTSP_CPU_LIMIT"
+ENCODER             = "encoder"
+CPU_LIMIT           = "cpu_limit"
+RTSP_SUBSTREAM      = "RTSP_SUBSTREAM"
+RTSP_SUB_SCALE      = "RTSP_SUB_SCALE"
+RTSP_SUB_BITRATE    = "RTSP_SUB_BITRATE"
+SUBSTREAM           = "substream"
+MJPEG_QUALITY       = "MJPEG_QUALITY"
+FPS                 = "fps"
+VARIANT             = "variant"
+ANNOTATED           = "annotated"
+FORMAT              = "format"
+JPEG                = "jpeg"
 
 # Define Socket Event
 INFER_WS_POOL   = "INFER_WS_POOL"
@@ -126,257 +185,150 @@ VTS         = "vitis-ai"
 #     # Send socketio to client
 #     socketio.emit(IMG_EVENT, frame_base64, namespace=namespace)
 
-def define_gst_pipeline(src_wid, src_hei, src_fps, rtsp_url, platform='intel'):
-    base = 'appsrc is-live=true block=true format=GST_FORMAT_TIME ' + \
-            f'caps=video/x-raw,format=BGR,width={src_wid},height={src_hei},framerate={src_fps}/1 ' + \
-            ' ! videoconvert ! video/x-raw,format=I420 ' + \
-            ' ! queue' + \
-            ' ! x264enc bitrate=4096 speed-preset=0 key-int-max=20' + \
-            f' ! rtspclientsink location={rtsp_url}'
-
-    xlnx =  'videomixer name=mix sink_0::xpos=0 sink_0::ypos=0 ! omxh264enc prefetch-buffer=true ' + \
-            'control-rate=2 target-bitrate=4096 filler-data=false constrained-intra-prediction=true ' + \
-            'periodicity-idr=120 gop-mode=low-delay-p aspect-ratio=3 low-bandwidth=true default-roi-quality=4 ' + \
-            '! video/x-h264,alignment=au ' + \
-            f'! rtspclientsink location={rtsp_url} ' + \
-            'appsrc ' + \
-            f'caps=video/x-raw,format=BGR,width={src_wid},height={src_hei},framerate={src_fps}/1 ' + \
-            '! videoconvert ! mix.sink_0'
-
-    maps = {
-        'intel': base,
-        'nvidia': base,
-        'jetson': base,
-        'xilinx': xlnx
-    }
-    logging.info(f'Parse {platform} Gstreamer Pipeline ')
-    return maps.get(platform)
-
-# RTSP Output
+# AI Inference Thread
 # -----------------------------------------------
-class RtspWritter():
-
-    def __init__(self, task_uuid, platform, src_wid, src_hei, src_fps = 30) -> None:
-
-        # Params
-        self.src_wid = src_wid
-        self.src_hei = src_hei
-        self.src_fps = src_fps
-        self.rtsp_url = f"rtsp://localhost:8554/{task_uuid}"
-        self.platform = platform
-        
-        self.send_frame = None
-        self.is_stop = False
-
-        # Define RTSP
-        self.gst_pipeline = define_gst_pipeline(
-            src_wid, src_hei, src_fps, self.rtsp_url, self.platform
-        )
-        
-        # Define Writter
-        self.out = cv2.VideoWriter(  self.gst_pipeline, 
-                                cv2.CAP_GSTREAMER, 0, 
-                                src_fps, (src_wid, src_hei), True )
-
-        if not self.out.isOpened():
-            raise Exception("can't open video writer")
-
-        # Define the threading
-        self.worker = threading.Thread( target=self.write_thread, daemon=True)
-        
-    def write_thread(self):
-        """ Write frame into gstreamer """
-        logging.warning('Start the RTSP writter')
-            
-        try:    
-            while(not self.is_stop):
-                if self.send_frame is None:
-                    time.sleep(33e-3); continue
-
-                t_write = time.time()
-                self.out.write(self.send_frame)
-                print('Write FPS: {:05}'.format(int(1/(time.time()-t_write))), end='\r')
-
-        except Exception as e:
-            self.is_stop = True
-            logging.error('Got error in RTSP Writter')
-
-        logging.info("Stop RTSP Writter")
 
-    def submit(self, frame):
-        """ Update frame """
-        self.send_frame = frame
+def update_task_status(task_uuid, mesg):
+    """ Update the report of StreamRunner into app.config """
+    with app.app_context():
+        for key in [ FRAME_IDX, LIVE_TIME ]:
+            if key in mesg:
+                app.config[TASK][task_uuid][key] = mesg[key]
 
-        if not self.worker.is_alive():
-            self.worker.start()
+        if PERF in mesg:
+            app.config[TASK][task_uuid][PERF].update(mesg[PERF])
 
-    def is_running(self) -> bool:
-        return (not self.is_stop)
+        if RESULT in mesg:
+            app.config[INFER_WS_POOL].update({ task_uuid: mesg[RESULT] })
 
-    def release(self):
-        self.is_stop = True
-        self.worker.join()
-        logging.warning('Clear RTSP Writter')
-
-# AI Inference Thread
-# -----------------------------------------------
-
-def stream_task(task_uuid, src, namespace):
+def report_task_error(task_uuid, err_mesg):
+    """ Stop the task and send the runtime error message via IVIT_WS_POOL """
+    stop_task_thread(task_uuid, err_mesg)
+    
+    # Runtime Error Message
+    err_mesg.update({
+        'uuid': task_uuid,
+        'stop_task': True
+    })
+    app.config[IVIT_WS_POOL].update({
+        "error": err_mesg
+    })
+
+def refresh_task_list():
+    """ Update the task list when the stream is finished """
+    with app.app_context():
+        app.config[TASK_LIST]=get_tasks()
+        if app.config[KEY_TB_STATS]:
+            logging.debug("Update basic attribute")
+            send_basic_attr()
+
+def stream_task(task_uuid, hub, namespace):
     '''
     Stream event: sending 'image' and 'result' to '/app/<uuid>/stream' via socketio
     
+    The loop is split into capture, inference and render stage by StreamRunner, 
+    each stage runs in its own thread and linked by bounded queues.
+    The frames are read from the source hub which is shared by the tasks with the same source.
+
     - Arguments
         - task_uuid
-        - src
+        - hub
         - namespace
     '''
     # Prepare Parameters
-    ret_info, info  = dict(), None
-    model_conf      = app.config[TASK][task_uuid][CONFIG]
     trg             = app.config[TASK][task_uuid][API]
     platform        = app.config[PLATFORM]
-    app_dir         = app.config[APP_DIR]
-    temp_model_conf = copy.deepcopy(model_conf)
+    temp_model_conf = copy.deepcopy(app.config[TASK][task_uuid][CONFIG])
+    pipe_conf       = temp_model_conf.get(PIPELINE, {})
 
     # Setup Application
     try:
-
-        #NOTE: r1.1 still keep the legacy application usage
-        
-        # Custom Application using ivitAppHandler
-        app_handler = ivitAppHandler()
-        app_handler.register_from_folder(app_dir.replace('./', ''))
-        if temp_model_conf['application']['name'] in app_handler.get_all_apps():
-            app_object  = app_handler.get_app(temp_model_conf['application']['name'])
-            application = app_object(
-                params  = temp_model_conf,
-                label   = temp_model_conf[ temp_model_conf['framework'] ]['label_path'] )
-        
-        # Defualt application
-        else:
-            application = get_application(temp_model_conf)
+        application = init_application(temp_model_conf, app.config[APP_DIR])
 
     # If setup application failed
     except Exception as e: 
-        
         err_mesg = json_exception(e)
-        stop_task_thread(task_uuid, err_mesg)
-        
-        # Runtime Error Message
-        err_mesg.update({
-            'uuid': task_uuid,
-            'stop_task': True
-        })
-        app.config[IVIT_WS_POOL].update({
-            "error": err_mesg
-        })
+        report_task_error(task_uuid, err_mesg)
         raise RuntimeError( err_mesg )
     
-    # Async Mode
-    trg.set_async_mode()
-
-    # Define RTSP pipeline
-    src_name    = app.config[TASK][task_uuid][SOURCE]
-    (src_hei, src_wid), src_fps = src.get_shape(), src.get_fps()
-
-    # Define RTSP
-    # rtsp_url = f"rtsp://localhost:8554/{task_uuid}"
-    # gst_pipeline = define_gst_pipeline(
-    #     src_wid, src_hei, src_fps, rtsp_url, platform
-    # )
-    # out = cv2.VideoWriter(  gst_pipeline, cv2.CAP_GSTREAMER, 0, 
-    #                         src_fps, (src_wid, src_hei), True )
-    # logging.info('Gstreamer Pipeline: {}\n\n{}'.format(gst_pipeline, rtsp_url))
-    # if not out.isOpened():
-    #     raise Exception("can't open video writer")
-
-    rtsp_writter = RtspWritter(    task_uuid = task_uuid,
-        platform = platform,
-        src_hei = src_hei,
-        src_wid = src_wid   )
+    # Submit frames to the inference scheduler if batching,
+    # the pooled model keeps sync mode so it could be shared and cached, StreamRunner overlaps the inference with the capture
+    use_batch = pipe_conf.get(BATCHING, app.config[INFER_BATCHING])
+    infer = get_scheduler(task_uuid, trg) if use_batch else trg
+
+    # Define RTSP pipeline, it is created with the first output frame and not created in headless mode
+    src_name            = app.config[TASK][task_uuid][SOURCE]
+    (src_hei, src_wid)  = hub.get_shape()
+    out_fps             = max(1, int(round(hub.fps)))   # the caps of the pipeline take an integer FPS
+
+    rtsp_queue_size     = pipe_conf.get(PIPE_RTSP_QUEUE, app.config[RTSP_QUEUE_SIZE])
+    rtsp_drop_policy    = pipe_conf.get(PIPE_RTSP_POLICY, app.config[RTSP_DROP_POLICY])
+
+    # The MJPEG clients are served by the broadcaster of the task
+    mjpeg = get_mjpeg(task_uuid)
+
+    # The substream is resized from the rendered frame, it has its own bitrate
+    is_watched, is_sub_watched, substream = get_watch_func(task_uuid), None, None
+    if is_substream_enabled(pipe_conf, app.config[RTSP_SUBSTREAM]):
+        is_sub_watched  = get_sub_watch_func(task_uuid)
+        sub_conf        = dict(pipe_conf, **{ BITRATE: pipe_conf.get(SUB_BITRATE, app.config[RTSP_SUB_BITRATE]) })
+        substream = Substream(
+            factory = lambda wid, hei: RtspWritter( task_uuid = task_uuid,
+                platform = platform,
+                src_hei = hei,
+                src_wid = wid,
+                src_fps = out_fps,
+                queue_size = rtsp_queue_size,
+                policy = rtsp_drop_policy,
+                encoder = get_encoder(sub_conf, wid, hei, out_fps, 
+                    mode = app.config[RTSP_ENCODER], cpu_limit = app.config[RTSP_CPU_LIMIT], platform = platform),
+                path = SUB_PATH ),
+            scale = pipe_conf.get(SUB_SCALE, app.config[RTSP_SUB_SCALE]),
+            is_watched = is_sub_watched )
+
+    rtsp_writter = OutputWriter( 
+        factory = lambda: RtspWritter( task_uuid = task_uuid,
+            platform = platform,
+            src_hei = src_hei,
+            src_wid = src_wid,
+            src_fps = out_fps,
+            queue_size = rtsp_queue_size,
+            policy = rtsp_drop_policy,
+            encoder = get_encoder(pipe_conf, src_wid, src_hei, out_fps, 
+                mode = app.config[RTSP_ENCODER], cpu_limit = app.config[RTSP_CPU_LIMIT], platform = platform) ),
+        is_headless = lambda: is_headless(task_uuid),
+        is_watched = is_watched,
+        substream = substream,
+        mjpeg = mjpeg )
+
+    # Subscribe the source hub
+    sub = hub.subscribe(task_uuid, pipe_conf.get(READ_MODE, app.config[HUB_READ_MODE]))
 
     # start looping
-    cur_info, temp_info, app_info = None, None, None
-    cur_fps, fps_pool = 30, []
-    temp_socket_time = 0
     try:
-
-        while(app.config[SRC][src_name][STATUS]==RUN):
-            
-            t1 = time.time()
-
-            # Get the frame from source
-            success, frame = src.read()   
-             
-            # Check frame
-            if not success:
-                if src.get_type() == 'v4l2': 
-                    raise RuntimeError('USB Camera Error')
-                else:
-                    application.reset()
-                    src.reload()
-                    continue    
-                                
-            # If got frame then add the frame index
-            with app.app_context():
-                app.config[TASK][task_uuid][FRAME_IDX] += 1
-            
-            t2 = time.time()
-
-            # Copy frame for drawing
-            draw = frame.copy()
-
-            # Start to Inference and update info
-            cur_info = trg.inference( frame )
-
-            # Update temp_info
-            if(cur_info is not None):
-                if cur_info.get(DETS) is not None:
-                    temp_info = cur_info
-
-            t3 = time.time()
-
-            # Draw something
-            if (temp_info is not None):
-                
-                draw, app_info = application(draw, temp_info)
-
-            # Send RTSP
-            # out.write(draw)
-            rtsp_writter.submit(draw)
-
-            # Select Information to send
-            info = temp_info.get(DETS) if (temp_info is not None) else ''
-
-            # Combine the return information
-            ret_info = {
-                IDX         : int(app.config[TASK][task_uuid][FRAME_IDX]),
-                DETS        : info,
-                INFER       : round((t3-t2)*1000, 3),
-                FPS         : cur_fps,
-                LIVE_TIME   : round((time.time() - app.config[TASK][task_uuid][START_TIME]), 5),
-            }
-
-            # Send Information
-            if(time.time() - temp_socket_time >= 1):
-                with app.app_context():            
-                    app.config[INFER_WS_POOL].update({ task_uuid: json.dumps(get_pure_jsonify(ret_info)) })
-                temp_socket_time = time.time()
-
-            # Delay to fix in 30 fps
-            t_cost, t_expect = (time.time()-t1), (1/src_fps)
-            time.sleep(t_expect-t_cost if(t_cost<t_expect) else 1e-6)
-
-            # Update Live Time and FPS
-            with app.app_context():
-                app.config[TASK][task_uuid][LIVE_TIME] = int((time.time() - app.config[TASK][task_uuid][START_TIME]))
-            
-            # Average FPS
-            if(cur_info):
-                fps_pool.append(int(1/(time.time()-t1)))
-                cur_fps = sum(fps_pool)//len(fps_pool) if len(fps_pool)>10 else cur_fps
-
-        logging.info('Stop streaming')
+        runner = StreamRunner(
+            trg             = infer,
+            application     = application,
+            reader          = sub,
+            writer          = rtsp_writter,
+            report          = lambda mesg: update_task_status(task_uuid, mesg),
+            start_time      = app.config[TASK][task_uuid][START_TIME],
+            pipe_conf       = pipe_conf,
+            queue_size      = app.config[STREAM_QUEUE_SIZE],
+            drop_policy     = app.config[STREAM_DROP_POLICY],
+            draw_pool_size  = app.config[DRAW_POOL_SIZE],
+            extra_stats     = { BATCH: infer.get_stats } if use_batch else None,
+            pacing          = app.config[STREAM_PACING],
+            src_fps         = hub.fps,
+            app_conf        = temp_model_conf.get(APPLICATION),
+            stride          = app.config[INFER_STRIDE],
+            max_stride      = app.config[INFER_MAX_STRIDE],
+            tracker         = app.config[STREAM_TRACKER],
+            roi             = app.config[STREAM_ROI],
+            tiling          = app.config[STREAM_TILING],
+            is_watched      = any_watched(is_watched, is_sub_watched, mjpeg.has_clients) )
+
+        runner.run(keep_running = lambda: app.config[SRC][src_name][STATUS]==RUN)
 
     except Exception as e:
         err_mesg = handle_exception(e)
@@ -384,13 +336,65 @@ def stream_task(task_uuid, src, namespace):
         # raise RuntimeError(err_mesg)
     
     finally:
+        hub.unsubscribe(task_uuid)
+        if use_batch: release_scheduler(task_uuid, trg)
+        # Only drop the reference, the model is released by the last task in the model pool
         trg.release()
         rtsp_writter.release()
-        with app.app_context():
-            app.config[TASK_LIST]=get_tasks()
-            if app.config[KEY_TB_STATS]:
-                logging.debug("Update basic attribute")
-                send_basic_attr()
+        refresh_task_list()
+
+def update_process_status(task_uuid, mesg):
+    """ Update the report of the worker process into app.config """
+    update_task_status(task_uuid, mesg)
+
+    if mesg.get(ERROR):
+        report_task_error(task_uuid, mesg[ERROR])
+
+def create_task_process(task_uuid):
+    """ Create a worker process for the task which is running in `process` mode """
+    src_name        = app.config[TASK][task_uuid][SOURCE]
+    temp_model_conf = copy.deepcopy(app.config[TASK][task_uuid][CONFIG])
+    pipe_conf       = temp_model_conf.get(PIPELINE, {})
+    hub             = get_hub(task_uuid)
+
+    return TaskProcess(
+        task_uuid       = task_uuid,
+        hub             = hub,
+        model_conf      = temp_model_conf,
+        af              = app.config[TASK][task_uuid][FRAMEWORK],
+        platform        = app.config[PLATFORM],
+        app_dir         = app.config[APP_DIR],
+        start_time      = app.config[TASK][task_uuid][START_TIME],
+        keep_running    = lambda: app.config[SRC][src_name][STATUS]==RUN,
+        on_report       = lambda mesg: update_process_status(task_uuid, mesg),
+        on_exit         = refresh_task_list,
+        read_mode       = pipe_conf.get(READ_MODE, app.config[HUB_READ_MODE]),
+        slots           = app.config[STREAM_PROC_SLOTS],
+        method          = app.config[STREAM_PROC_METHOD],
+        is_watched      = get_watch_func(task_uuid),
+        is_sub_watched  = get_sub_watch_func(task_uuid) \
+            if is_substream_enabled(pipe_conf, app.config[RTSP_SUBSTREAM]) else None,
+        is_headless     = lambda: is_headless(task_uuid),
+        mjpeg           = get_mjpeg(task_uuid),
+        options         = {
+            QUEUE_SIZE      : app.config[STREAM_QUEUE_SIZE],
+            DROP_POLICY     : app.config[STREAM_DROP_POLICY],
+            "draw_pool_size": app.config[DRAW_POOL_SIZE],
+            PACING          : app.config[STREAM_PACING],
+            SRC_FPS         : hub.fps,
+            STRIDE          : app.config[INFER_STRIDE],
+            MAX_STRIDE      : app.config[INFER_MAX_STRIDE],
+            TRACKER         : app.config[STREAM_TRACKER],
+            ROI             : app.config[STREAM_ROI],
+            TILING          : app.config[STREAM_TILING],
+            PIPE_RTSP_QUEUE : pipe_conf.get(PIPE_RTSP_QUEUE, app.config[RTSP_QUEUE_SIZE]),
+            PIPE_RTSP_POLICY: pipe_conf.get(PIPE_RTSP_POLICY, app.config[RTSP_DROP_POLICY]),
+            ENCODER         : app.config[RTSP_ENCODER],
+            CPU_LIMIT       : app.config[RTSP_CPU_LIMIT],
+            SUBSTREAM       : app.config[RTSP_SUBSTREAM],
+            SUB_SCALE       : app.config[RTSP_SUB_SCALE],
+            SUB_BITRATE     : app.config[RTSP_SUB_BITRATE],
+            MJPEG_QUALITY   : app.config[MJPEG_QUALITY] })
 
 # -----------------------------------------------
 # Define Threading Hook
@@ -477,18 +481,21 @@ def update_src():
                 src.release()
 
             # Return Frame
-            if ret:
-                return frame2btye(ret), PASS_CODE
+            if ret is not None:
+                try:
+                    return frame2btye(ret, key=data[SOURCE], variant=data.get(VARIANT, FULL)), PASS_CODE
+                except ValueError as e:
+                    return http_msg(e, FAIL_CODE)
 
-    # If not exist then create a new Source
+    # If not exist then create a new Source with the capture profile in the request or the default one
     src = Pipeline( data[SOURCE], data[SOURCE_TYPE] )
-    src.set_cam(height=720, width=1280, fps=30)
+    apply_profile(src, get_profile(str_to_json(data.get(CAPTURE)), app.config[CAPTURE_PROFILE]))
     try:
         src.start()
         
         ret = src.get_first_frame()
         src.release()
-        return frame2btye(ret), PASS_CODE
+        return frame2btye(ret, key=data[SOURCE], variant=data.get(VARIANT, FULL)), PASS_CODE
     except Exception as e:
         return http_msg(e, FAIL_CODE)
 
@@ -505,7 +512,10 @@ def get_first_frame(uuid):
         return http_msg(e, FAIL_CODE)
     
     src = get_src(uuid)
-    ret = frame2btye(src.get_first_frame())
+    try:
+        ret = frame2btye(src.get_first_frame(), key=app.config[TASK][uuid][SOURCE], variant=request.args.get(VARIANT, FULL))
+    except ValueError as e:
+        return http_msg(e, FAIL_CODE)
     # return '<img src="data:image/jpeg;base64,{}">'.format(frame_base64)
     return http_msg( ret, PASS_CODE )
     
@@ -515,6 +525,15 @@ def start_stream(uuid):
 
     title_msg = lambda title: f'{title}, Stream (WebRTC): {app.config["HOST"]}:{app.config["NGINX_PORT"]}/task/{uuid}/stream , Log (WebSocket): "/task/results", RTSP: rtsp://{app.config["HOST"]}:8554/{uuid}.'
     try:
+        # ----------------------------------------------------------
+        # Wait for the AI model which is loading in background
+        if app.config[TASK][uuid][STATUS] == LOADING:
+            if not wait_model(uuid, app.config[MODEL_LOAD_TIMEOUT]):
+                return http_msg('The AI model of the task is still loading ... ', FAIL_CODE)
+            
+            if app.config[TASK][uuid][STATUS] == ERROR:
+                return http_msg('Load AI model failed ... {}'.format(app.config[TASK][uuid][ERROR]), FAIL_CODE)
+
         app.config[TASK][uuid][STATUS] = RUN
         # ----------------------------------------------------------
         
@@ -524,12 +543,16 @@ def start_stream(uuid):
         [ logging.info(cnt) for cnt in [DIV, f'Start stream ... destination of socket event: "/task/{uuid}/stream"', DIV] ]
         
         # ----------------------------------------------------------
-        # Create New Stream Thread
-        if app.config[TASK][uuid][STREAM] is None:
+        # Create New Stream Thread or Worker Process
+        if app.config[TASK][uuid][STREAM] is None and get_stream_mode(uuid) == PROCESS:
+
+            app.config[TASK][uuid][STREAM] = create_task_process(uuid)
+
+        elif app.config[TASK][uuid][STREAM] is None:
 
             app.config[TASK][uuid][STREAM] = threading.Thread(
                 target  = stream_task, 
-                args    = (uuid, get_src(uuid), f'/task/{uuid}/stream', ), 
+                args    = (uuid, get_hub(uuid), f'/task/{uuid}/stream', ), 
                 name    = f"{uuid}",
                 daemon  = True
             )
@@ -572,6 +595,87 @@ def start_stream(uuid):
         logging.warning(msg)
         return http_msg(e, FAIL_CODE)
     
+@bp_stream.route("/task/<uuid>/headless", methods=["GET", "POST"])
+@swag_from("{}/{}".format(YAML_PATH, "headless.yml"))
+def switch_headless(uuid):
+    """ Get or switch the headless mode of the task, it works while the stream is running """
+
+    # ----------------------------------------------------------
+    # Checking UUID
+    try:
+        check_uuid_in_config(uuid)
+    except Exception as e:
+        return http_msg(e, FAIL_CODE)
+
+    if request.method == "POST":
+        data = dict(request.form) if bool(request.form) else request.get_json()
+        headless = data.get(HEADLESS)
+        if not (str(headless).lower() in [ "true", "false" ]):
+            return http_msg('Expect "{}" is true or false, but got {}'.format(HEADLESS, headless), FAIL_CODE)
+        
+        app.config[TASK][uuid][HEADLESS] = (str(headless).lower() == "true")
+        logging.info('Switch the headless mode of the task ( {}: {} )'.format(uuid, app.config[TASK][uuid][HEADLESS]))
+
+    return http_msg({ HEADLESS: is_headless(uuid) }, PASS_CODE)
+
+@bp_stream.route("/task/<uuid>/mjpeg", methods=["GET"])
+@swag_from("{}/{}".format(YAML_PATH, "mjpeg.yml"))
+def get_mjpeg_stream(uuid):
+    """ Stream the rendered frames of the running task as MJPEG, the response is finished when the stream stops """
+
+    # ----------------------------------------------------------
+    # Checking UUID
+    try:
+        check_uuid_in_config(uuid)
+    except Exception as e:
+        return http_msg(e, FAIL_CODE)
+
+    if app.config[TASK][uuid][STATUS] != RUN:
+        return http_msg('The stream of the task is not running', FAIL_CODE)
+
+    if is_headless(uuid):
+        return http_msg('The task is running in headless mode, there is no video output', FAIL_CODE)
+
+    try:
+        max_fps = float(request.args.get(FPS)) if request.args.get(FPS) else None
+        if max_fps is not None and max_fps <= 0: raise ValueError
+    except ValueError:
+        return http_msg('Expect "{}" is a positive number, but got {}'.format(FPS, request.args.get(FPS)), FAIL_CODE)
+
+    return Response(
+        get_mjpeg(uuid).stream(
+            max_fps         = max_fps,
+            keep_running    = lambda: app.config[TASK][uuid][STATUS] == RUN ),
+        mimetype = MIMETYPE )
+
+@bp_stream.route("/task/<uuid>/snapshot", methods=["GET"])
+@swag_from("{}/{}".format(YAML_PATH, "snapshot.yml"))
+def get_task_snapshot(uuid):
+    """ Get the latest raw or annotated frame of the task from the live source, the stopped source returns the cached thumbnail """
+
+    # ----------------------------------------------------------
+    # Checking UUID
+    try:
+        check_uuid_in_config(uuid)
+    except Exception as e:
+        return http_msg(e, FAIL_CODE)
+
+    annotated = str(request.args.get(ANNOTATED, False)).lower() == "true"
+    try:
+        encoded, info = get_snapshot(uuid, annotated, request.args.get(VARIANT, FULL))
+    except ValueError as e:
+        return http_msg(e, FAIL_CODE)
+
+    if encoded is None:
+        return http_msg('There is no frame of the stopped source, start the stream or call /update_src first', FAIL_CODE)
+
+    if request.args.get(FORMAT) == JPEG:
+        return Response(encoded.jpeg, mimetype="image/jpeg")
+
+    ret = encoded2btye(encoded)
+    ret.update(info)
+    return http_msg( ret, PASS_CODE )
+
 @bp_stream.route("/task/<uuid>/stream/stop", methods=["GET"])
 @swag_from("{}/{}".format(YAML_PATH, "stream_stop.yml"))
 def stop_stream(uuid):
@@ -66,6 +66,8 @@ def web_source():
                     temp_src_config[dev][key] = 'source object'
                 else:
                     temp_src_config[dev][key] = None
+            elif key=='hub':
+                temp_src_config[dev][key] = val.get_stats() if val is not None else None
             else:
                 temp_src_config[dev].update( {key:val} )
     
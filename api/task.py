@@ -3,14 +3,13 @@ from flask import Blueprint, jsonify, current_app
 from flasgger import swag_from
 
 # From /ivit_i/web/api
-from .common import get_src, stop_src, check_uuid_in_config
+from .common import get_src, load_model_async, release_model, get_stream_mode, stop_src, check_uuid_in_config
 
 # From /ivit_i/web
 from ..tools.common import http_msg, simple_exception, handle_exception, json_exception
 from ..tools.parser import get_pure_jsonify
 from ..tools.handler import get_tasks
 from ..tools.parser import get_pure_jsonify
-from ..ai.get_api import get_api
 
 YAML_PATH   = "../docs/task"
 BP_NAME     = 'task'
@@ -50,6 +49,7 @@ RUN         = "run"
 STOP        = "stop"
 ERROR       = "error"
 STATUS      = "status"
+LOADING     = "loading"
 
 # Define AI Inference Parameters
 API         = "api"
@@ -63,6 +63,9 @@ START_TIME  = "start_time"
 FIRST_TIME  = "first_time_flag"
 LIVE_TIME   = "live_time"
 
+# Define Stream Mode
+PROCESS     = "process"
+
 @bp_tasks.route("/task", methods=["GET"])
 @swag_from("{}/{}".format(YAML_PATH, "task.yml"))
 def entrance():
@@ -204,6 +207,11 @@ def run_task(uuid):
     # Running Task
     if current_app.config[TASK][uuid][STATUS] == RUN:
         return http_msg('The task is still running ... ', PASS_CODE)
+
+    # ------------------------------------
+    # Loading Task
+    if current_app.config[TASK][uuid][STATUS] == LOADING:
+        return http_msg('The AI model of the task is still loading ... ', PASS_CODE)
     
     # ------------------------------------
     # Create Source Thread
@@ -222,35 +230,44 @@ def run_task(uuid):
     # Deep Copy Config to avoid modfiy ther source config
     temp_config = copy.deepcopy(current_app.config[TASK][uuid][CONFIG]) 
     
+    # ------------------------------------
+    # Update running status and 
+    # current_app.config[TASK][uuid][STATUS] = RUN
+    
+    current_app.config[TASK][uuid][START_TIME]  = time.time()
+    current_app.config[TASK][uuid][LIVE_TIME]   = 0
+    current_app.config[TASK][uuid][FIRST_TIME]  = True
+    current_app.config[TASK][uuid][FRAME_IDX]   = 0
+
     # ------------------------------------
     # Initialize AI Model
     try:
 
-        init_ai_model = get_api()
+        # Drop the model which is held by the previous run
+        release_model(uuid)
+        current_app.config[TASK][uuid][API] = None
 
         # NOTE: not support at r1.1, only pose estimation in openvino have to input a frame
         # is_openvino = (current_app.config[TASK][uuid].get(FRAMEWORK)==OV)
         # is_pose = (current_app.config[TASK][uuid][CONFIG].get(TAG)=='pose')
         # input_frame = src.read()[1] if is_openvino and is_pose else None
-        # current_app.config[TASK][uuid][API] = init_ai_model(temp_config, input_frame)
-        current_app.config[TASK][uuid][API] = init_ai_model(temp_config)
+
+        # The AI model will be loaded in the worker process
+        if get_stream_mode(uuid) == PROCESS:
+            logging.info('The AI model of the task ({}) will be loaded in the worker process'.format(uuid))
+            current_app.config[TASK_LIST]=get_tasks()
+            return http_msg('Run Application ({}) !'.format(uuid), PASS_CODE)
+
+        # Load the AI model in background, the progress is pushed via websocket
+        load_model_async(uuid, temp_config)
     
     except Exception as e:
         current_app.config[TASK][uuid][STATUS] = ERROR
         current_app.config[TASK][uuid][ERROR] = json_exception(e)
         return http_msg(e, FAIL_CODE)
-    
-    # ------------------------------------
-    # Update running status and 
-    # current_app.config[TASK][uuid][STATUS] = RUN
-    
-    current_app.config[TASK][uuid][START_TIME]  = time.time()
-    current_app.config[TASK][uuid][LIVE_TIME]   = 0
-    current_app.config[TASK][uuid][FIRST_TIME]  = True
-    current_app.config[TASK][uuid][FRAME_IDX]   = 0
 
     current_app.config[TASK_LIST]=get_tasks()
-    return http_msg('Run Application ({}) !'.format(uuid), PASS_CODE)
+    return http_msg('Loading Application ({}) ...'.format(uuid), PASS_CODE)
 
 @bp_tasks.route("/task/<uuid>/stop", methods=["GET"])
 @swag_from("{}/{}".format(YAML_PATH, "task_stop.yml"))
@@ -276,6 +293,13 @@ def stop_task(uuid):
             msg = 'Stopping Task Failed ... ({})'.format(handle_exception(e))
         return http_msg(msg, FAIL_CODE)
 
+    # ------------------------------------
+    # Drop the reference of the AI model, it is released if no other task is using it
+    try:
+        release_model(uuid)
+    except Exception as e:
+        logging.warning('Release AI model failed ... ({})'.format(handle_exception(e)))
+
     # ------------------------------------
     # Set relative object to None
     for key in [API, RUNTIME, DRAW_TOOLS, PALETTE, STREAM]:
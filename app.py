@@ -161,6 +161,7 @@ if __name__ == "__main__":
     # sock.run(app, host=app.config['HOST'], port=app.config['PORT'], debug=app.config['DEBUG'])
     app.run(host=app.config['HOST'], port=app.config['PORT'], debug=app.config['DEBUG'])
 
-else:
+elif __name__ != "__mp_main__":
     # export IVIT_I=/workspace/ivit-i.json
+    # NOTE: the worker process of the task imports the main module as __mp_main__, it doesn't run the web service
     app, sock = create_app()
\ No newline at end of file
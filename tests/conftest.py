@@ -0,0 +1,60 @@
+""" Load the modules of the web API without initializing the Flask application in the package __init__ """
+import os, sys, time, types, threading
+
+ROOT    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "web"
+
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ ROOT ]
+    sys.modules[PACKAGE] = package
+
+
+class FakeModel():
+    """ The AI model object of the tests, it records the inferred frames and the concurrent calls
+
+    - Arguments
+        - result
+            - type: function
+            - desc: return the result of the frame, the frame itself by default
+        - delay
+            - type: float
+            - desc: seconds of each inference
+    """
+    def __init__(self, result=None, delay=0) -> None:
+        self.result     = result if result is not None else (lambda frame: frame)
+        self.delay      = delay
+        self.frames     = []
+        self.sizes      = []
+        self.lock       = threading.Lock()
+        self.running    = 0
+        self.max_running= 0
+        self.released   = False
+        self.async_mode = False
+
+    def set_async_mode(self):
+        self.async_mode = True
+
+    def run(self, frames) -> list:
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+            self.frames += frames
+            self.sizes.append(len(frames))
+        return [ self.result(frame) for frame in frames ]
+
+    def inference(self, frame):
+        return self.run([ frame ])[0]
+
+    def release(self):
+        self.released = True
+
+
+class FakeBatchModel(FakeModel):
+    """ The AI model object which provides the batch inference """
+
+    def inference_batch(self, frames):
+        return self.run(list(frames))
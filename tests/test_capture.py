@@ -0,0 +1,43 @@
+from web.tools.capture import get_profile, negotiate_profiles, apply_profile, DEFAULT_PROFILE
+
+
+class FakeSource():
+
+    def __init__(self) -> None:
+        self.kwargs = None
+
+    def set_cam(self, width, height, fps):
+        self.kwargs = dict(width=width, height=height, fps=fps)
+
+
+class FakeFormatSource(FakeSource):
+
+    def set_cam(self, width, height, fps, fourcc=None):
+        self.kwargs = dict(width=width, height=height, fps=fps, fourcc=fourcc)
+
+
+def test_profile_fills_the_missing_keys():
+    profile = get_profile({ "width": "640", "height": None, "scale": 5 }, { "fps": 15 })
+    assert profile == dict(DEFAULT_PROFILE, width=640, fps=15.0, scale=1)
+    assert get_profile({ "scale": 0 })["scale"] == 0.1
+
+
+def test_shared_source_satisfies_every_task():
+    profiles = [
+        get_profile({ "width": 640, "height": 480, "fps": 15, "format": "MJPG", "scale": 0.5 }),
+        get_profile({ "width": 1920, "height": 1080, "fps": 10, "format": "YUYV", "scale": 0.25 }),
+        get_profile({ "format": "MJPG" }) ]
+    profile = negotiate_profiles(profiles)
+    assert profile == { "width": 1920, "height": 1080, "fps": 30.0, "format": "MJPG", "scale": 1 }
+    assert negotiate_profiles([], { "fps": 25 })["fps"] == 25.0
+
+
+def test_profile_is_applied_to_the_camera():
+    src = FakeSource()
+    apply_profile(src, get_profile({ "fps": 30, "format": "MJPG" }))
+    assert src.kwargs == { "width": 1280, "height": 720, "fps": 30 }
+    assert isinstance(src.kwargs["fps"], int)
+
+    src = FakeFormatSource()
+    apply_profile(src, get_profile({ "fps": 7.5, "format": "MJPG" }))
+    assert src.kwargs == { "width": 1280, "height": 720, "fps": 7.5, "fourcc": "MJPG" }
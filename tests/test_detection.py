@@ -0,0 +1,36 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from web.tools.detection import Detections, as_detections
+
+
+INT_DETS = [
+    { "xmin": 10, "ymin": 20, "xmax": 30, "ymax": 40, "label": "person", "score": 0.9, "id": 1 },
+    { "xmin": None, "ymin": None, "xmax": None, "ymax": None, "label": "cat", "score": 0.5, "extra": "x" }
+]
+FLOAT_DETS = [
+    { "xmin": 0.1, "ymin": 0.2, "xmax": 0.3, "ymax": 0.4, "label": "dog", "score": 0.8 }
+]
+
+
+def test_round_trip_keeps_the_detections():
+    assert Detections.from_dicts(INT_DETS).to_dicts() == INT_DETS
+
+
+def test_box_types_of_the_model_are_kept():
+    dets = Detections.concat([ Detections.from_dicts(INT_DETS), Detections.from_dicts(FLOAT_DETS) ])
+    ret = dets.to_dicts()
+    assert all([ type(ret[0][key]) is int for key in [ "xmin", "ymin", "xmax", "ymax" ] ])
+    assert ret[2]["xmin"] == 0.1 and type(ret[2]["xmin"]) is float
+
+
+def test_shift_and_select():
+    dets = as_detections(INT_DETS + FLOAT_DETS)
+    moved = dets.shift(5, 5)
+    assert moved.to_dicts()[0]["xmin"] == 15
+    assert dets.to_dicts()[0]["xmin"] == 10
+
+    boxed = dets.select(dets.has_box)
+    assert [ det["label"] for det in boxed.to_dicts() ] == [ "person", "dog" ]
+    assert as_detections(boxed) is boxed
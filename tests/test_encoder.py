@@ -0,0 +1,37 @@
+from web.tools.encoder import get_default_settings, get_ladder, get_encoder, EncoderController, \
+    BITRATE, PRESET, KEY_INT, FIXED, PRESETS, MIN_BITRATE
+
+
+def test_default_settings_keep_the_pipeline_defaults():
+    settings = get_default_settings(1920, 1080, 30)
+    assert settings == { BITRATE: 4096, PRESET: "medium", KEY_INT: 20 }
+    assert get_default_settings(1920, 1080, 30, "xilinx")[KEY_INT] == 120
+    assert get_default_settings(1280, 720, 30)[BITRATE] == 4096
+
+
+def test_each_level_of_the_ladder_is_cheaper():
+    ladder = get_ladder(get_default_settings(1920, 1080, 30), 30)
+    assert ladder[0][PRESET] == "medium"
+    assert [ level[PRESET] for level in ladder[:len(PRESETS)] ] == PRESETS[::-1]
+    assert ladder[-1][BITRATE] == MIN_BITRATE and ladder[-1][KEY_INT] == 120
+
+
+def test_ladder_skips_the_preset_without_it():
+    ladder = get_ladder(get_default_settings(1920, 1080, 30, "xilinx"), 30, "xilinx")
+    assert all([ level[PRESET] == "medium" for level in ladder ])
+    assert ladder[1][BITRATE] < ladder[0][BITRATE]
+    assert EncoderController(1920, 1080, 30, platform="xilinx").ladder == ladder
+
+
+def test_encoder_budget_follows_the_source_fps():
+    assert EncoderController(1280, 720, 15).budget == 1 / 15
+    encoder = get_encoder({ "encoder": "false", BITRATE: 1000 }, 1280, 720, 15)
+    assert encoder.mode == FIXED
+    assert encoder.get_settings()[BITRATE] == 1000
+
+
+def test_revert_restores_the_previous_level():
+    encoder = EncoderController(1280, 720, 30)
+    encoder.prev_level, encoder.level = 0, 2
+    encoder.revert()
+    assert encoder.level == 0
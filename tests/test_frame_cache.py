@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from web.tools.frame_cache import FrameCache, FULL, THUMB
+
+
+def get_frame(val=0, wid=640, hei=480):
+    return np.full((hei, wid, 3), val, np.uint8)
+
+
+def test_same_frame_is_encoded_once():
+    cache = FrameCache()
+    frame = get_frame()
+    first = cache.get("task", frame, idx=1)
+    assert cache.get("task", frame, idx=1) is first
+    assert cache.get("task", get_frame(), idx=2) is not first
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_frame_without_index_is_matched_by_identity():
+    cache = FrameCache()
+    frame = get_frame()
+    first = cache.get("task", frame)
+    assert cache.get("task", frame) is first
+    assert cache.get("task", frame.copy()) is not first
+
+
+def test_variants_are_cached_separately():
+    cache = FrameCache()
+    frame = get_frame()
+    full = cache.get("task", frame, idx=1, variant=FULL)
+    thumb = cache.get("task", frame, idx=1, variant=THUMB)
+    assert full is not thumb
+    assert len(thumb.jpeg) < len(full.jpeg)
+    assert cache.peek("task", [ THUMB ]) is thumb
+    with pytest.raises(ValueError):
+        cache.get("task", frame, variant="huge")
+
+
+def test_least_recently_used_entry_is_removed():
+    cache = FrameCache(max_entries=2)
+    frame = get_frame()
+    [ cache.get(key, frame, idx=1) for key in [ "a", "b", "c" ] ]
+    assert cache.peek("a") is None
+    assert cache.peek("c") is not None
+    assert cache.get("c", frame, idx=1).to_base64() == cache.peek("c").to_base64()
@@ -0,0 +1,44 @@
+import threading
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from web.tools.frame_pool import FramePool
+
+
+def test_buffer_goes_back_after_the_last_release():
+    pool = FramePool((2, 2, 3), size=2)
+    buf = pool.acquire()
+    buf.retain()
+    buf.release()
+    assert pool.get_stats()["in_use"] == 1
+    buf.release()
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_temporary_buffer_when_the_pool_is_exhausted():
+    pool = FramePool((2, 2, 3), size=2)
+    bufs = [ pool.acquire() for _ in range(3) ]
+    assert bufs[2].pool is None
+    assert pool.get_stats()["overflow"] == 1
+    [ buf.release() for buf in bufs ]
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_copy_from_reuses_the_buffers():
+    pool = FramePool((2, 2, 3), size=2)
+    arrays = set()
+    for val in range(6):
+        buf = pool.copy_from(np.full((2, 2, 3), val, np.uint8))
+        assert buf.array[0, 0, 0] == val
+        arrays.add(id(buf.array))
+        buf.release()
+    assert len(arrays) == 2
+
+
+def test_acquire_waits_for_a_free_buffer():
+    pool = FramePool((2, 2, 3), size=1)
+    buf = pool.acquire()
+    threading.Timer(0.05, buf.release).start()
+    assert pool.acquire(timeout=1) is buf
+    assert pool.get_stats()["overflow"] == 0
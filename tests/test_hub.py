@@ -0,0 +1,68 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from web.tools.hub import SourceHub, LATEST, EVERY
+
+
+class FakeSource():
+
+    def get_fps(self):
+        return 30
+
+    def get_shape(self):
+        return (4, 6)
+
+
+def get_frame(val):
+    return np.full((4, 6, 3), val, np.uint8)
+
+
+def test_latest_reads_newest_frame():
+    hub = SourceHub(FakeSource(), ring_size=4, pool_size=8)
+    sub = hub.subscribe("task", LATEST)
+    for val in range(3):
+        hub.publish(get_frame(val))
+
+    buf = sub.read(timeout=0)
+    assert buf.array[0, 0, 0] == 2
+    assert sub.dropped == 2
+    buf.release()
+    assert sub.read(timeout=0) is None
+
+
+def test_every_drops_overwritten_frames():
+    hub = SourceHub(FakeSource(), ring_size=2, pool_size=4)
+    sub = hub.subscribe("task", EVERY)
+    for val in range(5):
+        hub.publish(get_frame(val))
+
+    vals = []
+    while True:
+        buf = sub.read(timeout=0)
+        if buf is None: break
+        vals.append(int(buf.array[0, 0, 0]))
+        buf.release()
+    assert vals == [ 3, 4 ]
+    assert sub.dropped == 3
+
+
+def test_read_after_stop_returns_none():
+    hub = SourceHub(FakeSource(), ring_size=4, pool_size=8)
+    sub = hub.subscribe("task", LATEST)
+    hub.publish(get_frame(1))
+
+    hub.stop()
+    hub.clear_ring()
+    assert sub.read(timeout=0) is None
+    assert hub.get_latest() is None
+
+
+def test_released_buffers_go_back_to_pool():
+    hub = SourceHub(FakeSource(), ring_size=2, pool_size=3)
+    sub = hub.subscribe("task", LATEST)
+    for val in range(10):
+        hub.publish(get_frame(val))
+        sub.read(timeout=0).release()
+    assert hub.pool.get_stats()["overflow"] == 0
@@ -0,0 +1,48 @@
+import threading
+
+from web.ai.pool import ModelPool
+from web.ai.infer_queue import InferQueue
+
+from conftest import FakeModel
+
+
+KEY = ModelPool.get_key("model.xml", "CPU", "openvino")
+
+
+def run_queue(infer_queue, frames=8):
+    req, results = infer_queue.submit(0), []
+    for idx in range(1, frames):
+        results.append(infer_queue.wait(req))
+        req = infer_queue.submit(idx)
+    results.append(infer_queue.wait(req))
+    infer_queue.stop()
+    return results
+
+
+def test_results_keep_the_submitted_order():
+    infer_queue = InferQueue(FakeModel(delay=0.01))
+    assert run_queue(infer_queue) == list(range(8))
+    assert infer_queue.get_stats()["completed"] == 8
+
+
+def test_submit_blocks_until_the_previous_request_is_done():
+    model = FakeModel(delay=0.01)
+    infer_queue = InferQueue(model)
+    first = infer_queue.submit(0)
+    second = infer_queue.submit(1)
+    assert first.event.is_set()
+    assert infer_queue.wait(second) == 1
+    infer_queue.stop()
+    assert model.max_running == 1
+
+
+def test_shared_model_is_serialized():
+    pool = ModelPool()
+    model = FakeModel(delay=0.01)
+    a = pool.acquire("a", KEY, lambda: model)
+    b = pool.acquire("b", KEY, lambda: FakeModel(delay=0.01))
+    queues = [ InferQueue(a), InferQueue(b) ]
+    threads = [ threading.Thread(target=run_queue, args=(infer_queue,)) for infer_queue in queues ]
+    [ thread.start() for thread in threads ]
+    [ thread.join() for thread in threads ]
+    assert model.max_running == 1
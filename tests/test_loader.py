@@ -0,0 +1,99 @@
+import time, threading
+import pytest
+
+from web.ai.loader import ModelLoader, QUEUED, LOADING, READY, ERROR, STATUS, TASKS
+
+
+class Recorder():
+    """ Record the callbacks of the loader """
+
+    def __init__(self) -> None:
+        self.done       = dict()
+        self.progress   = []
+        self.lock       = threading.Lock()
+
+    def on_done(self, task_uuid, trg, err):
+        self.done[task_uuid] = (trg, err)
+
+    def on_progress(self, task_uuid, info):
+        with self.lock:
+            self.progress.append((task_uuid, info[STATUS]))
+
+    def get_status(self, task_uuid) -> list:
+        return [ status for uuid, status in self.progress if uuid == task_uuid ]
+
+
+def get_load_func(loader, device, task_uuid, counter, result="model", delay=0.1, error=None):
+    def load_func():
+        with loader.limit_device(device, task_uuid):
+            with counter["lock"]:
+                counter["running"] += 1
+                counter["max"] = max(counter["max"], counter["running"])
+            time.sleep(delay)
+            with counter["lock"]:
+                counter["running"] -= 1
+            if error is not None:
+                raise error
+            return result
+    return load_func
+
+
+def get_counter() -> dict:
+    return { "lock": threading.Lock(), "running": 0, "max": 0 }
+
+
+def test_model_is_loaded_in_background():
+    loader, recorder = ModelLoader(), Recorder()
+    func = get_load_func(loader, "CPU", "a", get_counter())
+    loader.submit("a", "CPU", func, recorder.on_done, recorder.on_progress)
+    assert loader.is_loading("a")
+
+    assert loader.wait("a", 3)
+    assert not loader.is_loading("a")
+    assert recorder.done["a"] == ("model", None)
+    assert recorder.get_status("a") == [ QUEUED, LOADING, READY ]
+    assert loader.get_stats()[TASKS]["a"][STATUS] == READY
+
+
+def test_loads_on_the_same_device_are_limited():
+    loader, recorder, counter = ModelLoader(limit=1), Recorder(), get_counter()
+    for task_uuid in ("a", "b", "c"):
+        loader.submit(task_uuid, "GPU", get_load_func(loader, "GPU", task_uuid, counter), recorder.on_done)
+    for task_uuid in ("a", "b", "c"):
+        assert loader.wait(task_uuid, 3)
+    assert counter["max"] == 1
+
+
+def test_loads_on_different_devices_run_in_parallel():
+    loader, recorder, counter = ModelLoader(limit=1), Recorder(), get_counter()
+    t_start = time.time()
+    for task_uuid, device in (("a", "CPU"), ("b", "GPU")):
+        loader.submit(task_uuid, device, get_load_func(loader, device, task_uuid, counter, delay=0.2), recorder.on_done)
+    for task_uuid in ("a", "b"):
+        assert loader.wait(task_uuid, 3)
+    assert counter["max"] == 2
+    assert time.time() - t_start < 0.35
+
+
+def test_error_is_passed_to_the_callback():
+    loader, recorder = ModelLoader(), Recorder()
+    error = ValueError("broken model")
+    func = get_load_func(loader, "CPU", "a", get_counter(), error=error)
+    loader.submit("a", "CPU", func, recorder.on_done, recorder.on_progress)
+
+    assert loader.wait("a", 3)
+    assert recorder.done["a"] == (None, error)
+    assert recorder.get_status("a")[-1] == ERROR
+
+    # The task could load again after the error
+    loader.submit("a", "CPU", get_load_func(loader, "CPU", "a", get_counter()), recorder.on_done)
+    assert loader.wait("a", 3) and recorder.done["a"] == ("model", None)
+
+
+def test_task_could_not_load_twice_at_the_same_time():
+    loader, recorder = ModelLoader(), Recorder()
+    loader.submit("a", "CPU", get_load_func(loader, "CPU", "a", get_counter(), delay=0.2), recorder.on_done)
+    with pytest.raises(RuntimeError):
+        loader.submit("a", "CPU", get_load_func(loader, "CPU", "a", get_counter()), recorder.on_done)
+    assert loader.wait("a", 3)
+    assert loader.wait("unknown", 0)
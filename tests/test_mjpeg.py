@@ -0,0 +1,129 @@
+import time, queue, threading
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from web.tools.mjpeg import MjpegBroadcaster, MjpegRelay, BOUNDARY, SENT, SKIPPED, ENCODED, DROPPED
+
+
+class FakeBuffer():
+
+    def __init__(self, value) -> None:
+        self.array = np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def decode(part:bytes) -> int:
+    assert part.startswith("--{}\r\n".format(BOUNDARY).encode())
+    jpeg = part.split(b"\r\n\r\n", 1)[1][:-2]
+    return int(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)[0, 0, 0])
+
+
+def wait_clients(broadcaster, num, timeout=3):
+    t_end = time.time() + timeout
+    while len(broadcaster.clients) != num and time.time() < t_end:
+        time.sleep(0.01)
+    assert len(broadcaster.clients) == num
+
+
+def test_nothing_is_encoded_without_clients():
+    broadcaster = MjpegBroadcaster()
+    broadcaster.submit(FakeBuffer(100))
+    assert broadcaster.get_stats()[ENCODED] == 0
+    assert broadcaster.jpeg is None
+
+
+def test_clients_share_the_encoded_frame():
+    broadcaster = MjpegBroadcaster()
+    parts, running = [ [], [] ], threading.Event()
+    running.set()
+
+    def read(idx):
+        for part in broadcaster.stream(keep_running=running.is_set):
+            parts[idx].append(decode(part))
+            if len(parts[idx]) == 2:
+                break
+
+    threads = [ threading.Thread(target=read, args=(idx,), daemon=True) for idx in range(2) ]
+    for thread in threads:
+        thread.start()
+    wait_clients(broadcaster, 2)
+
+    broadcaster.submit(FakeBuffer(40))
+    time.sleep(0.1)
+    broadcaster.submit(FakeBuffer(200))
+    for thread in threads:
+        thread.join(3)
+
+    assert broadcaster.get_stats()[ENCODED] == 2
+    for values in parts:
+        assert len(values) == 2
+        assert abs(values[0] - 40) < 4 and abs(values[1] - 200) < 4
+    wait_clients(broadcaster, 0)
+
+
+def test_slow_client_skips_to_the_newest_frame():
+    broadcaster = MjpegBroadcaster()
+    stream = broadcaster.stream()
+    broadcaster.clients[-1] = {}     # someone is watching before the generator starts
+    for value in (10, 20, 30):
+        broadcaster.submit(FakeBuffer(value))
+    broadcaster.clients.pop(-1)
+
+    part = next(stream)
+    assert abs(decode(part) - 30) < 4
+    client = list(broadcaster.clients.values())[0]
+    assert client[SKIPPED] == 0     # the newest frame before joining is sent first
+
+    for value in (40, 50, 60):
+        broadcaster.submit(FakeBuffer(value))
+    assert abs(decode(next(stream)) - 60) < 4
+    assert client[SKIPPED] == 2 and client[SENT] == 1
+
+    stream.close()
+    assert not broadcaster.clients
+
+
+def test_client_fps_is_limited():
+    broadcaster = MjpegBroadcaster()
+    stream = broadcaster.stream(max_fps=10)
+    broadcaster.publish_jpeg(b"a")
+    next(stream)
+
+    t_start = time.time()
+    broadcaster.publish_jpeg(b"b")
+    next(stream)
+    assert time.time() - t_start >= 0.08
+    stream.close()
+
+
+def test_snapshot_waits_for_the_next_frame():
+    broadcaster = MjpegBroadcaster()
+    broadcaster.publish_jpeg(b"old")
+    assert broadcaster.snapshot(timeout=0.05) is None
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(broadcaster.snapshot(timeout=3)), daemon=True)
+    thread.start()
+    t_end = time.time() + 3
+    while not broadcaster.has_clients() and time.time() < t_end:
+        time.sleep(0.01)
+
+    broadcaster.submit(FakeBuffer(120))
+    thread.join(3)
+    assert result and result[0] == broadcaster.jpeg
+    assert not broadcaster.has_clients()
+
+
+def test_relay_drops_the_frame_if_the_queue_is_full():
+    jpeg_queue, active = queue.Queue(maxsize=1), [ False ]
+    relay = MjpegRelay(jpeg_queue, lambda: active[0])
+    relay.submit(FakeBuffer(0))
+    assert relay.get_stats()[ENCODED] == 0
+
+    active[0] = True
+    relay.submit(FakeBuffer(0))
+    relay.submit(FakeBuffer(0))
+    stats = relay.get_stats()
+    assert stats[ENCODED] == 2 and stats[DROPPED] == 1
+    assert jpeg_queue.qsize() == 1
@@ -0,0 +1,53 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from web.tools.motion import get_motion_gate, MotionGate, DIFF
+
+
+def frame_with_box(x=0, size=40):
+    frame = np.zeros((240, 320, 3), np.uint8)
+    if size:
+        frame[100:100 + size, x:x + size] = 255
+    return frame
+
+
+def test_static_frame_reuses_the_result():
+    gate = MotionGate(refresh=0)
+    assert gate.check(frame_with_box(0))
+    assert not gate.check(frame_with_box(0))
+    assert gate.check(frame_with_box(200))
+
+    stats = gate.get_stats()
+    assert stats["inferred"] == 2 and stats["skipped"] == 1
+
+
+def test_refresh_and_reset_force_the_inference():
+    gate = MotionGate(refresh=0.05)
+    assert gate.check(frame_with_box(0))
+    assert not gate.check(frame_with_box(0))
+    gate.t_infer -= 0.1
+    assert gate.check(frame_with_box(0))
+
+    gate.reset()
+    assert gate.check(frame_with_box(0))
+
+
+def test_slow_motion_is_accumulated_against_the_inferred_frame():
+    gate = MotionGate(thres=0.05, refresh=0)
+    assert gate.check(frame_with_box(0, size=80))
+    results = [ gate.check(frame_with_box(x, size=80)) for x in range(4, 80, 4) ]
+    assert not results[0] and any(results)
+
+
+@pytest.mark.parametrize("value, method", [
+    (None, None), (False, None), ("false", None), (True, DIFF), ("true", DIFF), ("mog2", "mog2") ])
+def test_gate_of_the_application_block(value, method):
+    gate = get_motion_gate({ "motion_gate": value })
+    assert (gate.method if gate is not None else None) == method
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        MotionGate(method="optical")
@@ -0,0 +1,43 @@
+import time
+import pytest
+
+from web.tools.pacer import DeadlinePacer, MAX, SOURCE, FIXED, DEFAULT_FPS
+
+
+def test_fps_of_each_mode():
+    assert DeadlinePacer(SOURCE, 25).fps == 25
+    assert DeadlinePacer(FIXED, 25, target_fps=10).fps == 10
+    assert DeadlinePacer(FIXED, 25).fps == 25
+    assert DeadlinePacer(SOURCE, 0).fps == DEFAULT_FPS
+    with pytest.raises(ValueError):
+        DeadlinePacer("slow")
+
+
+def test_ticks_follow_the_absolute_deadlines():
+    pacer = DeadlinePacer(FIXED, target_fps=100)
+    t_start = time.perf_counter()
+    for _ in range(11):
+        pacer.wait()
+    assert time.perf_counter() - t_start == pytest.approx(0.1, abs=0.03)
+    assert pacer.missed == 0
+
+
+def test_late_loop_skips_the_missed_deadlines():
+    pacer = DeadlinePacer(FIXED, target_fps=100)
+    pacer.wait()
+    time.sleep(0.055)
+    pacer.wait()
+    assert pacer.missed in [ 4, 5 ]
+
+    # The next deadline is in the next slot instead of bursting
+    t_start = time.perf_counter()
+    pacer.wait()
+    assert time.perf_counter() - t_start < 0.02
+
+
+def test_max_mode_never_waits():
+    pacer = DeadlinePacer(MAX)
+    t_start = time.perf_counter()
+    [ pacer.wait() for _ in range(100) ]
+    assert time.perf_counter() - t_start < 0.05
+    assert pacer.get_stats()["target"] is None
@@ -0,0 +1,84 @@
+from web.ai.pool import ModelPool, MB
+from web.ai.infer_queue import InferQueue
+
+from conftest import FakeModel
+
+
+KEY     = ModelPool.get_key("model.xml", "CPU", "openvino", { "thres": 0.5 })
+OTHER   = ModelPool.get_key("model.xml", "CPU", "openvino", { "thres": 0.6 })
+
+
+def test_tasks_share_the_same_model():
+    pool = ModelPool()
+    loaded = []
+    def load():
+        loaded.append(FakeModel())
+        return loaded[-1]
+
+    a = pool.acquire("a", KEY, load)
+    b = pool.acquire("b", KEY, load)
+    c = pool.acquire("c", OTHER, load)
+    assert len(loaded) == 2
+    assert a.entry is b.entry and a.entry is not c.entry
+
+    a.release()
+    assert not loaded[0].released
+    b.release()
+    assert loaded[0].released
+
+
+def test_idle_model_is_reused_from_cache():
+    pool = ModelPool(budget=1)
+    model = FakeModel()
+    pool.acquire("a", KEY, lambda: model).release()
+    assert not model.released
+
+    b = pool.acquire("b", KEY, FakeModel)
+    assert b.entry.trg is model
+    assert pool.get_stats()["cache"]["hits"] == 1
+
+
+def test_least_recently_used_model_is_evicted():
+    pool = ModelPool(budget=1)
+    first, second = FakeModel(), FakeModel()
+    a = pool.acquire("a", KEY, lambda: first)
+    b = pool.acquire("b", OTHER, lambda: second)
+    a.entry.size = b.entry.size = MB
+
+    a.release()
+    b.release()
+    assert first.released and not second.released
+    assert pool.get_stats()["cache"]["evictions"] == 1
+
+
+def test_model_keeps_sync_mode_and_is_cached():
+    pool = ModelPool(budget=1)
+    model = FakeModel()
+    a = pool.acquire("a", KEY, lambda: model)
+    a.set_async_mode()
+    assert not model.async_mode
+
+    a.release()
+    assert not model.released
+    b = pool.acquire("b", KEY, FakeModel)
+    assert b.entry.trg is model
+
+
+def test_streaming_model_is_shared_with_next_task():
+    pool = ModelPool()
+    loaded = []
+    def load():
+        loaded.append(FakeModel())
+        return loaded[-1]
+
+    # Run A, start the stream of A, then run B
+    a = pool.acquire("a", KEY, load)
+    infer_queue = InferQueue(a)
+    assert infer_queue.wait(infer_queue.submit(1)) == 1
+    b = pool.acquire("b", KEY, load)
+    assert len(loaded) == 1 and a.entry is b.entry
+    assert not loaded[0].async_mode
+
+    infer_queue.stop()
+    a.release()
+    b.release()
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from web.tools.roi import get_roi_cropper, is_roi_enabled, merge_rects, ROICropper, ROIModel
+
+from conftest import FakeModel
+
+ZONES = [ [ [100, 100], [200, 100], [200, 200], [100, 200] ], [ [400, 300], [500, 300], [500, 400] ] ]
+
+
+def detect_center(frame):
+    """ Detect one box at the center of each crop """
+    hei, wid = frame.shape[:2]
+    return { "detections": [ { "xmin": wid // 2 - 5, "ymin": hei // 2 - 5, "xmax": wid // 2 + 5, "ymax": hei // 2 + 5,
+        "label": "a", "score": 0.9 } ] }
+
+
+def test_rect_mode_crops_the_bounding_rectangle():
+    cropper = ROICropper(ZONES, mode="rect", margin=0)
+    assert cropper.get_regions((480, 640, 3)) == [ (100, 100, 500, 400) ]
+
+
+def test_zones_mode_crops_each_zone_with_margin():
+    cropper = ROICropper(ZONES, mode="zones", margin=0.1)
+    assert cropper.get_regions((480, 640, 3)) == [ (90, 90, 210, 210), (390, 290, 510, 410) ]
+    assert cropper.get_stats()["area_ratio"] < 0.1
+
+
+def test_overlapped_rects_are_merged():
+    assert merge_rects([ (0, 0, 10, 10), (5, 5, 20, 20), (30, 30, 40, 40) ]) == [ (0, 0, 20, 20), (30, 30, 40, 40) ]
+
+
+def test_detections_are_mapped_back_to_the_frame():
+    model = FakeModel(detect_center)
+    roi_model = ROIModel(model, ROICropper(ZONES, mode="zones", margin=0))
+    info = roi_model.inference(np.zeros((480, 640, 3), np.uint8))
+
+    assert [ frame.shape[:2] for frame in model.frames ] == [ (100, 100), (100, 100) ]
+    assert [ (det["xmin"], det["ymin"]) for det in info["detections"].to_dicts() ] == [ (145, 145), (445, 345) ]
+    assert not roi_model.released
+
+
+def test_cropper_of_the_pipeline_block():
+    assert not is_roi_enabled({ "roi": "false" })
+    assert get_roi_cropper({ "roi": True }, { "area_points": ZONES }).mode == "rect"
+    assert get_roi_cropper({ "roi": "zones" }, { "area_points": ZONES }).mode == "zones"
+    assert get_roi_cropper({ "roi": True }, { "area_points": [] }) is None
+    assert get_roi_cropper({}, { "area_points": ZONES }) is None
+    with pytest.raises(ValueError):
+        ROICropper(ZONES, mode="circle")
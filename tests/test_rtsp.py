@@ -0,0 +1,131 @@
+import time, threading
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from web.tools.frame_pool import FramePool
+from web.tools.rtsp import RtspWritter, OutputWriter, define_gst_pipeline
+
+
+class FakeVideoWriter():
+    """ Record the written frames instead of the GStreamer pipeline """
+
+    def __init__(self, delay=0, fail=False) -> None:
+        self.frames     = []
+        self.delay      = delay
+        self.fail       = fail
+        self.gate       = threading.Event()
+        self.gate.set()
+
+    def write(self, frame):
+        self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("pipeline error")
+        time.sleep(self.delay)
+        self.frames.append(int(frame[0, 0, 0]))
+
+    def release(self):
+        pass
+
+
+class FakeWritter(RtspWritter):
+
+    def open(self, settings=None):
+        return FakeVideoWriter()
+
+
+def get_writer(**kwargs):
+    return FakeWritter("uuid", "intel", 4, 4, 30, **kwargs)
+
+
+def submit_frames(writer, pool, values):
+    for val in values:
+        buf = pool.acquire()
+        buf.array[:] = val
+        try:
+            writer.submit(buf, val)
+        finally:
+            buf.release()
+
+
+def wait_written(writer, num, timeout=3):
+    t_end = time.time() + timeout
+    while writer.written < num and time.time() < t_end:
+        time.sleep(0.01)
+
+
+def test_each_frame_is_written_once_and_released():
+    pool = FramePool((4, 4, 3), size=4)
+    writer = get_writer(queue_size=4)
+    submit_frames(writer, pool, [ 1, 2, 3 ])
+    wait_written(writer, 3)
+
+    # Nothing is repeated while no frame comes
+    time.sleep(0.2)
+    assert writer.out.frames == [ 1, 2, 3 ]
+    assert pool.get_stats()["in_use"] == 0
+    writer.release()
+
+
+def test_queue_drops_the_oldest_frame_when_the_encoder_is_behind():
+    pool = FramePool((4, 4, 3), size=8)
+    writer = get_writer(queue_size=2)
+    writer.out.gate.clear()
+    submit_frames(writer, pool, [ 1 ])
+    wait_time = time.time() + 1
+    while writer.queue.occupancy() and time.time() < wait_time:
+        time.sleep(0.01)
+
+    submit_frames(writer, pool, [ 2, 3, 4, 5 ])
+    writer.out.gate.set()
+    wait_written(writer, 3)
+
+    assert writer.out.frames == [ 1, 4, 5 ]
+    assert writer.get_stats()["dropped"] == 2
+    writer.release()
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_duplicated_index_is_counted():
+    pool = FramePool((4, 4, 3), size=4)
+    writer = get_writer(queue_size=4)
+    submit_frames(writer, pool, [ 1, 1, 2 ])
+    wait_written(writer, 3)
+    assert writer.get_stats()["duplicated"] == 1
+    writer.release()
+
+
+def test_pipeline_error_is_raised_by_submit():
+    pool = FramePool((4, 4, 3), size=4)
+    writer = get_writer()
+    writer.out.fail = True
+    submit_frames(writer, pool, [ 1 ])
+    writer.worker.join(3)
+
+    assert not writer.is_running()
+    with pytest.raises(RuntimeError):
+        submit_frames(writer, pool, [ 2 ])
+    assert pool.get_stats()["in_use"] == 0
+
+
+def test_unwatched_output_is_sent_once_per_keepalive():
+    pool = FramePool((4, 4, 3), size=4)
+    writer = get_writer(queue_size=8)
+    output = OutputWriter(lambda: writer, is_watched=lambda: False)
+    for val in range(5):
+        buf = pool.acquire()
+        buf.array[:] = val
+        output.submit(buf, val)
+        buf.release()
+    wait_written(writer, 1)
+    time.sleep(0.1)
+
+    assert writer.out.frames == [ 0 ]
+    output.release()
+
+
+def test_pipeline_is_stamped_by_the_running_time():
+    pipeline = define_gst_pipeline(1280, 720, 25, "rtsp://localhost:8554/uuid")
+    assert "do-timestamp=true" in pipeline
+    assert "videorate ! video/x-raw,framerate=25/1" in pipeline
@@ -0,0 +1,85 @@
+import time, threading
+
+from web.ai.pool import ModelPool
+from web.ai.scheduler import InferenceScheduler, get_scheduler_key
+
+from conftest import FakeModel, FakeBatchModel
+
+def name_result(frame):
+    return ("model", frame)
+
+
+def run_tasks(models, frames=8):
+    """ Each task submits the frames from its own thread, return the results of each task """
+    results = { task: [] for task in models }
+    def run(task, infer):
+        for idx in range(frames):
+            results[task].append(infer.inference((task, idx)))
+
+    threads = [ threading.Thread(target=run, args=(task, infer)) for task, infer in models.items() ]
+    [ thread.start() for thread in threads ]
+    [ thread.join(5) for thread in threads ]
+    return results
+
+
+def test_frames_of_tasks_are_batched():
+    model = FakeBatchModel(name_result)
+    sched = InferenceScheduler(max_batch=4, max_wait=50)
+    models = { task: sched.register(task, model) for task in [ "a", "b", "c" ] }
+    results = run_tasks(models)
+
+    for task, items in results.items():
+        assert items == [ ("model", (task, idx)) for idx in range(8) ]
+    assert sched.frames == 24
+    assert max(model.sizes) > 1
+
+    [ sched.unregister(task) for task in models ]
+    assert sched.is_stop
+
+
+def test_model_without_batch_runs_one_by_one():
+    model = FakeModel(name_result)
+    sched = InferenceScheduler(max_batch=4, max_wait=1000)
+    models = { task: sched.register(task, model) for task in [ "a", "b", "c" ] }
+
+    # The frames are not held for max_wait since they could not be batched
+    t_start = time.time()
+    models["a"].inference(0)
+    assert time.time() - t_start < 0.5
+
+    run_tasks(models, frames=4)
+    assert model.sizes == [ 1 ] * 13
+    stats = sched.get_stats()
+    assert not stats["batching"] and stats["efficiency"] is None and stats["avg_batch"] == 1
+    [ sched.unregister(task) for task in models ]
+
+
+def test_pooled_model_batch_is_serialized():
+    pool = ModelPool()
+    key = ModelPool.get_key("model.xml", "CPU", "openvino")
+    a = pool.acquire("a", key, lambda: FakeBatchModel(name_result))
+    assert a.inference_batch([ 1, 2 ]) == [ ("model", 1), ("model", 2) ]
+
+    # The batch holds the model like `inference` does
+    inflight = []
+    a.entry.trg.inference_batch = lambda frames: inflight.append(a.entry.inflight)
+    a.inference_batch([ 1 ])
+    assert inflight == [ 1 ] and a.entry.inflight == 0
+
+    other = ModelPool.get_key("other.xml", "CPU", "openvino")
+    assert getattr(pool.acquire("b", other, FakeModel), "inference_batch", None) is None
+
+
+def test_scheduler_key_follows_model_pool():
+    pool = ModelPool()
+    key = ModelPool.get_key("model.xml", "CPU", "openvino", { "thres": 0.5 })
+    other = ModelPool.get_key("model.xml", "CPU", "openvino", { "thres": 0.6 })
+    a = pool.acquire("a", key, FakeModel)
+    b = pool.acquire("b", key, FakeModel)
+    c = pool.acquire("c", other, FakeModel)
+
+    assert get_scheduler_key(a) == get_scheduler_key(b)
+    assert get_scheduler_key(a) != get_scheduler_key(c)
+
+    first, second = FakeModel(), FakeModel()
+    assert get_scheduler_key(first) != get_scheduler_key(second)
@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from web.tools.hub import SourceHub, LATEST
+from web.tools.frame_cache import FrameCache, FULL, THUMB
+
+
+class FakeSource():
+
+    def get_fps(self):
+        return 30
+
+    def get_shape(self):
+        return (48, 64)
+
+
+def get_frame(val):
+    return np.full((48, 64, 3), val, np.uint8)
+
+
+def encode_latest(hub, cache, variant=FULL):
+    """ The live path of the snapshot endpoint, the frame is keyed by the hub and its sequence """
+    seq, buf = hub.get_latest(with_seq=True)
+    try:
+        idx = (id(hub), seq)
+        cache.get("src", buf.array, idx, THUMB)
+        return cache.get("src", buf.array, idx, variant)
+    finally:
+        buf.release()
+
+
+def test_snapshot_does_not_move_the_cursor_of_the_task():
+    hub = SourceHub(FakeSource(), ring_size=4, pool_size=8)
+    sub = hub.subscribe("task", LATEST)
+    hub.publish(get_frame(1))
+
+    seq, buf = hub.get_latest(with_seq=True)
+    assert seq == 1 and buf.array[0, 0, 0] == 1
+    buf.release()
+
+    buf = sub.read(timeout=0)
+    assert buf.array[0, 0, 0] == 1 and sub.dropped == 0
+    buf.release()
+
+
+def test_polling_the_same_frame_encodes_once():
+    hub, cache = SourceHub(FakeSource(), ring_size=4, pool_size=8), FrameCache()
+    hub.publish(get_frame(1))
+    first = encode_latest(hub, cache)
+    assert encode_latest(hub, cache) is first
+
+    hub.publish(get_frame(2))
+    assert encode_latest(hub, cache) is not first
+    assert cache.get_stats()["misses"] == 4     # the thumbnail and the full frame of each one
+
+
+def test_stopped_source_returns_the_cached_thumbnail():
+    hub, cache = SourceHub(FakeSource(), ring_size=4, pool_size=8), FrameCache()
+    hub.publish(get_frame(1))
+    encode_latest(hub, cache)
+
+    hub.stop()
+    hub.clear_ring()
+    assert hub.get_latest(with_seq=True)[1] is None
+    thumb = cache.peek("src", [ THUMB, FULL ])
+    assert thumb is cache.peek("src", [ THUMB ])
+    assert cache.peek("other", [ THUMB, FULL ]) is None
+
+
+def test_snapshot_returns_the_buffer_to_pool():
+    hub, cache = SourceHub(FakeSource(), ring_size=2, pool_size=3), FrameCache()
+    for val in range(10):
+        hub.publish(get_frame(val))
+        encode_latest(hub, cache)
+    assert hub.pool.get_stats()["overflow"] == 0
@@ -0,0 +1,84 @@
+import time, threading
+import pytest
+
+from web.tools.stage import StageQueue, StageClosed, StagePipeline, DROP_OLDEST, DROP_NEWEST, BLOCK
+
+
+def test_drop_oldest_keeps_the_newest_items():
+    dropped = []
+    q = StageQueue(2, DROP_OLDEST, on_drop=dropped.append)
+    assert all([ q.put(item) for item in range(4) ])
+    assert [ q.get(0), q.get(0) ] == [ 2, 3 ]
+    assert dropped == [ 0, 1 ] and q.dropped == 2
+
+
+def test_drop_newest_keeps_the_oldest_items():
+    dropped = []
+    q = StageQueue(2, DROP_NEWEST, on_drop=dropped.append)
+    assert [ q.put(item) for item in range(4) ] == [ True, True, False, False ]
+    assert [ q.get(0), q.get(0) ] == [ 0, 1 ]
+    assert dropped == [ 2, 3 ]
+
+
+def test_block_waits_for_the_consumer():
+    q = StageQueue(1, BLOCK)
+    q.put(0)
+    assert not q.put(1, timeout=0.01)
+
+    threading.Timer(0.05, q.get).start()
+    assert q.put(2, timeout=1)
+    assert q.get(0) == 2 and q.dropped == 0
+
+
+def test_closed_queue_drops_new_items_and_raises_when_empty():
+    q = StageQueue(2, DROP_OLDEST)
+    q.put(0)
+    q.close()
+    assert not q.put(1)
+    assert q.get(0) == 0
+    with pytest.raises(StageClosed):
+        q.get(0)
+
+
+def test_unexpected_policy():
+    with pytest.raises(ValueError):
+        StageQueue(2, "drop_random")
+
+
+def test_pipeline_runs_the_stages_in_order():
+    items, results = iter(range(5)), []
+    def source():
+        try:
+            return next(items)
+        except StopIteration:
+            time.sleep(0.01)
+            return None
+
+    pipeline = StagePipeline([
+        ( "source", source ),
+        ( "double", lambda item: item * 2, { "queue_size": 8, "policy": BLOCK } ),
+        ( "sink", results.append, { "queue_size": 8, "policy": BLOCK } ) ])
+    pipeline.start()
+    t_end = time.time() + 2
+    while len(results) < 5 and time.time() < t_end:
+        time.sleep(0.01)
+    pipeline.stop()
+    pipeline.join(1)
+
+    assert results == [ 0, 2, 4, 6, 8 ]
+    assert pipeline.get_error() is None
+    assert set(pipeline.get_stats()["stages"]) == { "source", "double", "sink" }
+
+
+def test_error_of_a_stage_stops_the_pipeline():
+    def fail(item):
+        raise RuntimeError("boom")
+
+    pipeline = StagePipeline([ ( "source", lambda: 1 ), ( "fail", fail ) ])
+    pipeline.start()
+    t_end = time.time() + 2
+    while pipeline.is_running() and time.time() < t_end:
+        time.sleep(0.01)
+    pipeline.stop()
+    pipeline.join(1)
+    assert isinstance(pipeline.get_error(), RuntimeError)
@@ -0,0 +1,57 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from web.tools.detection import Detections
+from web.tools.stride import get_stride_controller, StrideController, BoxPropagator
+
+
+def get_frame(x, y):
+    """ A textured square on the plain background, so the optical flow has features to follow """
+    frame = np.full((240, 320, 3), 40, np.uint8)
+    patch = np.random.RandomState(0).randint(0, 255, (60, 60, 3)).astype(np.uint8)
+    frame[y:y + 60, x:x + 60] = patch
+    return frame
+
+
+def test_fixed_stride_runs_the_detector_every_n_frames():
+    stride = StrideController(1 / 30, stride=3)
+    assert [ stride.need_inference() for _ in range(7) ] == [ True, False, False, True, False, False, True ]
+
+    stride.reset()
+    assert stride.need_inference()
+    assert stride.get_stats()["propagated"] == 4
+
+
+def test_auto_stride_fits_the_frame_budget():
+    stride = StrideController(1 / 30, stride="auto", max_stride=4)
+    stride.update(20)
+    assert stride.stride == 1
+    for _ in range(30):
+        stride.update(80)
+    assert stride.stride == 3
+    for _ in range(30):
+        stride.update(1000)
+    assert stride.stride == 4
+
+
+def test_controller_of_the_pipeline_block():
+    assert get_stride_controller({}, 1 / 30) is None
+    assert get_stride_controller({ "stride": "1" }, 1 / 30) is None
+    assert get_stride_controller({ "stride": "auto", "max_stride": 2 }, 1 / 30).max_stride == 2
+
+
+def test_boxes_follow_the_motion():
+    propagator = BoxPropagator()
+    dets = Detections.from_dicts([ { "xmin": 100, "ymin": 80, "xmax": 160, "ymax": 140, "label": "a", "score": 0.9 } ])
+    propagator.set_reference(get_frame(100, 80), dets)
+
+    moved = propagator.propagate(get_frame(106, 83))
+    assert np.allclose(moved.boxes[0], [ 106, 83, 166, 143 ], atol=1.5)
+    assert dets.boxes[0].tolist() == [ 100, 80, 160, 140 ]
+    assert moved.to_dicts()[0]["label"] == "a"
+
+
+def test_propagation_without_reference_keeps_the_boxes():
+    assert len(BoxPropagator().propagate(get_frame(0, 0))) == 0
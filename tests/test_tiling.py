@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from web.tools.tiling import get_starts, nms, is_tiling_enabled, get_tiler, TiledInference
+
+from conftest import FakeModel
+
+
+def test_tiles_cover_the_frame_with_overlap():
+    assert get_starts(100, 200, 0.2) == [ 0 ]
+    starts = get_starts(1000, 400, 0.2)
+    assert starts[0] == 0 and starts[-1] == 600
+    assert all([ b - a < 400 for a, b in zip(starts, starts[1:]) ])
+
+
+def test_tile_is_enlarged_to_limit_the_number_of_tiles():
+    tiler = TiledInference(tile_size=200, overlap=0.2, max_tiles=4)
+    tiles = tiler.get_tiles((1080, 1920, 3))
+    assert len(tiles) <= 4
+    assert max([ x2 for _, _, x2, _ in tiles ]) == 1920 and max([ y2 for _, _, _, y2 in tiles ]) == 1080
+
+
+def test_full_frame_counts_in_max_tiles():
+    model = FakeModel(detect_one_box)
+    for max_tiles in [ 1, 2, 4, 6 ]:
+        model.frames.clear()
+        TiledInference(tile_size=200, overlap=0.2, max_tiles=max_tiles, full=True).inference(
+            model, np.zeros((1080, 1920, 3), np.uint8))
+        assert 1 <= len(model.frames) <= max_tiles
+        assert [ frame.shape[:2] for frame in model.frames ].count((1080, 1920)) == 1
+
+
+def test_nms_keeps_the_best_box_of_each_label():
+    boxes = np.array([ [0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10], [50, 50, 60, 60] ], np.float64)
+    scores = np.array([ 0.6, 0.9, 0.5, 0.4 ])
+    labels = np.array([ "a", "a", "b", "a" ])
+    assert sorted(nms(boxes, scores, labels, 0.5).tolist()) == [ 1, 2, 3 ]
+    assert len(nms(np.empty((0, 4)), np.empty(0), np.empty(0), 0.5)) == 0
+
+
+@pytest.mark.parametrize("value, enabled", [
+    (True, True), ("true", True), (False, False), ("false", False), ("False", False), ("", False), (None, False) ])
+def test_string_flag_of_the_pipeline_block(value, enabled):
+    assert is_tiling_enabled({ "tiling": value }) is enabled
+    assert (get_tiler({ "tiling": value }) is not None) is enabled
+
+
+def detect_one_box(frame):
+    """ Detect one box at the same place of each crop """
+    return { "detections": [ { "xmin": 10, "ymin": 10, "xmax": 20, "ymax": 20, "label": "a", "score": 0.5 } ] }
+
+
+def test_detections_of_the_tiles_are_merged_into_the_frame():
+    model = FakeModel(detect_one_box)
+    tiler = TiledInference(tile_size=100, overlap=0, max_tiles=5, full=True)
+    info = tiler.inference(model, np.zeros((200, 200, 3), np.uint8))
+
+    assert len(model.frames) == 5
+    boxes = sorted([ (det["xmin"], det["ymin"]) for det in info["detections"].to_dicts() ])
+    assert boxes == [ (10, 10), (10, 110), (110, 10), (110, 110) ]
@@ -0,0 +1,52 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from web.tools.detection import Detections
+from web.tools.tracker import IoUTracker, iou_matrix, greedy_match, is_tracker_enabled, get_tracker
+
+
+def get_dets(boxes, labels=None):
+    dets = [ { "xmin": x1, "ymin": y1, "xmax": x2, "ymax": y2, "label": (labels or [ "a" ] * len(boxes))[idx], "score": 0.9 }
+        for idx, (x1, y1, x2, y2) in enumerate(boxes) ]
+    return Detections.from_dicts(dets)
+
+
+def test_iou_and_greedy_match():
+    a = np.array([ [0, 0, 10, 10], [20, 20, 30, 30] ], np.float64)
+    b = np.array([ [20, 20, 30, 30], [0, 0, 10, 5] ], np.float64)
+    scores = iou_matrix(a, b)
+    assert scores[0, 1] == pytest.approx(0.5) and scores[1, 0] == pytest.approx(1)
+
+    rows, cols = greedy_match(scores, 0.3)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [ (0, 1), (1, 0) ]
+
+
+def test_track_id_is_stable_between_frames():
+    tracker = IoUTracker()
+    first = tracker.update(get_dets([ [0, 0, 10, 10], [50, 50, 60, 60] ]))
+    second = tracker.update(get_dets([ [52, 52, 62, 62], [1, 1, 11, 11] ]))
+    assert first.track_ids.tolist() == [ 1, 2 ]
+    assert second.track_ids.tolist() == [ 2, 1 ]
+
+
+def test_different_label_is_not_matched():
+    tracker = IoUTracker()
+    tracker.update(get_dets([ [0, 0, 10, 10] ], [ "a" ]))
+    ret = tracker.update(get_dets([ [0, 0, 10, 10] ], [ "b" ]))
+    assert ret.track_ids.tolist() == [ 2 ]
+
+
+def test_lost_track_is_removed_after_max_age():
+    tracker = IoUTracker(max_age=1)
+    tracker.update(get_dets([ [0, 0, 10, 10] ]))
+    tracker.update(get_dets([]))
+    tracker.update(get_dets([]))
+    assert tracker.get_stats()["tracks"] == 0
+    assert tracker.update(get_dets([ [0, 0, 10, 10] ])).track_ids.tolist() == [ 2 ]
+
+
+@pytest.mark.parametrize("value, enabled", [ (True, True), ("true", True), ("false", False), ("False", False), (None, False) ])
+def test_string_flag_of_the_pipeline_block(value, enabled):
+    assert is_tracker_enabled({ "tracker": value }) is enabled
+    assert (get_tracker({ "tracker": value }) is not None) is enabled
@@ -0,0 +1,72 @@
+import time, json, threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from web.tools.viewers import ViewerRegistry
+
+PATHS = { "items": { "a": { "readers": [ { "type": "rtspSession" } ] }, "b": { "readers": [] } } }
+
+
+class PathsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = json.dumps(PATHS).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def wait_probe(registry, timeout=3):
+    registry.get_readers("a")
+    t_end = time.time() + timeout
+    while registry.t_probe == 0 and time.time() < t_end:
+        time.sleep(0.01)
+    assert registry.t_probe > 0
+
+
+def test_lease_keeps_the_task_watched_until_expired():
+    registry = ViewerRegistry(lease=0.05)
+    assert not registry.is_watched("a")
+
+    registry.touch("a", "snapshot")
+    assert registry.is_watched("a") and not registry.is_watched("b")
+    time.sleep(0.1)
+    assert not registry.is_watched("a")
+
+    registry.touch("a", "snapshot")
+    registry.release("a", "snapshot")
+    assert registry.get_leases("a") == 0
+
+
+def test_readers_of_both_api_formats():
+    assert ViewerRegistry.parse_readers(PATHS) == { "a": 1, "b": 0 }
+    items = [ dict(item, name=name) for name, item in PATHS["items"].items() ]
+    assert ViewerRegistry.parse_readers({ "items": items }) == { "a": 1, "b": 0 }
+
+
+def test_readers_are_probed_from_the_rtsp_server():
+    server = HTTPServer(("127.0.0.1", 0), PathsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        registry = ViewerRegistry("http://127.0.0.1:{}/v1/paths/list".format(server.server_port))
+        wait_probe(registry)
+        assert registry.is_watched("a")
+        assert not registry.is_watched("b") and not registry.is_watched("c")
+        assert registry.get_stats("a")["readers"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unknown_readers_are_treated_as_watched():
+    server = HTTPServer(("127.0.0.1", 0), PathsHandler)
+    port = server.server_port
+    server.server_close()
+
+    registry = ViewerRegistry("http://127.0.0.1:{}/v1/paths/list".format(port))
+    wait_probe(registry)
+    assert registry.get_readers("b") is None
+    assert registry.is_watched("b")
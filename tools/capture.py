@@ -0,0 +1,73 @@
+import inspect, logging
+from collections import Counter
+
+# Define Key which declared in the "capture" block of task.json
+CAPTURE     = "capture"
+WIDTH       = "width"
+HEIGHT      = "height"
+FPS         = "fps"
+FORMAT      = "format"      # pixel format of the camera, e.g. MJPG, YUYV
+SCALE       = "scale"       # downscale the decoded frame before sharing it to the tasks, 1 means no scaling
+
+# The possible name of the pixel format argument in `set_cam` of the source object
+FORMAT_ARGS = [ "fourcc", "format", "pixel_format" ]
+
+DEFAULT_PROFILE = {
+    WIDTH   : 1280,
+    HEIGHT  : 720,
+    FPS     : 30,
+    FORMAT  : None,
+    SCALE   : 1
+}
+
+
+def get_profile(capture_conf:dict, default:dict=None) -> dict:
+    """ Return the capture profile of one task, the missing keys come from the default profile """
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(default or {})
+    profile.update({ key: val for key, val in (capture_conf or {}).items() if val is not None })
+
+    for key in [ WIDTH, HEIGHT ]:
+        profile[key] = int(profile[key])
+    profile[FPS] = float(profile[FPS])
+    profile[SCALE] = min(max(float(profile[SCALE]), 0.1), 1)
+    return profile
+
+
+def negotiate_profiles(profiles:list, default:dict=None) -> dict:
+    """ Return the profile which satisfies every task sharing the source, each value is the maximum one,
+    and the pixel format which most tasks asked for """
+    if not profiles:
+        return get_profile({}, default)
+
+    formats = Counter([ profile[FORMAT] for profile in profiles if profile.get(FORMAT) ])
+    return {
+        WIDTH   : max([ profile[WIDTH] for profile in profiles ]),
+        HEIGHT  : max([ profile[HEIGHT] for profile in profiles ]),
+        FPS     : max([ profile[FPS] for profile in profiles ]),
+        FORMAT  : formats.most_common(1)[0][0] if formats else None,
+        SCALE   : max([ profile[SCALE] for profile in profiles ])
+    }
+
+
+def apply_profile(src, profile:dict):
+    """ Setup the camera of the source object with the profile, call it before the source starts """
+    kwargs = {
+        HEIGHT  : profile[HEIGHT],
+        WIDTH   : profile[WIDTH],
+        FPS     : int(profile[FPS]) if float(profile[FPS]).is_integer() else profile[FPS]
+    }
+
+    if profile.get(FORMAT):
+        try:
+            params = inspect.signature(src.set_cam).parameters
+        except (TypeError, ValueError):
+            params = {}
+        arg = next((name for name in FORMAT_ARGS if name in params), None)
+        if arg is not None:
+            kwargs[arg] = profile[FORMAT]
+        else:
+            logging.warning('The source does not support the pixel format ({}), ignore it'.format(profile[FORMAT]))
+
+    src.set_cam(**kwargs)
+    logging.info('Setup the capture profile: {}'.format(profile))
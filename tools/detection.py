@@ -0,0 +1,145 @@
+import numpy as np
+
+# Define Key of the detection
+BOX_KEYS    = [ "xmin", "ymin", "xmax", "ymax" ]
+LABEL       = "label"
+SCORE       = "score"
+CLASS_ID    = "id"
+TRACK_ID    = "track_id"
+DETS        = "detections"
+
+CORE_KEYS   = set(BOX_KEYS + [ LABEL, SCORE, TRACK_ID ])
+
+
+def is_int(val) -> bool:
+    return isinstance(val, (int, np.integer)) and not isinstance(val, bool)
+
+
+class Detections():
+    """ The columnar detections of one frame, the boxes, scores and IDs are kept in arrays.
+
+    The detections are converted from the result of the AI model once by `from_dicts`,
+    the stages work on the arrays and the dictionaries are only produced for the application and the API by `to_dicts`.
+    The detection without box ( e.g. classification ) has NaN in `boxes`,
+    and the boxes which the model gives in integer are returned in integer, the others keep float.
+
+    - Arguments
+        - boxes
+            - type: numpy.ndarray
+            - desc: ( N, 4 ) float64 of xmin, ymin, xmax, ymax
+        - scores
+            - type: numpy.ndarray
+        - class_ids
+            - type: numpy.ndarray
+            - desc: -1 if the model does not provide an integer ID
+        - labels
+            - type: numpy.ndarray
+            - desc: object array of the label name
+        - track_ids
+            - type: numpy.ndarray
+            - desc: 0 means not tracked
+        - extras
+            - type: list
+            - desc: the other keys of each detection
+        - int_boxes
+            - type: numpy.ndarray
+            - desc: True if the model gives the box in integer
+    """
+    def __init__(self, boxes=None, scores=None, class_ids=None, labels=None, track_ids=None, extras=None, int_boxes=None) -> None:
+        self.boxes      = np.empty((0, 4), np.float64) if boxes is None else np.asarray(boxes, np.float64).reshape(-1, 4)
+        num             = len(self.boxes)
+        self.scores     = np.ones(num, np.float64) if scores is None else np.asarray(scores, np.float64)
+        self.class_ids  = np.full(num, -1, np.int32) if class_ids is None else np.asarray(class_ids, np.int32)
+        self.labels     = np.full(num, None, object) if labels is None else np.asarray(labels, object)
+        self.track_ids  = np.zeros(num, np.int64) if track_ids is None else np.asarray(track_ids, np.int64)
+        self.extras     = [ dict() for _ in range(num) ] if extras is None else list(extras)
+        self.int_boxes  = np.ones(num, bool) if int_boxes is None else np.asarray(int_boxes, bool)
+        self.dicts      = None
+
+    @classmethod
+    def from_dicts(cls, dets):
+        """ Convert the detection list of the AI model in one pass """
+        dets = [ det for det in (dets or []) if isinstance(det, dict) ]
+        get = lambda det, key, default: default if det.get(key) is None else det[key]
+        return cls(
+            boxes       = [ [ float(get(det, key, np.nan)) for key in BOX_KEYS ] for det in dets ],
+            scores      = [ float(get(det, SCORE, 1)) for det in dets ],
+            class_ids   = [ int(det[CLASS_ID]) if is_int(det.get(CLASS_ID)) else -1 for det in dets ],
+            labels      = [ det.get(LABEL) for det in dets ],
+            track_ids   = [ int(get(det, TRACK_ID, 0)) for det in dets ],
+            extras      = [ { key: val for key, val in det.items() 
+                if not (key in CORE_KEYS or (key == CLASS_ID and is_int(val))) } for det in dets ],
+            int_boxes   = [ all([ is_int(det.get(key)) for key in BOX_KEYS if det.get(key) is not None ]) for det in dets ] )
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def has_box(self) -> np.ndarray:
+        return ~np.isnan(self.boxes).any(axis=1)
+
+    def select(self, idx):
+        """ Return the detections of the indexes or the boolean mask """
+        idx = np.flatnonzero(idx) if np.asarray(idx).dtype == bool else np.asarray(idx, int)
+        return Detections(self.boxes[idx], self.scores[idx], self.class_ids[idx], self.labels[idx],
+                          self.track_ids[idx], [ self.extras[i] for i in idx.tolist() ], self.int_boxes[idx])
+
+    def shift(self, dx, dy):
+        """ Return the detections which are moved by ( dx, dy ), e.g. from a crop to the full frame """
+        ret = self.select(np.arange(len(self)))
+        ret.boxes += np.array([dx, dy, dx, dy], np.float64)
+        return ret
+
+    @classmethod
+    def concat(cls, dets_list):
+        dets_list = list(dets_list)
+        if not dets_list:
+            return cls()
+        return cls(
+            boxes       = np.concatenate([ dets.boxes for dets in dets_list ]),
+            scores      = np.concatenate([ dets.scores for dets in dets_list ]),
+            class_ids   = np.concatenate([ dets.class_ids for dets in dets_list ]),
+            labels      = np.concatenate([ dets.labels for dets in dets_list ]),
+            track_ids   = np.concatenate([ dets.track_ids for dets in dets_list ]),
+            extras      = sum([ dets.extras for dets in dets_list ], []),
+            int_boxes   = np.concatenate([ dets.int_boxes for dets in dets_list ]) )
+
+    def to_dicts(self) -> list:
+        """ Return the detection list with the same format of the AI model, the boxes keep the type of the model,
+        the list is cached since the detections are not changed after created """
+        if self.dicts is not None:
+            return self.dicts
+
+        has_box = self.has_box.tolist()
+        int_boxes = np.nan_to_num(self.boxes).astype(np.int64).tolist()
+        float_boxes = self.boxes.tolist()
+        boxes = [ int_boxes[idx] if is_int_box else float_boxes[idx] for idx, is_int_box in enumerate(self.int_boxes.tolist()) ]
+        scores = self.scores.tolist()
+        class_ids = self.class_ids.tolist()
+        track_ids = self.track_ids.tolist()
+
+        self.dicts = []
+        for idx, label in enumerate(self.labels.tolist()):
+            det = dict(zip(BOX_KEYS, boxes[idx] if has_box[idx] else [ None ] * 4))
+            det.update({ LABEL: label, SCORE: scores[idx] })
+            if class_ids[idx] >= 0:
+                det[CLASS_ID] = class_ids[idx]
+            if track_ids[idx] > 0:
+                det[TRACK_ID] = track_ids[idx]
+            det.update(self.extras[idx])
+            self.dicts.append(det)
+        return self.dicts
+
+
+def as_detections(dets) -> Detections:
+    """ Return the Detections of the detection list, it is returned directly if it is already converted """
+    return dets if isinstance(dets, Detections) else Detections.from_dicts(dets)
+
+
+def to_dict_info(info):
+    """ Return the result information with the detection list, for the application and the API """
+    if (info is None) or not isinstance(info.get(DETS), Detections):
+        return info
+    info = dict(info)
+    info[DETS] = info[DETS].to_dicts()
+    return info
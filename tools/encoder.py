@@ -0,0 +1,220 @@
+import os, time, logging
+
+# Define Key which declared in the "pipeline" block of task.json
+ENCODER     = "encoder"     # auto or fixed
+BITRATE     = "bitrate"     # kbps
+PRESET      = "preset"      # the speed preset of x264enc
+KEY_INT     = "key_int"     # frames between the key frames
+CPU_LIMIT   = "cpu_limit"   # the system CPU load which the encoder steps down at
+
+# Define Mode
+AUTO        = "auto"
+FIXED       = "fixed"
+MODES       = [ AUTO, FIXED ]
+
+# Define Key of the statistic
+MODE        = "mode"
+LEVEL       = "level"
+CPU         = "cpu"
+RESTARTS    = "restarts"
+
+# The speed presets of x264enc from the fastest one
+PRESETS     = [ "ultrafast", "superfast", "veryfast", "faster", "fast", "medium" ]
+
+DEFAULT_BITRATE = 4096
+MIN_BITRATE     = 512
+MAX_BITRATE     = 8192
+BITRATE_STEP    = 0.7
+MAX_KEY_SECONDS = 4                 # the key frame interval is enlarged up to 4 seconds
+DEFAULT_PRESET  = "medium"          # the default of x264enc when the speed preset is not set
+DEFAULT_KEY_INT = 20
+PLATFORM_KEY_INT= { "xilinx": 120 } # the IDR periodicity of omxh264enc
+NO_PRESET       = [ "xilinx" ]      # omxh264enc has no speed preset
+
+DEFAULT_CPU_LIMIT   = 0.85
+CPU_HEADROOM        = 0.25          # step up only if the CPU load is lower than the limit by 25%
+BUSY_RATIO          = 0.8           # the encoder is overloaded if it takes 80% of the frame budget
+IDLE_RATIO          = 0.4
+CHECK_INTERVAL      = 5             # seconds
+RESTART_COOLDOWN    = 30            # seconds, restarting the pipeline interrupts the viewers
+
+
+def get_default_settings(src_wid, src_hei, src_fps, platform=None) -> dict:
+    """ Return the default encoder settings, they keep the defaults of the pipeline of each platform """
+    return {
+        BITRATE : DEFAULT_BITRATE,
+        PRESET  : DEFAULT_PRESET,
+        KEY_INT : PLATFORM_KEY_INT.get(platform, DEFAULT_KEY_INT)
+    }
+
+
+def get_ladder(settings:dict, src_fps, platform=None) -> list:
+    """ Return the settings from the given one to the cheapest one, each level is cheaper than the previous one:
+    a faster preset first, then a lower bitrate, then a longer key frame interval.
+    The preset is not stepped on the platform without it, since the level would only restart the pipeline """
+    ladder = [ dict(settings) ]
+    max_key_int = max(settings[KEY_INT], int(round(src_fps * MAX_KEY_SECONDS)))
+    has_preset = not (platform in NO_PRESET)
+    while True:
+        cur = dict(ladder[-1])
+        if has_preset and cur[PRESET] in PRESETS and PRESETS.index(cur[PRESET]) > 0:
+            cur[PRESET] = PRESETS[PRESETS.index(cur[PRESET]) - 1]
+        elif cur[BITRATE] > MIN_BITRATE:
+            cur[BITRATE] = max(MIN_BITRATE, int(cur[BITRATE] * BITRATE_STEP))
+        elif cur[KEY_INT] < max_key_int:
+            cur[KEY_INT] = min(max_key_int, cur[KEY_INT] * 2)
+        else:
+            return ladder
+        ladder.append(cur)
+
+
+class CpuMonitor():
+    """ Return the system CPU load between two calls from /proc/stat, use the load average if it is not available """
+
+    def __init__(self) -> None:
+        self.last = self.read_stat()
+
+    @staticmethod
+    def read_stat():
+        try:
+            with open("/proc/stat") as f:
+                vals = [ int(val) for val in f.readline().split()[1:] ]
+            idle = vals[3] + (vals[4] if len(vals) > 4 else 0)
+            return sum(vals), idle
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def get_load(self):
+        """ Return the CPU load from 0 to 1, None if it is unknown """
+        cur = self.read_stat()
+        if cur is not None and self.last is not None:
+            total, idle = cur[0] - self.last[0], cur[1] - self.last[1]
+            self.last = cur
+            return (1 - idle / total) if total > 0 else None
+
+        try:
+            return min(1, os.getloadavg()[0] / (os.cpu_count() or 1))
+        except (OSError, AttributeError):
+            return None
+
+
+class EncoderController():
+    """ Adjust the settings of the RTSP encoder by the encoding time and the system CPU load.
+
+    The settings are a ladder from the initial one to the cheapest one. The controller steps down if the encoder
+    could not keep the target FPS or the CPU load is over the limit, which starves the inference,
+    and steps back up when both of them have headroom. The new settings are applied by restarting the pipeline,
+    so the changes are limited by a cooldown.
+
+    - Arguments
+        - src_wid, src_hei, src_fps
+        - settings
+            - type: dict
+            - desc: the bitrate, preset and key_int to start with, the missing keys use the defaults
+        - mode
+            - type: str
+            - desc: auto or fixed, the fixed encoder never changes the settings
+        - cpu_limit
+            - type: float
+            - desc: the system CPU load from 0 to 1
+        - platform
+            - type: str
+            - desc: the platform of the GStreamer pipeline, e.g. intel or xilinx
+    """
+    def __init__(self, src_wid, src_hei, src_fps=30, settings=None, mode=AUTO, cpu_limit=DEFAULT_CPU_LIMIT, platform=None) -> None:
+
+        if mode in [ True, "true", "True" ]:
+            mode = AUTO
+        if not (mode in MODES):
+            raise ValueError("Unexpected encoder mode ({}), support is [ {} ]".format(
+                mode, ', '.join(MODES) ))
+
+        init = get_default_settings(src_wid, src_hei, src_fps, platform)
+        init.update({ key: val for key, val in (settings or {}).items() if val is not None })
+        init[BITRATE], init[KEY_INT] = int(init[BITRATE]), int(init[KEY_INT])
+
+        self.mode       = mode
+        self.budget     = 1 / (src_fps or 30)
+        self.cpu_limit  = float(cpu_limit)
+        self.ladder     = get_ladder(init, src_fps, platform) if mode == AUTO else [ init ]
+        self.level      = 0
+        self.prev_level = 0
+        self.monitor    = CpuMonitor()
+        self.cpu        = None
+        self.restarts   = 0
+        self.t_check    = time.time()
+        self.t_change   = 0
+        self.written    = 0
+        self.t_encode   = 0
+        self.dropped    = 0
+
+    def get_settings(self) -> dict:
+        return self.ladder[self.level]
+
+    def check(self, written, t_encode, dropped):
+        """ Check the encoder with the accumulated counters of the writer,
+        return the new settings if the pipeline has to be restarted, otherwise None """
+        t_now = time.time()
+        if self.mode != AUTO or (t_now - self.t_check) < CHECK_INTERVAL:
+            return None
+
+        frames = written - self.written
+        encode_time = ((t_encode - self.t_encode) / frames) if frames else 0
+        has_drop = (dropped - self.dropped) > 0
+        self.written, self.t_encode, self.dropped = written, t_encode, dropped
+        self.t_check = t_now
+        self.cpu = self.monitor.get_load()
+
+        if (t_now - self.t_change) < RESTART_COOLDOWN or not frames:
+            return None
+
+        cpu_busy = (self.cpu is not None) and (self.cpu > self.cpu_limit)
+        cpu_idle = (self.cpu is None) or (self.cpu < self.cpu_limit - CPU_HEADROOM)
+
+        level = self.level
+        if (encode_time > self.budget * BUSY_RATIO) or has_drop or cpu_busy:
+            level = min(level + 1, len(self.ladder) - 1)
+        elif (encode_time < self.budget * IDLE_RATIO) and cpu_idle:
+            level = max(level - 1, 0)
+
+        if level == self.level:
+            return None
+
+        logging.warning('Adjust the RTSP encoder from {} to {} ( encode: {:.1f}ms, cpu: {} )'.format(
+            self.ladder[self.level], self.ladder[level], encode_time * 1000,
+            'unknown' if self.cpu is None else '{:.0%}'.format(self.cpu) ))
+        self.prev_level, self.level = self.level, level
+        self.t_change = t_now
+        self.restarts += 1
+        return self.get_settings()
+
+    def revert(self):
+        """ Go back to the previous settings, e.g. the pipeline could not be opened with the new one """
+        logging.warning('Revert the RTSP encoder to {}'.format(self.ladder[self.prev_level]))
+        self.level = self.prev_level
+
+    def get_stats(self) -> dict:
+        stats = dict(self.get_settings())
+        stats.update({
+            MODE        : self.mode,
+            LEVEL       : self.level,
+            CPU         : round(self.cpu, 3) if self.cpu is not None else None,
+            RESTARTS    : self.restarts
+        })
+        return stats
+
+
+def get_encoder(pipe_conf:dict, src_wid, src_hei, src_fps=30, mode=AUTO, cpu_limit=DEFAULT_CPU_LIMIT, platform=None):
+    """ Create the encoder controller from the "pipeline" block """
+    pipe_conf = pipe_conf or {}
+    mode = pipe_conf.get(ENCODER, mode)
+    if mode in [ False, None, "", "false", "False" ]:
+        mode = FIXED
+    return EncoderController(
+        src_wid     = src_wid,
+        src_hei     = src_hei,
+        src_fps     = src_fps,
+        settings    = { key: pipe_conf.get(key) for key in [ BITRATE, PRESET, KEY_INT ] },
+        mode        = mode,
+        cpu_limit   = pipe_conf.get(CPU_LIMIT, cpu_limit),
+        platform    = platform )
@@ -0,0 +1,152 @@
+import time, base64, threading, weakref
+from collections import OrderedDict
+import cv2
+
+# Define Variant
+FULL        = "full"
+THUMB       = "thumb"
+
+# Define Key of the variant
+QUALITY     = "quality"
+WIDTH       = "width"       # the maximum width, None means the original size
+
+# Define Key of the statistic
+ENTRIES     = "entries"
+HITS        = "hits"
+MISSES      = "misses"
+ENCODE_TIME = "encode_time"
+VARIANTS    = "variants"
+
+DEFAULT_VARIANTS = {
+    FULL    : { QUALITY: 95, WIDTH: None },
+    THUMB   : { QUALITY: 70, WIDTH: 320 }
+}
+DEFAULT_MAX_ENTRIES = 64
+
+
+class EncodedFrame():
+    """ The JPEG of one frame, the base64 string is produced at the first time it is asked
+
+    - Arguments
+        - idx
+            - type: int
+            - desc: the frame index, None means the frame is matched by the identity of the array
+        - frame
+            - type: numpy.ndarray
+            - desc: only a weak reference is kept
+        - jpeg
+            - type: bytes
+        - shape
+            - type: tuple
+            - desc: the shape of the original frame
+    """
+    def __init__(self, idx, frame, jpeg, shape) -> None:
+        self.idx    = idx
+        self.jpeg   = jpeg
+        self.shape  = tuple(shape)
+        self.b64    = None
+        try:
+            self.ref = weakref.ref(frame) if idx is None else None
+        except TypeError:
+            self.ref = None
+
+    def matches(self, frame, idx=None) -> bool:
+        if idx is not None:
+            return self.idx == idx
+        return (self.ref is not None) and (self.ref() is frame)
+
+    def to_base64(self) -> str:
+        if self.b64 is None:
+            self.b64 = base64.encodebytes(self.jpeg).decode("utf-8")
+        return self.b64
+
+
+class FrameCache():
+    """ Keep the latest JPEG of each task or source in each variant, so a frame is encoded at most once per variant
+    however many clients are polling it.
+
+    The entry is matched by the frame index, e.g. the sequence of the source hub, or by the identity of the array
+    if there is no index, e.g. the first frame which the source object keeps.
+    The clients asking for the same entry wait for the one which is encoding.
+
+    - Arguments
+        - variants
+            - type: dict
+            - desc: the quality and the maximum width of each variant, e.g. { "thumb": { "quality": 70, "width": 320 } }
+        - max_entries
+            - type: int
+            - desc: the least recently used entry is removed if there are more entries
+    """
+    def __init__(self, variants=None, max_entries=DEFAULT_MAX_ENTRIES) -> None:
+        self.variants   = { name: dict(conf) for name, conf in DEFAULT_VARIANTS.items() }
+        self.variants.update({ name: dict(conf) for name, conf in (variants or {}).items() })
+        self.max_entries= max(1, int(max_entries))
+        self.lock       = threading.Lock()
+        self.entries    = OrderedDict()
+        self.locks      = dict()
+        self.hits       = 0
+        self.misses     = 0
+        self.t_encode   = 0
+
+    def encode(self, frame, variant) -> bytes:
+        conf = self.variants[variant]
+        hei, wid = frame.shape[:2]
+        if conf.get(WIDTH) and wid > conf[WIDTH]:
+            scale = conf[WIDTH] / wid
+            frame = cv2.resize(frame, (int(conf[WIDTH]), max(1, int(hei * scale))), interpolation=cv2.INTER_AREA)
+
+        ret, jpeg = cv2.imencode('.jpg', frame, [ int(cv2.IMWRITE_JPEG_QUALITY), int(conf.get(QUALITY, 95)) ])
+        if not ret:
+            raise RuntimeError('Could not encode the frame into JPEG')
+        return jpeg.tobytes()
+
+    def get(self, key, frame, idx=None, variant=FULL) -> EncodedFrame:
+        """ Return the encoded frame of the key, the frame is encoded only if the cached one is another frame """
+        if not (variant in self.variants):
+            raise ValueError("Unexpected frame variant ({}), support is [ {} ]".format(
+                variant, ', '.join(self.variants) ))
+
+        entry_key = (key, variant)
+        with self.lock:
+            entry_lock = self.locks.setdefault(entry_key, threading.Lock())
+
+        with entry_lock:
+            entry = self.entries.get(entry_key)
+            if (entry is not None) and entry.matches(frame, idx):
+                with self.lock:
+                    if entry_key in self.entries:
+                        self.entries.move_to_end(entry_key)
+                    self.hits += 1
+                return entry
+
+            t_start = time.time()
+            entry = EncodedFrame(idx, frame, self.encode(frame, variant), frame.shape)
+
+            with self.lock:
+                self.t_encode += time.time() - t_start
+                self.misses += 1
+                self.entries[entry_key] = entry
+                self.entries.move_to_end(entry_key)
+                while len(self.entries) > self.max_entries:
+                    old_key, _ = self.entries.popitem(last=False)
+                    self.locks.pop(old_key, None)
+            return entry
+
+    def peek(self, key, variants=None):
+        """ Return the cached frame of the key without checking which frame it is, the variants are tried in order,
+        None if nothing is cached """
+        with self.lock:
+            for variant in (variants or list(self.variants)):
+                entry = self.entries.get((key, variant))
+                if entry is not None:
+                    return entry
+        return None
+
+    def get_stats(self) -> dict:
+        return {
+            ENTRIES     : len(self.entries),
+            HITS        : self.hits,
+            MISSES      : self.misses,
+            ENCODE_TIME : round(self.t_encode / self.misses * 1000, 3) if self.misses else 0,
+            VARIANTS    : list(self.variants)
+        }
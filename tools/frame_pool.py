@@ -0,0 +1,114 @@
+import logging, threading
+import numpy as np
+
+# Define Key of the statistic
+SIZE        = "size"
+IN_USE      = "in_use"
+ACQUIRED    = "acquired"
+OVERFLOW    = "overflow"
+
+
+class FrameBuffer():
+    """ A preallocated frame with reference count, it goes back to the pool when the last reference is released
+
+    - Usage
+        - retain() before passing it to another consumer
+        - release() when the consumer is done
+    """
+    def __init__(self, pool, array) -> None:
+        self.pool   = pool
+        self.array  = array
+        self.refs   = 0
+
+    def retain(self):
+        if self.pool is not None:
+            with self.pool.cond:
+                self.refs += 1
+        return self
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.recycle(self)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+
+class FramePool():
+    """ Fixed pool of preallocated frame buffers which is reused round-robin
+
+    - Arguments
+        - shape
+            - type: tuple
+            - desc: the shape of frame, e.g. ( height, width, channel )
+        - dtype
+            - type: numpy.dtype
+        - size
+            - type: int
+            - desc: the number of preallocated buffers
+    """
+    def __init__(self, shape, dtype=np.uint8, size=8) -> None:
+
+        self.shape      = tuple(shape)
+        self.dtype      = np.dtype(dtype)
+        self.cond       = threading.Condition()
+        self.buffers    = [ FrameBuffer(self, np.empty(self.shape, self.dtype)) for _ in range(max(1, int(size))) ]
+        self.cursor     = 0
+        self.acquired   = 0
+        self.overflow   = 0
+
+        logging.info('Allocate frame pool ( {} x {} )'.format(len(self.buffers), self.shape))
+
+    def fits(self, frame) -> bool:
+        return (frame.shape == self.shape) and (frame.dtype == self.dtype)
+
+    def acquire(self, timeout=0) -> FrameBuffer:
+        """ Return a free buffer with one reference,
+        a temporary buffer which is not belong to the pool is returned if all buffers are in use """
+        with self.cond:
+            buf = self.find_free()
+            if buf is None and timeout:
+                self.cond.wait_for(lambda: self.find_free() is not None, timeout)
+                buf = self.find_free()
+
+            if buf is not None:
+                buf.refs = 1
+                self.acquired += 1
+                return buf
+
+            self.overflow += 1
+
+        return FrameBuffer(None, np.empty(self.shape, self.dtype))
+
+    def find_free(self):
+        """ Round-robin search the free buffer, the caller should hold the lock """
+        for offset in range(len(self.buffers)):
+            idx = (self.cursor + offset) % len(self.buffers)
+            if self.buffers[idx].refs == 0:
+                self.cursor = idx + 1
+                return self.buffers[idx]
+        return None
+
+    def copy_from(self, frame, timeout=0) -> FrameBuffer:
+        """ Copy frame into a free buffer without allocating a new array """
+        buf = self.acquire(timeout)
+        np.copyto(buf.array, frame)
+        return buf
+
+    def recycle(self, buf):
+        with self.cond:
+            if buf.refs <= 0:
+                logging.warning('Release a frame buffer which is not in use')
+                return
+            buf.refs -= 1
+            if buf.refs == 0:
+                self.cond.notify_all()
+
+    def get_stats(self) -> dict:
+        return {
+            SIZE        : len(self.buffers),
+            IN_USE      : len([ buf for buf in self.buffers if buf.refs > 0 ]),
+            ACQUIRED    : self.acquired,
+            OVERFLOW    : self.overflow
+        }
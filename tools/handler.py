@@ -97,6 +97,7 @@ def init_task_src(task_uuid):
                 "proc": [],
                 "type": source_type,
                 "object": None,
+                "hub": None,
                 "detail": "",
             }})
     # Add process into config
@@ -178,6 +179,7 @@ def init_tasks(name:str, fix_uuid:str=None, index=0) -> Tuple[bool, str]:
         "status" : "stop", 
         "cur_frame" : 0,
         "fps": None,
+        "perf": {},
         "stream": None 
     })
 
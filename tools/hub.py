@@ -0,0 +1,236 @@
+import logging, threading
+import cv2
+
+from .frame_pool import FramePool
+from .pacer import DeadlinePacer, SOURCE
+
+# Define Read Mode
+LATEST      = "latest"
+EVERY       = "every"
+READ_MODES  = [ LATEST, EVERY ]
+
+# Define Key of the statistic
+FPS         = "fps"
+SEQ         = "seq"
+MODE        = "mode"
+CURSOR      = "cursor"
+DROPPED     = "dropped"
+SUBSCRIBERS = "subscribers"
+POOL        = "pool"
+PACING      = "pacing"
+SCALE       = "scale"
+
+STOP_TIMEOUT = 3
+DEFAULT_FPS  = 30
+
+
+class Subscriber():
+    """ The read cursor of one consumer, use `SourceHub.subscribe` to create it """
+
+    def __init__(self, hub, name, mode=LATEST) -> None:
+
+        if not (mode in READ_MODES):
+            raise ValueError("Unexpected read mode ({}), support is [ {} ]".format(
+                mode, ', '.join(READ_MODES) ))
+
+        self.hub        = hub
+        self.name       = name
+        self.mode       = mode
+        self.cursor     = hub.seq
+        self.generation = hub.generation
+        self.dropped    = 0
+
+    def read(self, timeout=1.0):
+        """ Return the next frame buffer, or None if there is no new frame before timeout,
+        the buffer have to be released after using """
+        return self.hub.read(self, timeout)
+
+    def is_reloaded(self) -> bool:
+        """ Return True once if the source was reloaded since the last check """
+        if self.generation == self.hub.generation:
+            return False
+        self.generation = self.hub.generation
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            MODE    : self.mode,
+            CURSOR  : self.cursor,
+            DROPPED : self.dropped
+        }
+
+
+class SourceHub():
+    """ Decode the source once and publish each frame to every subscriber through a ring buffer
+
+    - Arguments
+        - src
+            - type: object
+            - desc: the source object which is same with app.config["SRC"][{src_name}]["object"]
+        - ring_size
+            - type: int
+            - desc: how many frames could be kept for the consumer which is using `every` mode
+        - pool_size
+            - type: int
+            - desc: the number of preallocated frame buffers, should be larger than ring_size
+        - scale
+            - type: float
+            - desc: downscale the decoded frame into the frame buffer, 1 means the original size
+    """
+    def __init__(self, src, ring_size=8, pool_size=16, scale=1) -> None:
+
+        self.src        = src
+        self.ring_size  = max(2, int(ring_size))
+        self.ring       = [ None ] * self.ring_size
+        self.seq        = 0
+        self.generation = 0
+        self.cond       = threading.Condition()
+        self.subscribers= dict()
+        self.error      = None
+        self.is_stop    = False
+        self.fps        = src.get_fps() or DEFAULT_FPS
+        self.pool       = None
+        self.pool_size  = max(self.ring_size + 1, int(pool_size))
+        self.pacer      = DeadlinePacer(SOURCE, self.fps)
+        self.scale      = min(max(float(scale), 0.1), 1)
+
+        self.worker = threading.Thread( target=self.decode_thread, daemon=True )
+
+    def decode_thread(self):
+        """ Read frame from source and publish it into ring buffer """
+        logging.info('Start the source hub')
+        try:
+            while(not self.is_stop):
+
+                # Wait for the deadline of the next frame in source fps
+                self.pacer.wait()
+                success, frame = self.src.read()
+
+                if not success:
+                    if self.src.get_type() == 'v4l2':
+                        raise RuntimeError('USB Camera Error')
+
+                    self.src.reload()
+                    self.pacer.reset()
+                    with self.cond:
+                        self.generation += 1
+                        self.cond.notify_all()
+                    continue
+
+                self.publish(frame)
+
+        except Exception as e:
+            self.error = e
+            logging.error('Got error in source hub ({})'.format(e))
+
+        finally:
+            with self.cond:
+                self.is_stop = True
+                self.cond.notify_all()
+            self.clear_ring()
+
+        logging.info('Stop the source hub')
+
+    def get_shape(self, shape=None) -> tuple:
+        """ Return the ( height, width ) of the published frame """
+        hei, wid = (shape or self.src.get_shape())[:2]
+        if self.scale >= 1:
+            return (hei, wid)
+        return (max(1, int(hei * self.scale)), max(1, int(wid * self.scale)))
+
+    def publish(self, frame):
+        """ Copy ( or resize ) the frame into the frame pool and put it into the ring buffer """
+        shape = self.get_shape(frame.shape) + frame.shape[2:]
+        if (self.pool is None) or (self.pool.shape != shape) or (self.pool.dtype != frame.dtype):
+            self.pool = FramePool(shape, frame.dtype, self.pool_size)
+
+        if shape == frame.shape:
+            buf = self.pool.copy_from(frame)
+        else:
+            buf = self.pool.acquire()
+            cv2.resize(frame, (shape[1], shape[0]), dst=buf.array, interpolation=cv2.INTER_AREA)
+
+        with self.cond:
+            self.seq += 1
+            prev_buf = self.ring[self.seq % self.ring_size]
+            self.ring[self.seq % self.ring_size] = buf
+            self.cond.notify_all()
+
+        # The buffer goes back to pool after each consumer released it
+        if prev_buf is not None:
+            prev_buf.release()
+
+    def clear_ring(self):
+        with self.cond:
+            bufs, self.ring = self.ring, [ None ] * self.ring_size
+        [ buf.release() for buf in bufs if buf is not None ]
+
+    def read(self, sub, timeout=1.0):
+        """ Return the frame which subscriber should read, raise the error if the source failed """
+        with self.cond:
+            while True:
+                if self.error is not None:
+                    raise self.error
+
+                # The ring is cleared after the hub stopped
+                if self.is_stop:
+                    self.cond.wait(timeout)
+                    return None
+
+                if self.seq > sub.cursor:
+
+                    if sub.mode == LATEST:
+                        trg_seq = self.seq
+                    else:
+                        # The frames which already overwritten are dropped
+                        trg_seq = max(sub.cursor + 1, self.seq - self.ring_size + 1)
+
+                    sub.dropped += trg_seq - sub.cursor - 1
+                    sub.cursor = trg_seq
+                    buf = self.ring[trg_seq % self.ring_size]
+                    return buf.retain() if buf is not None else None
+
+                if not self.cond.wait(timeout):
+                    return None
+
+    def get_latest(self, with_seq=False):
+        """ Return the latest frame buffer without moving any cursor, the buffer have to be released after using,
+        return ( sequence, buffer ) if with_seq is True """
+        with self.cond:
+            buf = None if self.is_stop else self.ring[self.seq % self.ring_size]
+            buf = buf.retain() if buf is not None else None
+            return (self.seq, buf) if with_seq else buf
+
+    def subscribe(self, name, mode=LATEST) -> Subscriber:
+        with self.cond:
+            self.subscribers[name] = Subscriber(self, name, mode)
+            logging.info('Subscribe source hub ( {}, {} )'.format(name, mode))
+            return self.subscribers[name]
+
+    def unsubscribe(self, name):
+        with self.cond:
+            self.subscribers.pop(name, None)
+
+    def start(self):
+        if not self.worker.is_alive():
+            self.worker.start()
+
+    def is_running(self) -> bool:
+        return self.worker.is_alive() and (not self.is_stop)
+
+    def stop(self):
+        with self.cond:
+            self.is_stop = True
+            self.cond.notify_all()
+        if self.worker.is_alive() and threading.current_thread() is not self.worker:
+            self.worker.join(STOP_TIMEOUT)
+
+    def get_stats(self) -> dict:
+        return {
+            FPS         : self.fps,
+            SCALE       : self.scale,
+            SEQ         : self.seq,
+            POOL        : self.pool.get_stats() if self.pool is not None else None,
+            PACING      : self.pacer.get_stats(),
+            SUBSCRIBERS : { name: sub.get_stats() for name, sub in self.subscribers.items() }
+        }
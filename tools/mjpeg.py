@@ -0,0 +1,182 @@
+import time, queue, logging, threading
+import cv2
+
+# Define Key of the statistic
+CLIENTS     = "clients"
+ENCODED     = "encoded"
+ENCODE_TIME = "encode_time"
+SENT        = "sent"
+SKIPPED     = "skipped"
+DROPPED     = "dropped"
+MAX_FPS     = "max_fps"
+
+BOUNDARY            = "frame"
+MIMETYPE            = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+DEFAULT_QUALITY     = 80
+WAIT_TIMEOUT        = 1     # seconds, the client checks if the task is still running in every timeout
+SNAPSHOT_TIMEOUT    = 1     # seconds to wait for the next rendered frame
+
+
+def encode_jpeg(frame, quality=DEFAULT_QUALITY) -> bytes:
+    """ Encode the frame into JPEG bytes """
+    ret, jpeg = cv2.imencode('.jpg', frame, [ int(cv2.IMWRITE_JPEG_QUALITY), int(quality) ])
+    if not ret:
+        raise RuntimeError('Could not encode the frame into JPEG')
+    return jpeg.tobytes()
+
+
+def to_part(jpeg:bytes) -> bytes:
+    """ Wrap the JPEG bytes into one part of the multipart response """
+    return b''.join([ f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n'.encode(),
+                      jpeg, b'\r\n' ])
+
+
+class MjpegBroadcaster():
+    """ Encode each rendered frame into JPEG once and fan out the same bytes to every HTTP client.
+
+    Each client only takes the newest frame when it is ready to send, so a slow client skips the frames
+    in between instead of queueing them, and a client could limit its FPS.
+    Nothing is encoded while there is no client.
+
+    - Arguments
+        - quality
+            - type: int
+            - desc: the JPEG quality from 0 to 100
+    """
+    def __init__(self, quality=DEFAULT_QUALITY) -> None:
+        self.quality    = int(quality)
+        self.cond       = threading.Condition()
+        self.jpeg       = None
+        self.seq        = 0
+        self.clients    = dict()
+        self.next_id    = 0
+        self.waiting    = 0
+        self.encoded    = 0
+        self.t_encode   = 0
+
+    def has_clients(self) -> bool:
+        return bool(self.clients) or (self.waiting > 0)
+
+    def submit(self, buf, idx=None):
+        """ Encode the frame buffer if someone is watching, it has the same interface of RtspWritter """
+        if not self.has_clients():
+            return
+        t_start = time.time()
+        jpeg = encode_jpeg(buf.array, self.quality)
+        self.t_encode += time.time() - t_start
+        self.encoded += 1
+        self.publish_jpeg(jpeg)
+
+    def publish_jpeg(self, jpeg:bytes):
+        """ Publish the encoded frame to the clients, e.g. the frame which is encoded in the worker process """
+        with self.cond:
+            self.jpeg = jpeg
+            self.seq += 1
+            self.cond.notify_all()
+
+    def snapshot(self, timeout=SNAPSHOT_TIMEOUT):
+        """ Wait for the next rendered frame and return its JPEG, None if there is no frame in the timeout """
+        with self.cond:
+            self.waiting += 1
+            try:
+                last_seq = self.seq
+                if not self.cond.wait_for(lambda: self.seq != last_seq, timeout):
+                    return None
+                return self.jpeg
+            finally:
+                self.waiting -= 1
+
+    def stream(self, max_fps=None, keep_running=None, on_wait=None):
+        """ The generator of the multipart response of one client
+
+        - Arguments
+            - max_fps
+                - type: float
+                - desc: the maximum FPS of the client, None means every frame
+            - keep_running
+                - type: function
+                - desc: the response is finished when it returns False
+            - on_wait
+                - type: function
+                - desc: called before waiting the next frame, e.g. extend the lease of the viewer
+        """
+        with self.cond:
+            client_id = self.next_id
+            self.next_id += 1
+            client = self.clients[client_id] = { SENT: 0, SKIPPED: 0, MAX_FPS: max_fps }
+            last_seq = (self.seq - 1) if self.jpeg is not None else self.seq
+
+        interval = (1 / float(max_fps)) if max_fps else 0
+        t_sent = 0
+        try:
+            while (keep_running is None) or keep_running():
+                if on_wait is not None:
+                    on_wait()
+
+                t_wait = interval - (time.time() - t_sent)
+                if t_wait > 0:
+                    time.sleep(t_wait)
+
+                with self.cond:
+                    if not self.cond.wait_for(lambda: self.seq != last_seq, WAIT_TIMEOUT):
+                        continue
+                    seq, jpeg = self.seq, self.jpeg
+
+                client[SKIPPED] += max(0, seq - last_seq - 1)
+                last_seq = seq
+                yield to_part(jpeg)
+
+                client[SENT] += 1
+                t_sent = time.time()
+        finally:
+            with self.cond:
+                self.clients.pop(client_id, None)
+            logging.info('The MJPEG client is disconnected ( sent: {}, skipped: {} )'.format(client[SENT], client[SKIPPED]))
+
+    def get_stats(self) -> dict:
+        return {
+            CLIENTS     : [ dict(client) for client in list(self.clients.values()) ],
+            ENCODED     : self.encoded,
+            ENCODE_TIME : round(self.t_encode / self.encoded * 1000, 3) if self.encoded else 0
+        }
+
+
+class MjpegRelay():
+    """ Encode the frame in the worker process and pass the JPEG bytes to the MjpegBroadcaster of the main process,
+    the frame is dropped if the queue is full.
+
+    - Arguments
+        - jpeg_queue
+            - type: multiprocessing.Queue
+        - is_active
+            - type: function
+            - desc: return True if the broadcaster has clients
+        - quality
+            - type: int
+    """
+    def __init__(self, jpeg_queue, is_active, quality=DEFAULT_QUALITY) -> None:
+        self.jpeg_queue = jpeg_queue
+        self.is_active  = is_active
+        self.quality    = int(quality)
+        self.encoded    = 0
+        self.dropped    = 0
+        self.t_encode   = 0
+
+    def submit(self, buf, idx=None):
+        if not self.is_active():
+            return
+        t_start = time.time()
+        jpeg = encode_jpeg(buf.array, self.quality)
+        self.t_encode += time.time() - t_start
+        self.encoded += 1
+        try:
+            self.jpeg_queue.put_nowait(jpeg)
+        except queue.Full:
+            self.dropped += 1
+
+    def get_stats(self) -> dict:
+        return {
+            ENCODED     : self.encoded,
+            DROPPED     : self.dropped,
+            ENCODE_TIME : round(self.t_encode / self.encoded * 1000, 3) if self.encoded else 0
+        }
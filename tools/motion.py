@@ -0,0 +1,130 @@
+import time
+import cv2
+import numpy as np
+
+# Define Key which declared in the "application" block of task.json
+MOTION_GATE     = "motion_gate"
+MOTION_THRES    = "motion_thres"
+MOTION_REFRESH  = "motion_refresh"
+
+# Define Method
+DIFF        = "diff"        # frame difference with the last inferred frame
+MOG2        = "mog2"        # background subtraction
+METHODS     = [ DIFF, MOG2 ]
+
+# Define Key of the statistic
+METHOD      = "method"
+THRES       = "thres"
+MOTION      = "motion"
+INFERRED    = "inferred"
+SKIPPED     = "skipped"
+SKIP_RATIO  = "skip_ratio"
+
+GATE_WIDTH      = 160       # the width of the downscaled frame
+PIXEL_THRES     = 25        # the difference of gray level to be a changed pixel
+DEFAULT_THRES   = 0.01      # the ratio of the changed pixels to do inference
+DEFAULT_REFRESH = 5         # seconds, do inference even if nothing changed
+
+
+class MotionGate():
+    """ Skip the inference of the static frame, the change is measured on a downscaled gray frame.
+
+    In `diff` mode the frame is compared with the last inferred frame, so a slow motion is accumulated until
+    it passes the threshold; in `mog2` mode the foreground ratio of the background subtractor is used.
+
+    - Arguments
+        - method
+            - type: str
+            - desc: diff or mog2
+        - thres
+            - type: float
+            - desc: the ratio of the changed pixels ( 0 ~ 1 ) to do inference
+        - refresh
+            - type: float
+            - desc: the maximum seconds to reuse the last result, 0 means no limit
+    """
+    def __init__(self, method=DIFF, thres=DEFAULT_THRES, refresh=DEFAULT_REFRESH) -> None:
+
+        if not (method in METHODS):
+            raise ValueError("Unexpected motion gate ({}), support is [ {} ]".format(
+                method, ', '.join(METHODS) ))
+
+        self.method     = method
+        self.thres      = float(thres)
+        self.refresh    = float(refresh)
+        self.reference  = None
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == MOG2 else None
+        self.t_infer    = 0
+        self.motion     = 0
+        self.inferred   = 0
+        self.skipped    = 0
+
+    def preprocess(self, frame):
+        hei, wid = frame.shape[:2]
+        small = cv2.resize(frame, (GATE_WIDTH, max(1, int(hei * GATE_WIDTH / wid))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def get_motion(self, gray) -> float:
+        """ Return the ratio of the changed pixels """
+        if self.method == MOG2:
+            mask = self.subtractor.apply(gray)
+            return np.count_nonzero(mask) / mask.size
+
+        if (self.reference is None) or (self.reference.shape != gray.shape):
+            return 1.0
+        diff = cv2.absdiff(gray, self.reference)
+        return np.count_nonzero(diff > PIXEL_THRES) / diff.size
+
+    def check(self, frame) -> bool:
+        """ Return True if the frame has to do inference """
+        gray = self.preprocess(frame)
+        self.motion = self.get_motion(gray)
+
+        t_now = time.time()
+        expired = self.refresh > 0 and (t_now - self.t_infer) >= self.refresh
+        if (self.motion < self.thres) and not expired:
+            self.skipped += 1
+            return False
+
+        self.reference = gray
+        self.t_infer = t_now
+        self.inferred += 1
+        return True
+
+    def reset(self):
+        """ Do inference on the next frame, e.g. the source was reloaded """
+        self.reference = None
+        self.t_infer = 0
+
+    def get_stats(self) -> dict:
+        total = self.inferred + self.skipped
+        return {
+            METHOD      : self.method,
+            THRES       : self.thres,
+            MOTION      : round(self.motion, 4),
+            INFERRED    : self.inferred,
+            SKIPPED     : self.skipped,
+            SKIP_RATIO  : round(self.skipped / total, 3) if total else 0
+        }
+
+
+def get_motion_gate(app_conf:dict):
+    """ Create the motion gate from the "application" block, return None if it is not enabled.
+
+    - Arguments
+        - app_conf
+            - type: dict
+            - desc: e.g. { "motion_gate": "diff", "motion_thres": 0.01, "motion_refresh": 5 },
+                    motion_gate could be true ( diff ), false, "diff" or "mog2"
+    """
+    method = (app_conf or {}).get(MOTION_GATE, False)
+    if method in [ False, None, "", "false", "False" ]:
+        return None
+    if method in [ True, "true", "True" ]:
+        method = DIFF
+
+    return MotionGate(
+        method  = method,
+        thres   = app_conf.get(MOTION_THRES, DEFAULT_THRES),
+        refresh = app_conf.get(MOTION_REFRESH, DEFAULT_REFRESH) )
@@ -0,0 +1,102 @@
+import time
+from collections import deque
+
+# Define Pacing Mode
+MAX         = "max"         # as fast as possible
+SOURCE      = "source"      # the FPS of the source
+FIXED       = "fixed"       # the target FPS
+PACING_MODES = [ MAX, SOURCE, FIXED ]
+
+# Define Key of the statistic
+MODE        = "mode"
+FPS         = "fps"
+TARGET      = "target"
+TICKS       = "ticks"
+MISSED      = "missed"
+LATENESS    = "lateness"
+MAX_LATENESS= "max_lateness"
+
+DEFAULT_FPS = 30
+WINDOW_SIZE = 100
+
+
+class DeadlinePacer():
+    """ Pace a loop against absolute deadlines instead of sleeping the remaining time of each iteration.
+
+    The deadline of the next tick is always `the previous deadline + period`, so the time which is spent in
+    a blocking read is not waited again and the error does not accumulate. If the loop is late for more than
+    one period, the skipped ticks are counted as missed deadlines and the deadline jumps to the next slot
+    instead of bursting to catch up.
+
+    - Arguments
+        - mode
+            - type: str
+            - desc: max, source or fixed
+        - src_fps
+            - type: float
+            - desc: the FPS of the source, used in source mode
+        - target_fps
+            - type: float
+            - desc: the FPS in fixed mode
+    """
+    def __init__(self, mode=SOURCE, src_fps=DEFAULT_FPS, target_fps=None) -> None:
+
+        if not (mode in PACING_MODES):
+            raise ValueError("Unexpected pacing mode ({}), support is [ {} ]".format(
+                mode, ', '.join(PACING_MODES) ))
+
+        self.mode       = mode
+        self.deadline   = None
+        self.ticks      = 0
+        self.missed     = 0
+        self.lateness   = deque(maxlen=WINDOW_SIZE)
+        self.t_ticks    = deque(maxlen=WINDOW_SIZE)
+        self.set_fps(target_fps if (mode == FIXED and target_fps) else src_fps)
+
+    def set_fps(self, fps):
+        self.fps    = float(fps) if fps and fps > 0 else DEFAULT_FPS
+        self.period = 1 / self.fps
+
+    def reset(self):
+        """ Start from a new deadline, e.g. the source was reloaded """
+        self.deadline = None
+
+    def wait(self):
+        """ Block until the deadline of the next tick """
+        now = time.perf_counter()
+
+        if self.mode != MAX:
+
+            if self.deadline is None:
+                self.deadline = now
+
+            late = now - self.deadline
+            if late < 0:
+                time.sleep(-late)
+                late, now = 0, self.deadline
+
+            # Skip the deadlines which already passed
+            skipped = int(late // self.period)
+            self.missed += skipped
+            self.deadline += (skipped + 1) * self.period
+            self.lateness.append(late)
+
+        self.ticks += 1
+        self.t_ticks.append(now)
+
+    def get_fps(self) -> float:
+        if len(self.t_ticks) < 2 or self.t_ticks[-1] == self.t_ticks[0]:
+            return 0
+        return (len(self.t_ticks) - 1) / (self.t_ticks[-1] - self.t_ticks[0])
+
+    def get_stats(self) -> dict:
+        lateness = list(self.lateness)
+        return {
+            MODE        : self.mode,
+            TARGET      : round(self.fps, 3) if self.mode != MAX else None,
+            FPS         : round(self.get_fps(), 3),
+            TICKS       : self.ticks,
+            MISSED      : self.missed,
+            LATENESS    : round(sum(lateness) / len(lateness) * 1000, 3) if lateness else 0,
+            MAX_LATENESS: round(max(lateness) * 1000, 3) if lateness else 0
+        }
@@ -125,11 +125,54 @@ def modify_application_params(src_data:dict, task_config:dict) -> dict:
     trg_key = "sensitivity"
     if trg_key in app_form:
         task_config[app_key].update( { trg_key: app_form[trg_key] } )
+
+    # Motion gate: skip the inference of the static frames
+    trg_key = "motion_gate"
+    if trg_key in app_form:
+        task_config[app_key].update( { trg_key: app_form[trg_key] } )
+
+    for trg_key in [ "motion_thres", "motion_refresh" ]:
+        if trg_key in app_form:
+            task_config[app_key].update( { trg_key: float(app_form[trg_key]) } )
     
     logging.debug("Update Application Parameters in Task Configuration: \n{}".format(task_config[app_key]))
     
     return task_config
 
+def modify_pipeline_params(src_data:dict, task_config:dict) -> dict:
+    """ Update Stream Pipeline Parameters in Task Configuration """
+
+    pipe_key = "pipeline"
+
+    if not (pipe_key in src_data):
+        return task_config
+
+    if not (pipe_key in task_config):
+        task_config.update( {pipe_key: {}} )
+
+    task_config[pipe_key].update( str_to_json(src_data[pipe_key]) )
+
+    logging.debug("Update Pipeline Parameters in Task Configuration: \n{}".format(task_config[pipe_key]))
+
+    return task_config
+
+def modify_capture_params(src_data:dict, task_config:dict) -> dict:
+    """ Update Capture Profile in Task Configuration """
+
+    cap_key = "capture"
+
+    if not (cap_key in src_data):
+        return task_config
+
+    if not (cap_key in task_config):
+        task_config.update( {cap_key: {}} )
+
+    task_config[cap_key].update( str_to_json(src_data[cap_key]) )
+
+    logging.debug("Update Capture Profile in Task Configuration: \n{}".format(task_config[cap_key]))
+
+    return task_config
+
 def modify_model_params(src_data, model_config):
     """ Update Parameters in Model Configuration """
 
@@ -190,6 +233,8 @@ def modify_task_json(src_uuid:str, task_name:str, form:dict, need_copy:bool=Fals
     logging.info(form)
     task_cfg = modify_basic_params(src_data = form, task_config = task_cfg)
     task_cfg = modify_application_params(form, task_cfg)
+    task_cfg = modify_pipeline_params(form, task_cfg)
+    task_cfg = modify_capture_params(form, task_cfg)
     model_cfg = modify_model_params(src_data = form, model_config = model_cfg)
 
     # --------------------------------------------------------
@@ -320,6 +365,8 @@ def gen_task_model_config(form:dict):
     task_conf["prim"]["model_json"] = model_conf_path
     task_conf = modify_basic_params(src_data = form, task_config = task_conf)
     task_conf = modify_application_params(form, task_conf)
+    task_conf = modify_pipeline_params(form, task_conf)
+    task_conf = modify_capture_params(form, task_conf)
     model_conf = modify_model_params(src_data = form, model_config = model_conf)
 
     # -------------------------------------------------------------------------------------
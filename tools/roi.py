@@ -0,0 +1,152 @@
+import numpy as np
+
+from .detection import Detections, as_detections, DETS
+
+# Define Key which declared in the "pipeline" block of task.json
+ROI         = "roi"
+ROI_MARGIN  = "roi_margin"
+
+# Define Key which declared in the "application" block of task.json
+AREA_POINTS = "area_points"
+
+# Define Mode
+RECT        = "rect"        # one crop of the bounding rectangle of all zones
+ZONES       = "zones"       # one crop of each zone, the overlapped crops are merged
+MODES       = [ RECT, ZONES ]
+
+# Define Key of the statistic
+MODE        = "mode"
+REGIONS     = "regions"
+AREA_RATIO  = "area_ratio"
+
+DEFAULT_MARGIN  = 0.1       # extend each crop by 10% to keep the objects on the edge of the zone
+MIN_SIZE        = 32        # the minimum width and height of the crop
+
+
+def is_roi_enabled(pipe_conf:dict, default=False) -> bool:
+    """ Return True if the "pipeline" block enables the ROI inference """
+    return (pipe_conf or {}).get(ROI, default) not in [ False, None, "", "false", "False" ]
+
+
+def merge_rects(rects) -> list:
+    """ Merge the overlapped rectangles until none of them overlaps """
+    rects = [ list(rect) for rect in rects ]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i+1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [ min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]) ]
+                    rects.pop(j)
+                    merged = True
+                    break
+            if merged:
+                break
+    return [ tuple(rect) for rect in rects ]
+
+
+class ROICropper():
+    """ Crop the configured zones from the frame and map the detections back to the full frame.
+
+    - Arguments
+        - areas
+            - type: list
+            - desc: the area_points of the application, e.g. [ [ [x, y], [x, y], ... ], ... ] in pixel
+        - mode
+            - type: str
+            - desc: rect or zones
+        - margin
+            - type: float
+            - desc: the ratio to extend each crop
+    """
+    def __init__(self, areas, mode=RECT, margin=DEFAULT_MARGIN) -> None:
+
+        if mode in [ True, "true", "True" ]:
+            mode = RECT
+        if not (mode in MODES):
+            raise ValueError("Unexpected ROI mode ({}), support is [ {} ]".format(
+                mode, ', '.join(MODES) ))
+
+        self.mode       = mode
+        self.margin     = float(margin)
+        self.zones      = [ np.array(area, np.float32).reshape(-1, 2) for area in (areas or []) if len(area) ]
+        self.shape      = None
+        self.regions    = []
+        self.area_ratio = 1
+
+    def get_regions(self, shape) -> list:
+        """ Return the crops ( x1, y1, x2, y2 ) of the frame, the full frame if there is no zone """
+        if shape[:2] == self.shape:
+            return self.regions
+
+        hei, wid = shape[:2]
+        rects = []
+        zones = [ np.concatenate(self.zones) ] if (self.mode == RECT and self.zones) else self.zones
+        for pts in zones:
+            (x1, y1), (x2, y2) = pts.min(axis=0), pts.max(axis=0)
+            pad_x = max((x2 - x1) * self.margin, (MIN_SIZE - (x2 - x1)) / 2, 0)
+            pad_y = max((y2 - y1) * self.margin, (MIN_SIZE - (y2 - y1)) / 2, 0)
+            rect = ( int(max(0, x1 - pad_x)), int(max(0, y1 - pad_y)),
+                     int(min(wid, np.ceil(x2 + pad_x))), int(min(hei, np.ceil(y2 + pad_y))) )
+            if rect[2] > rect[0] and rect[3] > rect[1]:
+                rects.append(rect)
+
+        self.regions = merge_rects(rects) if rects else [ (0, 0, wid, hei) ]
+        self.area_ratio = sum([ (x2-x1)*(y2-y1) for x1, y1, x2, y2 in self.regions ]) / (wid * hei)
+        self.shape = shape[:2]
+        return self.regions
+
+    def inference(self, trg, frame):
+        """ Do inference on each crop and combine the detections """
+        infos = []
+        for x1, y1, x2, y2 in self.get_regions(frame.shape):
+            cur_info = trg.inference(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+            if cur_info is not None:
+                infos.append((x1, y1, cur_info))
+
+        info = infos[0][2] if infos else None
+        if info is not None and info.get(DETS) is not None:
+            info = dict(info)
+            info[DETS] = Detections.concat([ as_detections(cur_info.get(DETS)).shift(x1, y1) 
+                for x1, y1, cur_info in infos ])
+        return info
+
+    def get_stats(self) -> dict:
+        return {
+            MODE        : self.mode,
+            REGIONS     : len(self.regions),
+            AREA_RATIO  : round(self.area_ratio, 3)
+        }
+
+
+class ROIModel():
+    """ The proxy of the AI model object which only does inference on the zones """
+
+    def __init__(self, trg, cropper) -> None:
+        self.trg        = trg
+        self.cropper    = cropper
+
+    def __getattr__(self, name):
+        return getattr(self.trg, name)
+
+    def inference(self, frame):
+        return self.cropper.inference(self.trg, frame)
+
+
+def get_roi_cropper(pipe_conf:dict, app_conf:dict, enable=False):
+    """ Create the cropper from the "pipeline" block and the area_points of the "application" block,
+    return None if it is not enabled or no zone is configured """
+    pipe_conf = pipe_conf or {}
+    if not is_roi_enabled(pipe_conf, enable):
+        return None
+
+    areas = (app_conf or {}).get(AREA_POINTS)
+    if not areas:
+        return None
+
+    return ROICropper(
+        areas   = areas,
+        mode    = pipe_conf.get(ROI, enable),
+        margin  = pipe_conf.get(ROI_MARGIN, DEFAULT_MARGIN) )
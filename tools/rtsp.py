@@ -0,0 +1,416 @@
+import cv2, time, logging, threading
+from collections import deque
+
+from .stage import StageQueue, StageClosed, DROP_OLDEST, DROP_NEWEST, QUEUE, DROPPED, LATENCY
+from .encoder import get_default_settings, BITRATE, PRESET, KEY_INT
+from .frame_pool import FramePool
+
+# Define Key of the statistic
+FPS         = "fps"
+WRITTEN     = "written"
+DUPLICATED  = "duplicated"
+ENCODER     = "encoder"
+SENT        = "sent"
+SKIPPED     = "skipped"
+WATCHED     = "watched"
+SHAPE       = "shape"
+
+# Define Key which declared in the "pipeline" block of task.json
+SUBSTREAM   = "substream"
+SUB_SCALE   = "sub_scale"
+SUB_BITRATE = "sub_bitrate"
+
+MJPEG       = "mjpeg"
+
+SUB_PATH            = "sub"     # the substream is published to rtsp://.../<uuid>/sub
+DEFAULT_SUB_SCALE   = 0.5
+SUB_POOL_SIZE       = 4
+KEEPALIVE_INTERVAL  = 1         # seconds, the output which is not watched is sent once per interval to keep the path alive
+FPS_WINDOW          = 30        # frames to measure the encoder FPS
+WAIT_TIMEOUT        = 0.5
+RESTART_RETRIES     = 3
+RESTART_BACKOFF     = 1         # seconds, doubled in each retry
+
+
+def get_sub_name(task_uuid) -> str:
+    """ Return the path name of the substream in the RTSP server """
+    return f"{task_uuid}/{SUB_PATH}"
+
+
+def is_substream_enabled(pipe_conf:dict, default=False) -> bool:
+    """ Return True if the "pipeline" block enables the substream """
+    return (pipe_conf or {}).get(SUBSTREAM, default) not in [ False, None, "", "false", "False" ]
+
+
+def any_watched(is_watched=None, *others):
+    """ Return the function which checks if any output is watched, e.g. the main stream, the substream or the MJPEG clients,
+    None if the main stream has no watch function, which means it is always rendered """
+    if is_watched is None:
+        return None
+    funcs = [ is_watched ] + [ func for func in others if func is not None ]
+    return funcs[0] if len(funcs) == 1 else (lambda: any([ func() for func in funcs ]))
+
+
+def define_gst_pipeline(src_wid, src_hei, src_fps, rtsp_url, platform='intel', settings=None):
+    """ Return the GStreamer pipeline of the platform, the default settings of the encoder are used if not provided """
+    settings = settings or get_default_settings(src_wid, src_hei, src_fps, platform)
+    bitrate, preset, key_int = settings[BITRATE], settings[PRESET], settings[KEY_INT]
+
+    # The buffers are stamped with the running time when they are pushed, and videorate fills the gaps of the timeline
+    # inside the pipeline, so the writer does not have to push the same frame again to keep the declared FPS
+    base = 'appsrc is-live=true block=true do-timestamp=true format=GST_FORMAT_TIME ' + \
+            f'caps=video/x-raw,format=BGR,width={src_wid},height={src_hei},framerate={src_fps}/1 ' + \
+            f' ! videorate ! video/x-raw,framerate={src_fps}/1 ' + \
+            ' ! videoconvert ! video/x-raw,format=I420 ' + \
+            ' ! queue' + \
+            f' ! x264enc bitrate={bitrate} speed-preset={preset} key-int-max={key_int}' + \
+            f' ! rtspclientsink location={rtsp_url}'
+
+    xlnx =  'videomixer name=mix sink_0::xpos=0 sink_0::ypos=0 ! omxh264enc prefetch-buffer=true ' + \
+            f'control-rate=2 target-bitrate={bitrate} filler-data=false constrained-intra-prediction=true ' + \
+            f'periodicity-idr={key_int} gop-mode=low-delay-p aspect-ratio=3 low-bandwidth=true default-roi-quality=4 ' + \
+            '! video/x-h264,alignment=au ' + \
+            f'! rtspclientsink location={rtsp_url} ' + \
+            'appsrc is-live=true do-timestamp=true format=GST_FORMAT_TIME ' + \
+            f'caps=video/x-raw,format=BGR,width={src_wid},height={src_hei},framerate={src_fps}/1 ' + \
+            f'! videorate ! video/x-raw,framerate={src_fps}/1 ' + \
+            '! videoconvert ! mix.sink_0'
+
+    maps = {
+        'intel': base,
+        'nvidia': base,
+        'jetson': base,
+        'xilinx': xlnx
+    }
+    logging.info(f'Parse {platform} Gstreamer Pipeline ')
+    return maps.get(platform)
+
+# RTSP Output
+# -----------------------------------------------
+class RtspWritter():
+    """ Encode the submitted frames into the RTSP stream in a writer thread.
+
+    The frames are passed through a bounded queue, the writer thread waits on the queue
+    and each submitted frame is written once, the frame which could not be queued is dropped by the policy.
+    The writer never repeats a frame by itself: the pipeline stamps the buffers when they are pushed and
+    keeps the declared FPS with videorate, the output which is not watched is kept alive by the caller.
+    The pipeline is restarted by the writer thread when the encoder controller changes the settings,
+    and the error is raised by `submit` if the pipeline could not be opened again.
+
+    - Arguments
+        - task_uuid, platform, src_wid, src_hei, src_fps
+        - queue_size
+            - type: int
+        - policy
+            - type: str
+            - desc: drop_oldest or drop_newest
+        - encoder
+            - type: EncoderController
+            - desc: adjust the settings of the encoder at runtime, None means the default settings
+        - path
+            - type: str
+            - desc: the path under the task, e.g. "sub" is published to rtsp://.../<uuid>/sub
+    """
+    def __init__(self, task_uuid, platform, src_wid, src_hei, src_fps = 30, 
+                 queue_size = 2, policy = DROP_OLDEST, encoder = None, path = None) -> None:
+
+        if not (policy in [ DROP_OLDEST, DROP_NEWEST ]):
+            raise ValueError("Unexpected drop policy of RTSP writter ({}), support is [ {}, {} ]".format(
+                policy, DROP_OLDEST, DROP_NEWEST ))
+
+        # Params
+        self.src_wid = src_wid
+        self.src_hei = src_hei
+        self.src_fps = src_fps
+        self.rtsp_url = f"rtsp://localhost:8554/{task_uuid}" + (f"/{path}" if path else "")
+        self.platform = platform
+        self.encoder = encoder
+        
+        self.queue = StageQueue(queue_size, policy, on_drop=lambda buf: buf.release())
+        self.is_stop = False
+        self.error = None
+
+        # Statistic
+        self.written    = 0
+        self.duplicated = 0
+        self.last_idx   = None
+        self.t_writes   = deque(maxlen=FPS_WINDOW)
+        self.t_encode   = 0
+
+        # Define Writter
+        self.settings = encoder.get_settings() if encoder is not None else None
+        self.out = self.open(self.settings)
+
+        # Define the threading
+        self.worker = threading.Thread( target=self.write_thread, daemon=True)
+        
+    def open(self, settings=None):
+        """ Open the video writer of the GStreamer pipeline with the settings of the encoder """
+        self.gst_pipeline = define_gst_pipeline(
+            self.src_wid, self.src_hei, self.src_fps, self.rtsp_url, self.platform, settings
+        )
+        out = cv2.VideoWriter(  self.gst_pipeline, 
+                                cv2.CAP_GSTREAMER, 0, 
+                                self.src_fps, (self.src_wid, self.src_hei), True )
+
+        if not out.isOpened():
+            raise Exception("can't open video writer")
+        return out
+
+    def restart(self, settings) -> bool:
+        """ Restart the pipeline with the new settings, OpenCV could not change the properties of a running encoder.
+        The previous settings are restored if the new one could not be opened, and both of them are retried with a back off,
+        return False if the previous settings are restored, the error is raised if both of them failed """
+        self.out.release()
+        candidates = [ settings ] if settings == self.settings else [ settings, self.settings ]
+        for retry in range(RESTART_RETRIES):
+            for cur in candidates:
+                try:
+                    self.out = self.open(cur)
+                    self.settings = cur
+                    return cur is settings
+                except Exception as e:
+                    err = e
+                    logging.error('Could not restart the RTSP writter with {} ({})'.format(cur, e))
+            time.sleep(RESTART_BACKOFF * (2 ** retry))
+        raise err
+
+    def write_thread(self):
+        """ Write frame into gstreamer when it is submitted """
+        logging.warning('Start the RTSP writter')
+
+        try:    
+            while(not self.is_stop):
+
+                try:
+                    buf = self.queue.get(timeout=WAIT_TIMEOUT)
+                except StageClosed:
+                    break
+                if buf is None:
+                    continue
+
+                # Release the buffer once it is written, so the writer does not pin a buffer of the pool
+                t_write = time.time()
+                try:
+                    self.out.write(buf.array)
+                finally:
+                    buf.release()
+                t_done = time.time()
+                self.t_encode += t_done - t_write
+                self.t_writes.append(t_done)
+                self.written += 1
+
+                if self.encoder is not None:
+                    settings = self.encoder.check(self.written, self.t_encode, self.queue.dropped)
+                    if (settings is not None) and not self.restart(settings):
+                        self.encoder.revert()
+
+        except Exception as e:
+            logging.error('Got error in RTSP Writter ({})'.format(e))
+            self.error = e
+
+        finally:
+            self.is_stop = True
+            self.queue.close()
+            self.queue.clear()
+
+        logging.info("Stop RTSP Writter")
+
+    def submit(self, buf, idx=None):
+        """ Put the frame into the queue, the writer keeps a reference of the frame buffer until it is written or dropped,
+        the frame with the same index of the previous one is counted as duplicated """
+        if self.error is not None:
+            raise RuntimeError('RTSP writter is stopped ({})'.format(self.error))
+        if self.is_stop:
+            return
+
+        if (idx is not None) and (idx == self.last_idx):
+            self.duplicated += 1
+        self.last_idx = idx
+
+        self.queue.put(buf.retain())
+
+        if not self.worker.is_alive():
+            self.worker.start()
+
+    def is_running(self) -> bool:
+        return (not self.is_stop)
+
+    def get_fps(self) -> float:
+        """ Return the FPS of the encoder in the recent frames """
+        t_writes = list(self.t_writes)
+        if len(t_writes) < 2 or t_writes[-1] == t_writes[0]:
+            return 0
+        return (len(t_writes) - 1) / (t_writes[-1] - t_writes[0])
+
+    def get_stats(self) -> dict:
+        return {
+            FPS         : round(self.get_fps(), 3),
+            WRITTEN     : self.written,
+            DROPPED     : self.queue.dropped,
+            DUPLICATED  : self.duplicated,
+            QUEUE       : round(self.queue.occupancy(), 3),
+            LATENCY     : round(self.t_encode / self.written * 1000, 3) if self.written else 0,
+            ENCODER     : self.encoder.get_stats() if self.encoder is not None else None
+        }
+
+    def release(self):
+        self.is_stop = True
+        self.queue.close()
+        if self.worker.is_alive():
+            self.worker.join()
+
+        self.queue.clear()
+        self.out.release()
+        logging.warning('Clear RTSP Writter')
+
+
+class Substream():
+    """ The low resolution copy of the output, each rendered frame is resized once into the preallocated buffer.
+
+    The substream is only encoded while it is watched, otherwise one frame is sent in KEEPALIVE_INTERVAL
+    to keep the path in the RTSP server, so the new reader could connect to it.
+
+    - Arguments
+        - factory
+            - type: function
+            - desc: return a new RtspWritter with the arguments ( src_wid, src_hei )
+        - scale
+            - type: float
+            - desc: the ratio of the substream to the main stream
+        - is_watched
+            - type: function
+            - desc: return True if someone is watching the substream, None means always watched
+    """
+    def __init__(self, factory, scale=DEFAULT_SUB_SCALE, is_watched=None) -> None:
+        self.factory        = factory
+        self.scale          = min(max(float(scale), 0.05), 1)
+        self.check_watched  = is_watched
+        self.writer         = None
+        self.pool           = None
+        self.watched        = None
+        self.t_keepalive    = 0
+        self.sent           = 0
+        self.skipped        = 0
+
+    def get_shape(self, shape) -> tuple:
+        """ Return the shape of the substream, the width and height are even for the encoder """
+        hei, wid = shape[:2]
+        return ( max(2, int(hei * self.scale) // 2 * 2), max(2, int(wid * self.scale) // 2 * 2) ) + tuple(shape[2:])
+
+    def submit(self, buf, idx=None):
+        t_now = time.time()
+        self.watched = (self.check_watched is None) or self.check_watched()
+        if not self.watched and (t_now - self.t_keepalive < KEEPALIVE_INTERVAL):
+            self.skipped += 1
+            return
+
+        shape = self.get_shape(buf.shape)
+        if (self.pool is None) or (self.pool.shape != shape):
+            self.release()
+            self.pool = FramePool(shape, buf.array.dtype, SUB_POOL_SIZE)
+            self.writer = self.factory(shape[1], shape[0])
+
+        sub_buf = self.pool.acquire()
+        cv2.resize(buf.array, (shape[1], shape[0]), dst=sub_buf.array, interpolation=cv2.INTER_AREA)
+        self.writer.submit(sub_buf, idx)
+        sub_buf.release()
+
+        self.sent += 1
+        self.t_keepalive = t_now
+
+    def get_stats(self) -> dict:
+        return {
+            SHAPE       : self.pool.shape[:2] if self.pool is not None else None,
+            WATCHED     : self.watched,
+            SENT        : self.sent,
+            SKIPPED     : self.skipped,
+            ENCODER     : self.writer.get_stats() if self.writer is not None else None
+        }
+
+    def release(self):
+        writer, self.writer, self.pool = self.writer, None, None
+        if writer is not None:
+            writer.release()
+
+
+class OutputWriter():
+    """ Create the RTSP writer when the first frame is submitted and release it in headless mode,
+    so the headless task has no GStreamer pipeline at all and the output could be switched at runtime.
+
+    - Arguments
+        - factory
+            - type: function
+            - desc: return a new RtspWritter
+        - is_headless
+            - type: function
+            - desc: return True if the task is headless, None means never headless
+        - is_watched
+            - type: function
+            - desc: return True if someone is watching the main stream, 
+                    otherwise it is sent once per KEEPALIVE_INTERVAL, None means always watched
+        - substream
+            - type: Substream
+            - desc: the optional low resolution output
+        - mjpeg
+            - type: MjpegBroadcaster or MjpegRelay
+            - desc: the optional MJPEG output, the frame is encoded only if it has clients
+    """
+    def __init__(self, factory, is_headless=None, is_watched=None, substream=None, mjpeg=None) -> None:
+        self.factory        = factory
+        self.check_headless = is_headless
+        self.check_watched  = is_watched
+        self.substream      = substream
+        self.mjpeg          = mjpeg
+        self.writer         = None
+        self.t_keepalive    = 0
+        self.lock           = threading.Lock()
+
+    def is_headless(self) -> bool:
+        """ Return True if the task is headless, the writer is released when it turns to headless """
+        headless = bool(self.check_headless()) if self.check_headless is not None else False
+        if headless and self.writer is not None:
+            logging.info('Switch to headless mode, release the RTSP writter')
+            self.release()
+        return headless
+
+    def submit(self, buf, idx=None):
+        if self.is_headless():
+            return
+
+        t_now = time.time()
+        if (self.check_watched is None) or self.check_watched() or (t_now - self.t_keepalive >= KEEPALIVE_INTERVAL):
+            with self.lock:
+                if self.writer is None:
+                    self.writer = self.factory()
+                writer = self.writer
+            writer.submit(buf, idx)
+            self.t_keepalive = t_now
+
+        if self.substream is not None:
+            self.substream.submit(buf, idx)
+
+        if self.mjpeg is not None:
+            self.mjpeg.submit(buf, idx)
+
+    def is_running(self) -> bool:
+        writer = self.writer
+        return (writer is None) or writer.is_running()
+
+    def get_stats(self):
+        """ Return the statistic of the RTSP writter, None if it is not created """
+        writer = self.writer
+        stats = writer.get_stats() if writer is not None else None
+        if (stats is not None) and (self.substream is not None):
+            stats[SUB_PATH] = self.substream.get_stats()
+        if (stats is not None) and (self.mjpeg is not None):
+            stats[MJPEG] = self.mjpeg.get_stats()
+        return stats
+
+    def release(self):
+        with self.lock:
+            writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.release()
+        if self.substream is not None:
+            self.substream.release()
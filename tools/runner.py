@@ -0,0 +1,452 @@
+import time, json, logging
+from collections import deque
+
+from ivit_i.app.handler import get_application, ivitAppHandler
+
+from .stage import StagePipeline, BLOCK, QUEUE_SIZE as STAGE_QUEUE_SIZE, POLICY
+from .frame_pool import FramePool, FrameBuffer
+from .pacer import DeadlinePacer
+from .motion import get_motion_gate
+from .stride import get_stride_controller, BoxPropagator
+from .tracker import get_tracker
+from .roi import get_roi_cropper, ROIModel
+from .tiling import get_tiler, TiledModel
+from ..ai.infer_queue import InferQueue
+from .detection import as_detections, to_dict_info
+from .parser import NumpyEncoder
+
+# Define Key which declared in each task
+FRAME_IDX   = "frame_index"
+LIVE_TIME   = "live_time"
+PERF        = "perf"
+DETS        = "detections"
+
+# Define Key of the return information
+IDX         = "idx"
+INFER       = "inference"
+FPS         = "fps"
+FRAME       = "frame"
+RESULT      = "result"
+REQUEST     = "request"
+INFER_QUEUE = "infer_queue"
+MOTION      = "motion"
+PROPAGATE   = "propagate"
+OUTPUT      = "output"
+WATCHED     = "watched"
+HEADLESS    = "headless"
+ENCODER     = "encoder"
+RENDERED    = "rendered"
+SKIPPED     = "skipped"
+DISCARDED   = "discarded"
+
+# The function of the application which only runs the analytics and the alarms without drawing
+ANALYZE_FUNC = "analyze"
+
+# Define Key of the "pipeline" block in task.json
+QUEUE_SIZE  = "queue_size"
+DROP_POLICY = "drop_policy"
+PACING      = "pacing"
+TARGET_FPS  = "target_fps"
+STRIDE      = "stride"
+TRACKER     = "tracker"
+ROI         = "roi"
+TILING      = "tiling"
+
+# Define Stage
+CAPTURE_STAGE   = "capture"
+INFER_STAGE     = "inference"
+RENDER_STAGE    = "render"
+COMPLETE_STAGE  = "complete"
+TRACK_STAGE     = "track"
+
+FPS_POOL_SIZE   = 100
+PERF_INTERVAL   = 0.5
+SOCKET_INTERVAL = 1
+KEEPALIVE_INTERVAL = 1
+REQUEST_TIMEOUT = 5
+
+
+def init_application(model_conf:dict, app_dir:str):
+    """ Initialize the application of the AI task, support ivitAppHandler and the legacy application """
+
+    #NOTE: r1.1 still keep the legacy application usage
+
+    # Custom Application using ivitAppHandler
+    app_handler = ivitAppHandler()
+    app_handler.register_from_folder(app_dir.replace('./', ''))
+    if model_conf['application']['name'] in app_handler.get_all_apps():
+        app_object  = app_handler.get_app(model_conf['application']['name'])
+        return app_object(
+            params  = model_conf,
+            label   = model_conf[ model_conf['framework'] ]['label_path'] )
+
+    # Defualt application
+    return get_application(model_conf)
+
+
+class StreamRunner():
+    """ Run the capture, inference and render stage of an AI task.
+
+    The runner does not access app.config, it talks to the outside through `reader`, `writer` and `report`,
+    so it could be used in the stream thread and in the worker process.
+
+    - Arguments
+        - trg
+            - type: object
+            - desc: the AI model object
+        - application
+            - type: object
+            - desc: called with ( frame, info ) to draw the result, the optional `analyze(info)` runs the analytics
+                    without drawing when the frame is not output, the application without it ( e.g. the built-in
+                    applications of ivit_i ) still draws the frame which is not output, only the copy and the encoding are saved
+        - reader
+            - type: object
+            - desc: provide `read()` which returns a FrameBuffer and `is_reloaded()`, e.g. the subscriber of the source hub
+        - writer
+            - type: OutputWriter
+            - desc: provide `submit()`, `is_headless()` and `get_stats()`
+        - report
+            - type: function
+            - desc: receive a dictionary to update the task status, e.g. { "frame_index": 10 }
+        - start_time
+            - type: float
+        - pipe_conf
+            - type: dict
+            - desc: the "pipeline" block of task.json
+        - queue_size, drop_policy, pacing, stride, max_stride, tracker, roi, tiling
+            - desc: the default value if not setup in pipe_conf
+        - src_fps
+            - type: float
+            - desc: the FPS of the source, used to pace the capture stage in `source` mode
+        - app_conf
+            - type: dict
+            - desc: the "application" block of task.json, used to setup the motion gate and the zones of ROI
+        - draw_pool_size
+            - type: int
+        - is_watched
+            - type: function
+            - desc: return True if someone is watching the output, the frame is only encoded in 1 FPS if not,
+                    None means always watched
+        - extra_stats
+            - type: dict
+            - desc: the name and the function which returns the statistic to report with the pipeline, 
+                    e.g. { "batch": scheduler.get_stats }
+    """
+    def __init__(self, trg, application, reader, writer, report, start_time,
+                 pipe_conf=None, queue_size=2, drop_policy="drop_oldest", draw_pool_size=4, extra_stats=None,
+                 pacing="source", src_fps=30, app_conf=None, stride=1, max_stride=8,
+                 tracker=False, roi=False, tiling=False, is_watched=None) -> None:
+
+        self.trg            = trg
+        self.application    = application
+        self.reader         = reader
+        self.writer         = writer
+        self.report         = report
+        self.start_time     = start_time
+        self.pipe_conf      = pipe_conf if pipe_conf else dict()
+        self.draw_pool_size = draw_pool_size
+        self.extra_stats    = extra_stats if extra_stats else dict()
+        self.is_watched     = is_watched
+
+        # Shared parameters between stages
+        self.frame_idx      = 0
+        self.temp_info      = None
+        self.cur_fps        = 30
+        self.fps_pool       = deque(maxlen=FPS_POOL_SIZE)
+        self.t_socket       = 0
+        self.t_prev_out     = None
+        self.draw_pool      = None
+        self.track_reset    = False
+
+        # Statistic of the lazy rendering
+        self.watched        = True
+        self.headless       = False
+        self.t_keepalive    = 0
+        self.rendered       = 0
+        self.skipped        = 0
+        self.discarded      = 0
+
+        # Split the frame ( or each crop of the zones ) into the tiles which are inferred as one batch
+        self.tiler = get_tiler(self.pipe_conf, tiling)
+        if self.tiler is not None:
+            self.trg = trg = TiledModel(trg, self.tiler)
+
+        # Only do inference on the crops of the zones, the detections are mapped back to the full frame
+        self.roi = get_roi_cropper(self.pipe_conf, app_conf, roi)
+        if self.roi is not None:
+            self.trg = trg = ROIModel(trg, self.roi)
+
+        # Pace the capture stage against absolute deadlines
+        self.pacer = DeadlinePacer(
+            mode        = self.pipe_conf.get(PACING, pacing),
+            src_fps     = src_fps,
+            target_fps  = self.pipe_conf.get(TARGET_FPS) )
+
+        # Skip the inference of the static frames and reuse the last result
+        self.motion_gate = get_motion_gate(app_conf)
+
+        # Run the detector every N frames to fit the frame budget, the boxes are propagated on the other frames
+        self.stride = get_stride_controller(self.pipe_conf, self.pacer.period, stride, max_stride)
+        self.propagator = BoxPropagator() if self.stride is not None else None
+
+        # The inference runs in the request of the task, so it overlaps with the capture while the model keeps sync mode
+        self.infer_queue = InferQueue(trg)
+
+        # Add the track ID into each detection before the application
+        self.tracker = get_tracker(self.pipe_conf, tracker)
+        self.need_columnar = (self.tracker is not None) or (self.propagator is not None)
+        track_stages = [ ( TRACK_STAGE, self.track_stage ) ] if self.tracker is not None else []
+
+        # The result of the request in flight is completed through a blocking queue
+        infer_stages = [
+            ( INFER_STAGE, self.submit_stage ),
+            ( COMPLETE_STAGE, self.complete_stage, { STAGE_QUEUE_SIZE: 1, POLICY: BLOCK } ) ]
+
+        # Define the stream pipeline
+        self.pipeline = StagePipeline(
+            stages = [ ( CAPTURE_STAGE, self.capture_stage ) ] + infer_stages + track_stages + [ ( RENDER_STAGE, self.render_stage ) ],
+            queue_size  = self.pipe_conf.get(QUEUE_SIZE, queue_size),
+            policy      = self.pipe_conf.get(DROP_POLICY, drop_policy),
+            on_drop     = self.release_packet
+        )
+
+    def release_packet(self, packet):
+        # The frame is still used by the request in flight
+        if REQUEST in packet:
+            packet[REQUEST].event.wait(REQUEST_TIMEOUT)
+        packet[FRAME].release()
+
+    def capture_stage(self):
+        """ Read the frame from reader at the deadline of the pacer """
+
+        # Reset application and pacer if the source was reloaded
+        if self.reader.is_reloaded():
+            self.application.reset()
+            self.pacer.reset()
+            if self.motion_gate is not None: self.motion_gate.reset()
+            if self.stride is not None: self.stride.reset()
+            self.track_reset = True
+
+        self.pacer.wait()
+
+        # Get the frame buffer from reader
+        buf = self.reader.read()
+        if buf is None:
+            return None
+
+        # If got frame then add the frame index
+        self.frame_idx += 1
+        self.report({ FRAME_IDX: self.frame_idx })
+
+        return {
+            IDX     : self.frame_idx,
+            FRAME   : buf
+        }
+
+    def need_inference(self, packet) -> bool:
+        """ Return False if the frame is skipped by the stride or the motion gate """
+        if (self.stride is not None) and (not self.stride.need_inference()):
+            packet[PROPAGATE] = True
+            return False
+        return (self.motion_gate is None) or self.motion_gate.check(packet[FRAME].array)
+
+    def submit_stage(self, packet):
+        """ Submit the frame to the inference queue, block if the previous request is in flight """
+        if self.need_inference(packet):
+            packet[REQUEST] = self.infer_queue.submit( packet[FRAME].array )
+        return packet
+
+    def complete_stage(self, packet):
+        """ Wait for the result of the request, the frame skipped by the motion gate has no request """
+        if not (REQUEST in packet):
+            return self.skip_result(packet)
+
+        req = packet[REQUEST]
+        try:
+            cur_info = self.infer_queue.wait(req)
+        except Exception:
+            self.release_packet(packet)
+            raise
+
+        packet.pop(REQUEST)
+        return self.update_result(packet, cur_info, req.get_latency())
+
+    def skip_result(self, packet):
+        """ Reuse the last result, the boxes are moved to the current frame if skipped by the stride """
+        if not packet.pop(PROPAGATE, False) or self.temp_info is None:
+            return self.update_result(packet, None, 0)
+
+        t2 = time.time()
+        info = dict(self.temp_info)
+        info[DETS] = self.propagator.propagate(packet[FRAME].array)
+        self.stride.t_propagate += time.time() - t2
+
+        packet.update({
+            RESULT  : info,
+            INFER   : 0
+        })
+        return packet
+
+    def update_result(self, packet, cur_info, latency):
+        """ Keep the latest available result """
+
+        # Update temp_info, the detections are only converted into columnar arrays when the tracker or the propagation needs them,
+        # the ROI crops and the tiles already return the arrays, the default path keeps the detection list of the model
+        if(cur_info is not None):
+            if cur_info.get(DETS) is not None:
+                if self.need_columnar:
+                    cur_info = dict(cur_info)
+                    cur_info[DETS] = as_detections(cur_info[DETS])
+                self.temp_info = cur_info
+
+                # The detections of this frame is the reference of the propagation
+                if self.propagator is not None:
+                    self.propagator.set_reference(packet[FRAME].array, cur_info[DETS])
+
+        # Adapt the stride by the time of the inference
+        if self.stride is not None and latency:
+            self.stride.update(latency)
+
+        packet.update({
+            RESULT  : self.temp_info,
+            INFER   : round(latency, 3)
+        })
+        return packet
+
+    def track_stage(self, packet):
+        """ Associate the detections with the tracks, the result is copied since it may be reused by the next frame """
+
+        # The tracks of the old source are not continued, reset here since the tracker is only used by this stage
+        if self.track_reset:
+            self.track_reset = False
+            self.tracker.reset()
+
+        info = packet[RESULT]
+        if (info is not None) and (info.get(DETS) is not None):
+            info = dict(info)
+            info[DETS] = self.tracker.update(info[DETS])
+            packet[RESULT] = info
+        return packet
+
+    def render_stage(self, packet):
+        """ Draw the result, send the RTSP stream and report the information """
+
+        # The application and the API get the detection list
+        info = to_dict_info(packet[RESULT])
+
+        # Only render and encode while someone is watching, otherwise keep the stream alive in KEEPALIVE_INTERVAL,
+        # nothing is encoded in headless mode
+        t_render = time.time()
+        self.headless = self.writer.is_headless()
+        self.watched = (self.is_watched is None) or self.is_watched()
+        need_output = (not self.headless) and (self.watched or (t_render - self.t_keepalive >= KEEPALIVE_INTERVAL))
+
+        src_buf = packet[FRAME]
+        if (self.draw_pool is None) or (not self.draw_pool.fits(src_buf.array)):
+            self.draw_pool = FramePool(src_buf.shape, src_buf.array.dtype, self.draw_pool_size)
+
+        if need_output:
+
+            # Copy frame into the preallocated buffer for drawing, the source buffer is shared with other tasks
+            draw_buf = self.draw_pool.copy_from(src_buf.array)
+            src_buf.release()
+
+            # Draw something
+            draw = draw_buf.array
+            if (info is not None):
+                draw, app_info = self.application(draw, info)
+
+            # Send RTSP, wrap the frame if the application returns a new array
+            out_buf = draw_buf if (draw is draw_buf.array) else FrameBuffer(None, draw)
+            self.writer.submit(out_buf, packet[IDX])
+            self.t_keepalive = t_render
+            draw_buf.release()
+
+        elif (info is not None):
+            src_buf.release()
+
+            # The application still runs for the analytics and the alarms, but the frame is not copied or encoded,
+            # the application without `analyze` has to draw, it draws on a spare buffer which is discarded
+            analyze = getattr(self.application, ANALYZE_FUNC, None)
+            if analyze is not None:
+                analyze(info)
+            else:
+                draw_buf = self.draw_pool.acquire()
+                self.application(draw_buf.array, info)
+                draw_buf.release()
+                self.discarded += 1
+        else:
+            src_buf.release()
+
+        if need_output:
+            self.rendered += 1
+        else:
+            self.skipped += 1
+
+        # Average FPS
+        t_out = time.time()
+        if self.t_prev_out is not None:
+            self.fps_pool.append(1/max(t_out-self.t_prev_out, 1e-6))
+            self.cur_fps = int(sum(self.fps_pool)/len(self.fps_pool)) if len(self.fps_pool)>10 else self.cur_fps
+        self.t_prev_out = t_out
+
+        # Update Live Time
+        mesg = { LIVE_TIME: int(t_out - self.start_time) }
+
+        # Combine the return information
+        if(t_out - self.t_socket >= SOCKET_INTERVAL):
+            ret_info = {
+                IDX         : packet[IDX],
+                DETS        : info.get(DETS) if (info is not None) else '',
+                INFER       : packet[INFER],
+                FPS         : self.cur_fps,
+                LIVE_TIME   : round((t_out - self.start_time), 5),
+            }
+            mesg[RESULT] = json.dumps(ret_info, cls=NumpyEncoder)
+            self.t_socket = t_out
+
+        self.report(mesg)
+        return None
+
+    def get_stats(self) -> dict:
+        stats = self.pipeline.get_stats()
+        stats[PACING] = self.pacer.get_stats()
+        stats[INFER_QUEUE] = self.infer_queue.get_stats()
+        if self.motion_gate is not None:
+            stats[MOTION] = self.motion_gate.get_stats()
+        if self.stride is not None:
+            stats[STRIDE] = self.stride.get_stats()
+        if self.roi is not None:
+            stats[ROI] = self.roi.get_stats()
+        if self.tiler is not None:
+            stats[TILING] = self.tiler.get_stats()
+        if self.tracker is not None:
+            stats[TRACKER] = self.tracker.get_stats()
+        stats[OUTPUT] = { HEADLESS: self.headless, WATCHED: self.watched, RENDERED: self.rendered, SKIPPED: self.skipped,
+            DISCARDED: self.discarded, ENCODER: self.writer.get_stats() }
+        stats.update({ name: func() for name, func in self.extra_stats.items() })
+        return stats
+
+    def run(self, keep_running):
+        """ Start the pipeline and block until `keep_running()` returns False or any stage stops,
+        the error which occurred in any stage will be raised """
+        try:
+            self.pipeline.start()
+
+            while(keep_running() and self.pipeline.is_running()):
+
+                # Update the occupancy of each stage
+                self.report({ PERF: self.get_stats() })
+                time.sleep(PERF_INTERVAL)
+
+        finally:
+            self.pipeline.stop()
+            self.pipeline.join()
+            self.infer_queue.stop()
+
+        # Raise the error which occurred in any stage
+        err = self.pipeline.get_error()
+        if err is not None:
+            raise err
+
+        logging.info('Stop streaming')
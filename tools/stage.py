@@ -0,0 +1,267 @@
+import time, logging, threading
+from collections import deque
+
+# Define Drop Policy
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK       = "block"
+DROP_POLICY = [ DROP_OLDEST, DROP_NEWEST, BLOCK ]
+
+# Define Key of the statistic
+BUSY        = "busy"
+QUEUE       = "queue"
+PROCESSED   = "processed"
+DROPPED     = "dropped"
+LATENCY     = "latency"
+STAGES      = "stages"
+BOTTLENECK  = "bottleneck"
+
+# Define Key of the queue options of each stage
+QUEUE_SIZE  = "queue_size"
+POLICY      = "policy"
+
+
+class StageClosed(Exception):
+    """ Raised when reading from a closed queue """
+    pass
+
+
+class StageQueue():
+    """ Bounded queue which links two stages of the stream pipeline
+
+    - Arguments
+        - maxsize
+            - type: int
+            - desc: the capacity of the queue
+        - policy
+            - type: str
+            - desc: what to do when the queue is full, support [ drop_oldest, drop_newest, block ]
+        - on_drop
+            - type: function
+            - desc: called with the item which is dropped, e.g. release the frame buffer
+    """
+    def __init__(self, maxsize=2, policy=DROP_OLDEST, on_drop=None) -> None:
+
+        if not (policy in DROP_POLICY):
+            raise ValueError("Unexpected drop policy ({}), support is [ {} ]".format(
+                policy, ', '.join(DROP_POLICY) ))
+
+        self.maxsize    = max(1, int(maxsize))
+        self.policy     = policy
+        self.items      = deque()
+        self.cond       = threading.Condition()
+        self.is_closed  = False
+        self.dropped    = 0
+        self.on_drop    = on_drop
+
+    def put(self, item, timeout=None) -> bool:
+        """ Put item into queue, return False if the new item is dropped or timeout in block mode """
+        with self.cond:
+            while len(self.items) >= self.maxsize and not self.is_closed:
+
+                if self.policy == DROP_OLDEST:
+                    self.drop(self.items.popleft())
+                    break
+
+                if self.policy == DROP_NEWEST:
+                    self.drop(item)
+                    return False
+
+                # Block until consumer takes one
+                if not self.cond.wait(timeout):
+                    return False
+
+            if self.is_closed:
+                self.drop(item)
+                return False
+
+            self.items.append(item)
+            self.cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """ Get item from queue, raise StageClosed if closed and empty, return None if timeout """
+        with self.cond:
+            while not self.items:
+                if self.is_closed:
+                    raise StageClosed()
+                if not self.cond.wait(timeout):
+                    return None
+
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def drop(self, item):
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    def close(self):
+        with self.cond:
+            self.is_closed = True
+            self.cond.notify_all()
+
+    def clear(self):
+        """ Drop the remaining items """
+        with self.cond:
+            while self.items:
+                self.drop(self.items.popleft())
+
+    def occupancy(self) -> float:
+        return len(self.items) / self.maxsize
+
+
+class Stage():
+    """ One worker of the stream pipeline
+
+    The `func` is called with the item from `in_queue` ( or without argument for the first stage )
+    and the return value is put into `out_queue`, return None to forward nothing.
+    """
+    def __init__(self, name, func, in_queue=None, out_queue=None) -> None:
+
+        self.name       = name
+        self.func       = func
+        self.in_queue   = in_queue
+        self.out_queue  = out_queue
+        self.error      = None
+
+        self.processed  = 0
+        self.t_busy     = 0
+        self.t_start    = None
+        self.last_stats = None
+        self.stop_event = threading.Event()
+
+        self.worker = threading.Thread( target=self.run, name=name, daemon=True )
+
+    def run(self):
+        self.t_start = time.time()
+        try:
+            while not self.stop_event.is_set():
+
+                item = None
+                if self.in_queue is not None:
+                    item = self.in_queue.get(timeout=0.1)
+                    if item is None: continue
+
+                t1 = time.time()
+                ret = self.func(item) if self.in_queue is not None else self.func()
+                self.t_busy += time.time() - t1
+                self.processed += 1
+
+                if ret is not None and self.out_queue is not None:
+                    self.forward(ret)
+
+        except StageClosed:
+            pass
+
+        except Exception as e:
+            self.error = e
+            logging.exception(e)
+
+        finally:
+            self.stop_event.set()
+            if self.out_queue is not None:
+                self.out_queue.close()
+            logging.info('Stop {} stage'.format(self.name))
+
+    def forward(self, item):
+        """ Put the item into next queue, keep retrying if the policy is block """
+        while not self.out_queue.put(item, timeout=0.1):
+            if self.out_queue.policy != BLOCK or self.out_queue.is_closed:
+                return
+            if self.stop_event.is_set():
+                self.out_queue.drop(item)
+                return
+
+    def start(self):
+        self.worker.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.in_queue is not None:
+            self.in_queue.close()
+
+    def join(self, timeout=None):
+        if self.worker.is_alive():
+            self.worker.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self.worker.is_alive()
+
+    def get_stats(self) -> dict:
+        """ Busy means the ratio of time spent in `func` since the last call, queue is the occupancy of the input queue """
+        t_now, t_busy = time.time(), self.t_busy
+        t_last, t_last_busy = self.last_stats if self.last_stats else (self.t_start, 0)
+        self.last_stats = (t_now, t_busy)
+
+        t_window = (t_now - t_last) if t_last else 0
+        return {
+            BUSY        : round(min((t_busy - t_last_busy) / t_window, 1), 3) if t_window else 0,
+            QUEUE       : round(self.in_queue.occupancy(), 3) if self.in_queue is not None else None,
+            DROPPED     : self.in_queue.dropped if self.in_queue is not None else 0,
+            PROCESSED   : self.processed,
+            LATENCY     : round(self.t_busy / self.processed * 1000, 3) if self.processed else 0,
+        }
+
+
+class StagePipeline():
+    """ Chain the stage functions with bounded queues
+
+    - Arguments
+        - stages
+            - type: list
+            - desc: list of ( name, func ) or ( name, func, options ), the first one is the source stage,
+                    the options could overwrite the queue_size and policy of the input queue of the stage
+        - queue_size
+            - type: int
+        - policy
+            - type: str
+            - desc: the drop policy of each queue
+        - on_drop
+            - type: function
+            - desc: called with the item which is dropped by any queue
+    """
+    def __init__(self, stages, queue_size=2, policy=DROP_OLDEST, on_drop=None) -> None:
+
+        self.stages = []
+        in_queue = None
+        for idx, (name, func, *_) in enumerate(stages):
+            out_queue = None
+            if idx < len(stages)-1:
+                options = stages[idx+1][2] if len(stages[idx+1]) > 2 else {}
+                out_queue = StageQueue(
+                    options.get(QUEUE_SIZE, queue_size), options.get(POLICY, policy), on_drop )
+            self.stages.append(Stage(name, func, in_queue, out_queue))
+            in_queue = out_queue
+
+    def start(self):
+        [ stage.start() for stage in self.stages ]
+
+    def stop(self):
+        [ stage.stop() for stage in self.stages ]
+
+    def join(self, timeout=None):
+        [ stage.join(timeout) for stage in self.stages ]
+
+        # Drop the items which are not processed
+        [ stage.in_queue.clear() for stage in self.stages if stage.in_queue is not None ]
+
+    def is_running(self) -> bool:
+        """ The pipeline is running if all stages are alive """
+        return all([ stage.is_alive() for stage in self.stages ])
+
+    def get_error(self):
+        for stage in self.stages:
+            if stage.error is not None:
+                return stage.error
+        return None
+
+    def get_stats(self) -> dict:
+        """ Return the statistic of each stage and the stage which limits FPS """
+        stats = { stage.name: stage.get_stats() for stage in self.stages }
+        bottleneck = max(stats, key=lambda name: stats[name][BUSY]) if stats else None
+        return {
+            STAGES      : stats,
+            BOTTLENECK  : bottleneck
+        }
@@ -0,0 +1,165 @@
+import math
+import cv2
+import numpy as np
+
+from .detection import Detections
+
+# Define Key which declared in the "pipeline" block of task.json
+STRIDE      = "stride"
+MAX_STRIDE  = "max_stride"
+AUTO        = "auto"
+
+# Define Key of the statistic
+INFERRED    = "inferred"
+PROPAGATED  = "propagated"
+INFER_TIME  = "infer_time"
+BUDGET      = "budget"
+PROPAGATE_TIME = "propagate_time"
+
+FLOW_WIDTH  = 320       # the width of the frame to calculate the optical flow
+MAX_POINTS  = 20        # the maximum feature points of each box
+EMA_ALPHA   = 0.2
+MARGIN      = 1.1       # keep 10% of the frame budget for the other stages
+LK_PARAMS   = dict( winSize  = (15, 15), maxLevel = 2,
+                    criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03) )
+
+
+class StrideController():
+    """ Decide which frame runs the detector, the stride adapts to make the inference time fit the frame budget.
+
+    - Arguments
+        - budget
+            - type: float
+            - desc: seconds of one frame, e.g. 1/src_fps
+        - stride
+            - type: int or str
+            - desc: run the detector every N frames, or "auto"
+        - max_stride
+            - type: int
+    """
+    def __init__(self, budget, stride=AUTO, max_stride=8) -> None:
+        self.budget     = budget
+        self.auto       = (stride == AUTO)
+        self.max_stride = max(1, int(max_stride))
+        self.stride     = 1 if self.auto else max(1, int(stride))
+        self.count      = 0
+        self.infer_time = None
+
+        self.inferred   = 0
+        self.propagated = 0
+        self.t_propagate= 0
+
+    def need_inference(self) -> bool:
+        """ Return True if the current frame has to run the detector """
+        if self.count % self.stride == 0:
+            self.count = 1
+            self.inferred += 1
+            return True
+        self.count += 1
+        self.propagated += 1
+        return False
+
+    def update(self, latency):
+        """ Update the inference time ( ms ) and adjust the stride """
+        latency = latency / 1000
+        self.infer_time = latency if self.infer_time is None else \
+            (EMA_ALPHA * latency + (1 - EMA_ALPHA) * self.infer_time)
+
+        if self.auto:
+            self.stride = min(max(1, math.ceil(self.infer_time * MARGIN / self.budget)), self.max_stride)
+
+    def reset(self):
+        self.count = 0
+
+    def get_stats(self) -> dict:
+        return {
+            STRIDE      : self.stride,
+            AUTO        : self.auto,
+            INFERRED    : self.inferred,
+            PROPAGATED  : self.propagated,
+            INFER_TIME  : round(self.infer_time * 1000, 3) if self.infer_time else 0,
+            BUDGET      : round(self.budget * 1000, 3),
+            PROPAGATE_TIME : round(self.t_propagate / self.propagated * 1000, 3) if self.propagated else 0
+        }
+
+
+class BoxPropagator():
+    """ Move the boxes of the last Detections to the current frame by the median optical flow of the points in each box """
+
+    def __init__(self) -> None:
+        self.gray   = None
+        self.scale  = 1
+        self.dets   = Detections()
+        self.points = []
+
+    def to_gray(self, frame):
+        hei, wid = frame.shape[:2]
+        scale = min(1, FLOW_WIDTH / wid)
+        small = cv2.resize(frame, (int(wid * scale), int(hei * scale)), interpolation=cv2.INTER_AREA) \
+            if scale < 1 else frame
+        return (cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small), scale
+
+    def sample_points(self, box):
+        """ Find the feature points in the box, use the grid points if there is no feature """
+        x1, y1, x2, y2 = [ int(val * self.scale) for val in box ]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(self.gray.shape[1]-1, x2), min(self.gray.shape[0]-1, y2)
+        if x2 <= x1 or y2 <= y1:
+            return np.empty((0, 1, 2), np.float32)
+
+        mask = np.zeros_like(self.gray)
+        mask[y1:y2+1, x1:x2+1] = 255
+        points = cv2.goodFeaturesToTrack(self.gray, MAX_POINTS, 0.01, 3, mask=mask)
+        if points is None:
+            xs, ys = np.meshgrid(np.linspace(x1, x2, 3), np.linspace(y1, y2, 3))
+            points = np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2)
+        return points.astype(np.float32)
+
+    def set_reference(self, frame, dets):
+        """ Keep the frame and the Detections which the result belongs to """
+        self.gray, self.scale = self.to_gray(frame)
+        self.dets = dets
+        has_box = dets.has_box.tolist()
+        self.points = [ self.sample_points(box) if has_box[idx] else None for idx, box in enumerate(dets.boxes.tolist()) ]
+
+    def propagate(self, frame):
+        """ Return the Detections which are moved to the current frame """
+        dets = self.dets.select(np.arange(len(self.dets)))
+        if self.gray is None or not len(dets):
+            return dets
+
+        gray, _ = self.to_gray(frame)
+        tracked = [ pts for pts in self.points if pts is not None and len(pts) ]
+        if not tracked or gray.shape != self.gray.shape:
+            return dets
+
+        prev_pts = np.concatenate(tracked)
+        next_pts, status, _ = cv2.calcOpticalFlowPyrLK(self.gray, gray, prev_pts, None, **LK_PARAMS)
+
+        hei, wid = frame.shape[:2]
+        start = 0
+        for idx, pts in enumerate(self.points):
+            if pts is None or not len(pts):
+                continue
+
+            end = start + len(pts)
+            good = status[start:end].ravel() == 1
+            if good.any():
+                dx, dy = np.median((next_pts[start:end] - pts)[good].reshape(-1, 2), axis=0) / self.scale
+                dets.boxes[idx] += np.array([dx, dy, dx, dy], np.float32)
+                self.points[idx] = next_pts[start:end][good].reshape(-1, 1, 2)
+            start = end
+
+        dets.boxes[:] = np.clip(dets.boxes, 0, np.array([wid, hei, wid, hei], np.float32) - 1)
+        self.dets = dets
+        self.gray = gray
+        return dets
+
+
+def get_stride_controller(pipe_conf:dict, budget, stride=1, max_stride=8):
+    """ Create the stride controller from the "pipeline" block, return None if stride is 1 """
+    pipe_conf = pipe_conf or {}
+    stride = pipe_conf.get(STRIDE, stride)
+    if stride in [ 1, "1", None ]:
+        return None
+    return StrideController(budget, stride, pipe_conf.get(MAX_STRIDE, max_stride))
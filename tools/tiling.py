@@ -0,0 +1,199 @@
+import math, time
+import numpy as np
+
+from .tracker import iou_matrix
+from .detection import Detections, as_detections, DETS
+from ..ai.scheduler import BATCH_FUNC
+
+# Define Key which declared in the "pipeline" block of task.json
+TILING          = "tiling"
+TILE_SIZE       = "tile_size"
+TILE_OVERLAP    = "tile_overlap"
+MAX_TILES       = "max_tiles"
+TILE_FULL       = "tile_full"
+TILE_NMS        = "tile_nms"
+
+# Define Key of the statistic
+TILES       = "tiles"
+BOXES       = "boxes"
+KEPT        = "kept"
+SPLIT_TIME  = "split_time"
+INFER_TIME  = "infer_time"
+MERGE_TIME  = "merge_time"
+
+DEFAULT_TILE_SIZE   = 640
+DEFAULT_OVERLAP     = 0.2
+DEFAULT_MAX_TILES   = 6
+DEFAULT_NMS         = 0.5
+TILE_GROWTH         = 1.2       # enlarge the tile if it needs more than max_tiles
+
+
+def get_starts(length, tile, overlap) -> list:
+    """ Return the start positions of the tiles which cover the length with the overlap """
+    if length <= tile:
+        return [ 0 ]
+    num = math.ceil((length - tile) / (tile * (1 - overlap))) + 1
+    return np.linspace(0, length - tile, num).round().astype(int).tolist()
+
+
+def nms(boxes, scores, labels, thres) -> np.ndarray:
+    """ Return the indexes of the kept boxes, the boxes of different labels never suppress each other """
+    if not len(boxes):
+        return np.empty(0, int)
+
+    # Move the boxes of each label to a separated area, so one pass handles all labels
+    _, label_idx = np.unique(labels, return_inverse=True)
+    boxes = boxes + (label_idx * (boxes.max() + 1))[:, None]
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        idx, order = order[0], order[1:]
+        keep.append(idx)
+        if order.size:
+            order = order[ iou_matrix(boxes[idx:idx+1], boxes[order])[0] <= thres ]
+    return np.array(keep, int)
+
+
+class TiledInference():
+    """ Split the frame into the overlapped tiles, run them and merge the detections by NMS.
+
+    The tiles are run as one batch only if the model provides `inference_batch`, otherwise one by one.
+
+    - Arguments
+        - tile_size
+            - type: int
+            - desc: the width and height of the tile
+        - overlap
+            - type: float
+            - desc: the overlapped ratio of the neighbouring tiles
+        - max_tiles
+            - type: int
+            - desc: the inferences of each frame including the full frame, the tile is enlarged if the frame needs more tiles
+        - full
+            - type: bool
+            - desc: add the full frame into the tiles to keep the large objects
+        - nms_thres
+            - type: float
+    """
+    def __init__(self, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP, max_tiles=DEFAULT_MAX_TILES,
+                 full=True, nms_thres=DEFAULT_NMS) -> None:
+
+        self.tile_size  = max(32, int(tile_size))
+        self.overlap    = min(max(0, float(overlap)), 0.9)
+        self.max_tiles  = max(1, int(max_tiles))
+        self.full       = full
+        self.nms_thres  = float(nms_thres)
+        self.shape      = None
+        self.tiles      = []
+
+        self.frames     = 0
+        self.boxes      = 0
+        self.kept       = 0
+        self.t_split    = 0
+        self.t_infer    = 0
+        self.t_merge    = 0
+
+    def get_tiles(self, shape) -> list:
+        """ Return the tiles ( x1, y1, x2, y2 ) of the frame, the full frame takes one of the max_tiles """
+        if shape[:2] == self.shape:
+            return self.tiles
+
+        hei, wid = shape[:2]
+        tile = self.tile_size
+        limit = max(1, self.max_tiles - 1) if self.full else self.max_tiles
+        while True:
+            xs = get_starts(wid, tile, self.overlap)
+            ys = get_starts(hei, tile, self.overlap)
+            if len(xs) * len(ys) <= limit or tile >= max(wid, hei):
+                break
+            tile = int(tile * TILE_GROWTH)
+
+        self.tiles = [ (x, y, min(x + tile, wid), min(y + tile, hei)) for y in ys for x in xs ]
+        self.shape = shape[:2]
+        return self.tiles
+
+    def merge(self, results):
+        """ Shift the detections of each tile to the full frame and remove the duplicated ones """
+        dets = Detections.concat([ as_detections(info.get(DETS)).shift(x1, y1) 
+            for (x1, y1, _, _), info in results if info is not None ])
+
+        has_box = dets.has_box
+        idx_box = np.flatnonzero(has_box)
+        keep = nms(dets.boxes[idx_box], dets.scores[idx_box], dets.labels[idx_box].astype(str), self.nms_thres)
+
+        self.boxes += len(idx_box)
+        self.kept += len(keep)
+        return dets.select(np.concatenate([ np.sort(idx_box[keep]), np.flatnonzero(~has_box) ]))
+
+    def inference(self, trg, frame):
+        """ Do inference on the tiles of the frame """
+        t1 = time.time()
+        hei, wid = frame.shape[:2]
+        tiles = list(self.get_tiles(frame.shape))
+        if len(tiles) == 1 and tiles[0] == (0, 0, wid, hei):
+            return trg.inference(frame)
+        if self.full:
+            tiles.append((0, 0, wid, hei))
+        crops = [ frame if tile[2:] == (wid, hei) and tile[:2] == (0, 0) else
+                  np.ascontiguousarray(frame[tile[1]:tile[3], tile[0]:tile[2]]) for tile in tiles ]
+
+        t2 = time.time()
+        batch_func = getattr(trg, BATCH_FUNC, None)
+        infos = batch_func(crops) if batch_func is not None else [ trg.inference(crop) for crop in crops ]
+
+        t3 = time.time()
+        info = next((info for info in infos if info is not None), None)
+        if info is not None and info.get(DETS) is not None:
+            info = dict(info)
+            info[DETS] = self.merge(zip(tiles, infos))
+
+        self.frames += 1
+        self.t_split += t2 - t1
+        self.t_infer += t3 - t2
+        self.t_merge += time.time() - t3
+        return info
+
+    def get_stats(self) -> dict:
+        avg = lambda val: round(val / self.frames, 3) if self.frames else 0
+        return {
+            TILES       : len(self.tiles) + (1 if self.full and len(self.tiles) > 1 else 0),
+            TILE_SIZE   : (self.tiles[0][2] - self.tiles[0][0]) if self.tiles else self.tile_size,
+            BOXES       : avg(self.boxes),
+            KEPT        : avg(self.kept),
+            SPLIT_TIME  : avg(self.t_split * 1000),
+            INFER_TIME  : avg(self.t_infer * 1000),
+            MERGE_TIME  : avg(self.t_merge * 1000)
+        }
+
+
+class TiledModel():
+    """ The proxy of the AI model object which does inference on the tiles """
+
+    def __init__(self, trg, tiler) -> None:
+        self.trg    = trg
+        self.tiler  = tiler
+
+    def __getattr__(self, name):
+        return getattr(self.trg, name)
+
+    def inference(self, frame):
+        return self.tiler.inference(self.trg, frame)
+
+
+def is_tiling_enabled(pipe_conf:dict, default=False) -> bool:
+    """ Return True if the "pipeline" block enables the tiled inference """
+    return (pipe_conf or {}).get(TILING, default) not in [ False, None, "", "false", "False" ]
+
+
+def get_tiler(pipe_conf:dict, enable=False):
+    """ Create the tiled inference from the "pipeline" block, return None if it is not enabled """
+    pipe_conf = pipe_conf or {}
+    if not is_tiling_enabled(pipe_conf, enable):
+        return None
+    return TiledInference(
+        tile_size   = pipe_conf.get(TILE_SIZE, DEFAULT_TILE_SIZE),
+        overlap     = pipe_conf.get(TILE_OVERLAP, DEFAULT_OVERLAP),
+        max_tiles   = pipe_conf.get(MAX_TILES, DEFAULT_MAX_TILES),
+        full        = pipe_conf.get(TILE_FULL, True),
+        nms_thres   = pipe_conf.get(TILE_NMS, DEFAULT_NMS) )
@@ -0,0 +1,155 @@
+import time
+import numpy as np
+
+# Define Key which declared in the "pipeline" block of task.json
+TRACKER     = "tracker"
+IOU_THRES   = "track_iou"
+MAX_AGE     = "track_max_age"
+
+# Define Key of the statistic
+TRACKS      = "tracks"
+NEXT_ID     = "next_id"
+BOXES       = "boxes"
+LATENCY     = "latency"
+
+DEFAULT_IOU     = 0.3
+DEFAULT_MAX_AGE = 15        # frames to keep the track without matched detection
+VELOCITY_ALPHA  = 0.5
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """ Return the IoU of each pair of boxes with shape ( N, M ), the box is ( xmin, ymin, xmax, ymax ) """
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(scores, thres):
+    """ Match the pairs from the highest score, return the matched ( rows, cols ) """
+    rows, cols = np.nonzero(scores >= thres)
+    order = np.argsort(-scores[rows, cols], kind="stable")
+
+    used_rows, used_cols = set(), set()
+    matches = []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matches.append((row, col))
+
+    if not matches:
+        return np.empty(0, int), np.empty(0, int)
+    return tuple(np.array(idx) for idx in zip(*matches))
+
+
+class IoUTracker():
+    """ Associate the Detections between frames by IoU and set a stable track ID of each detection.
+
+    The tracks are kept in arrays, the box is predicted with a constant velocity before matching,
+    and only the detections with the same label could be matched.
+
+    - Arguments
+        - iou_thres
+            - type: float
+        - max_age
+            - type: int
+            - desc: the track is removed if it is not matched in max_age frames
+    """
+    def __init__(self, iou_thres=DEFAULT_IOU, max_age=DEFAULT_MAX_AGE) -> None:
+        self.iou_thres  = float(iou_thres)
+        self.max_age    = int(max_age)
+        self.boxes      = np.empty((0, 4), np.float32)
+        self.velocity   = np.empty((0, 2), np.float32)
+        self.labels     = np.empty(0, object)
+        self.ids        = np.empty(0, int)
+        self.misses     = np.empty(0, int)
+        self.next_id    = 1
+
+        self.frames     = 0
+        self.n_boxes    = 0
+        self.t_total    = 0
+
+    def update(self, dets):
+        """ Return the new Detections with the track ID, the input detections are not modified """
+        t1 = time.time()
+
+        ret = dets.select(np.arange(len(dets)))
+        idx_box = np.flatnonzero(ret.has_box)
+        boxes, labels = ret.boxes[idx_box], ret.labels[idx_box]
+
+        # Predict the boxes of the tracks
+        pred = self.boxes + np.tile(self.velocity, 2)
+
+        # Match by IoU, the pair with different label is not allowed
+        scores = iou_matrix(pred, boxes)
+        scores[ self.labels[:, None] != labels[None, :] ] = 0
+        rows, cols = greedy_match(scores, self.iou_thres)
+
+        # Update the matched tracks
+        centers = lambda b: np.stack([ (b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2 ], axis=1)
+        self.velocity[rows] = VELOCITY_ALPHA * (centers(boxes[cols]) - centers(self.boxes[rows])) + \
+            (1 - VELOCITY_ALPHA) * self.velocity[rows]
+        self.boxes = pred
+        self.boxes[rows] = boxes[cols]
+        self.misses += 1
+        self.misses[rows] = 0
+
+        # Create the tracks of the unmatched detections
+        new = np.setdiff1d(np.arange(len(boxes)), cols)
+        new_ids = np.arange(self.next_id, self.next_id + len(new))
+        self.next_id += len(new)
+
+        det_ids = np.zeros(len(boxes), int)
+        det_ids[cols] = self.ids[rows]
+        det_ids[new] = new_ids
+
+        self.boxes      = np.concatenate([ self.boxes, boxes[new] ])
+        self.velocity   = np.concatenate([ self.velocity, np.zeros((len(new), 2), np.float32) ])
+        self.labels     = np.concatenate([ self.labels, labels[new] ])
+        self.ids        = np.concatenate([ self.ids, new_ids ])
+        self.misses     = np.concatenate([ self.misses, np.zeros(len(new), int) ])
+
+        # Remove the lost tracks
+        alive = self.misses <= self.max_age
+        self.boxes, self.velocity, self.labels, self.ids, self.misses = \
+            self.boxes[alive], self.velocity[alive], self.labels[alive], self.ids[alive], self.misses[alive]
+
+        ret.track_ids[idx_box] = det_ids
+
+        self.frames += 1
+        self.n_boxes += len(boxes)
+        self.t_total += time.time() - t1
+        return ret
+
+    def reset(self):
+        self.__init__(self.iou_thres, self.max_age)
+
+    def get_stats(self) -> dict:
+        return {
+            TRACKS  : len(self.ids),
+            NEXT_ID : self.next_id,
+            BOXES   : round(self.n_boxes / self.frames, 3) if self.frames else 0,
+            LATENCY : round(self.t_total / self.frames * 1000, 3) if self.frames else 0
+        }
+
+
+def is_tracker_enabled(pipe_conf:dict, default=False) -> bool:
+    """ Return True if the "pipeline" block enables the tracker """
+    return (pipe_conf or {}).get(TRACKER, default) not in [ False, None, "", "false", "False" ]
+
+
+def get_tracker(pipe_conf:dict, enable=False):
+    """ Create the tracker from the "pipeline" block, return None if it is not enabled """
+    pipe_conf = pipe_conf or {}
+    if not is_tracker_enabled(pipe_conf, enable):
+        return None
+    return IoUTracker(
+        iou_thres   = pipe_conf.get(IOU_THRES, DEFAULT_IOU),
+        max_age     = pipe_conf.get(MAX_AGE, DEFAULT_MAX_AGE) )
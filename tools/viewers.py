@@ -0,0 +1,110 @@
+import time, json, logging, threading
+from urllib.request import urlopen
+
+# Define Key of the statistic
+LEASES      = "leases"
+READERS     = "readers"
+WATCHED     = "watched"
+PROBE       = "probe"
+
+# Define Key of the RTSP server API
+ITEMS       = "items"
+NAME        = "name"
+
+DEFAULT_LEASE   = 5         # seconds, the viewer has to touch the lease again before it expired
+PROBE_INTERVAL  = 2         # seconds
+PROBE_TIMEOUT   = 1
+
+
+class ViewerRegistry():
+    """ Track the viewers of the output of each task, the task only renders and encodes while someone is watching.
+
+    Two kinds of viewers are counted:
+        1. The readers of rtsp://.../<uuid>, polled from the API of the local RTSP server ( rtsp-simple-server / mediamtx ),
+           the WebRTC player is one reader since it is relayed from the RTSP stream.
+        2. The leases of the other endpoints, e.g. snapshot, which are taken by `touch` and expired after `lease` seconds.
+    If the RTSP server API is not available, the RTSP stream is treated as watched.
+
+    - Arguments
+        - probe_url
+            - type: str
+            - desc: the API to list the paths of the RTSP server, e.g. http://localhost:9997/v1/paths/list,
+                    None means only the leases are counted
+        - lease
+            - type: float
+            - desc: seconds
+    """
+    def __init__(self, probe_url=None, lease=DEFAULT_LEASE) -> None:
+
+        self.probe_url  = probe_url
+        self.lease      = float(lease)
+        self.lock       = threading.Lock()
+        self.leases     = dict()
+        self.readers    = dict() if probe_url is None else None
+        self.t_probe    = 0
+        self.worker     = None
+
+    def touch(self, task_uuid, viewer):
+        """ Take or extend the lease of the viewer """
+        with self.lock:
+            self.leases.setdefault(task_uuid, dict())[viewer] = time.time() + self.lease
+
+    def release(self, task_uuid, viewer):
+        with self.lock:
+            self.leases.get(task_uuid, {}).pop(viewer, None)
+
+    def get_leases(self, task_uuid) -> int:
+        """ Return the number of the leases which are not expired """
+        t_now = time.time()
+        with self.lock:
+            leases = self.leases.get(task_uuid, {})
+            for viewer in [ viewer for viewer, t_expire in leases.items() if t_expire < t_now ]:
+                leases.pop(viewer)
+            return len(leases)
+
+    @staticmethod
+    def parse_readers(data) -> dict:
+        """ Return the number of readers of each path, support the list and the dictionary of items """
+        items = data.get(ITEMS) or {}
+        if isinstance(items, dict):
+            items = [ dict(item, **{ NAME: name }) for name, item in items.items() ]
+        return { item.get(NAME): len(item.get(READERS) or []) for item in items }
+
+    def probe_thread(self):
+        logging.info('Start to probe the viewers of RTSP server ({})'.format(self.probe_url))
+        while True:
+            try:
+                with urlopen(self.probe_url, timeout=PROBE_TIMEOUT) as resp:
+                    readers = self.parse_readers(json.loads(resp.read()))
+            except Exception as e:
+                if self.readers is not None:
+                    logging.warning('Could not probe the viewers of RTSP server ({})'.format(e))
+                readers = None
+
+            with self.lock:
+                self.readers = readers
+                self.t_probe = time.time()
+            time.sleep(PROBE_INTERVAL)
+
+    def get_readers(self, task_uuid):
+        """ Return the number of RTSP readers of the task, None if it is unknown """
+        if (self.probe_url is not None) and (self.worker is None):
+            with self.lock:
+                if self.worker is None:
+                    self.worker = threading.Thread(target=self.probe_thread, daemon=True)
+                    self.worker.start()
+
+        readers = self.readers
+        return None if readers is None else readers.get(task_uuid, 0)
+
+    def is_watched(self, task_uuid) -> bool:
+        readers = self.get_readers(task_uuid)
+        return (readers is None) or (readers > 0) or (self.get_leases(task_uuid) > 0)
+
+    def get_stats(self, task_uuid) -> dict:
+        return {
+            WATCHED : self.is_watched(task_uuid),
+            READERS : self.get_readers(task_uuid),
+            LEASES  : self.get_leases(task_uuid),
+            PROBE   : self.probe_url
+        }
@@ -0,0 +1,441 @@
+import time, queue, logging, threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+
+from .runner import StreamRunner, init_application
+from .rtsp import RtspWritter, OutputWriter, Substream, is_substream_enabled, any_watched
+from .rtsp import SUB_PATH, SUB_SCALE, SUB_BITRATE, SUBSTREAM
+from .encoder import get_encoder, BITRATE
+from .mjpeg import MjpegRelay
+from .common import json_exception
+
+# Define Key of the report message
+ERROR       = "error"
+STATUS      = "status"
+STOP        = "stop"
+PERF        = "perf"
+DROPPED     = "dropped"
+
+# Define Key of the worker options
+QUEUE_SIZE      = "queue_size"
+DROP_POLICY     = "drop_policy"
+DRAW_POOL_SIZE  = "draw_pool_size"
+PACING          = "pacing"
+SRC_FPS         = "src_fps"
+PIPELINE        = "pipeline"
+APPLICATION     = "application"
+STRIDE          = "stride"
+MAX_STRIDE      = "max_stride"
+TRACKER         = "tracker"
+ROI             = "roi"
+TILING          = "tiling"
+RTSP_QUEUE      = "rtsp_queue_size"
+RTSP_POLICY     = "rtsp_drop_policy"
+ENCODER         = "encoder"
+CPU_LIMIT       = "cpu_limit"
+MJPEG_QUALITY   = "MJPEG_QUALITY"
+
+REPORT_INTERVAL     = 0.2
+FIRST_FRAME_TIMEOUT = 10
+STOP_TIMEOUT        = 5
+JPEG_QUEUE_SIZE     = 2         # the JPEG which could not be passed to the main process is dropped
+
+
+class SharedSlotPool():
+    """ Return the slot of shared memory to the feeder when the frame is released in the worker process """
+
+    def __init__(self, free_queue) -> None:
+        self.cond       = threading.Condition()
+        self.free_queue = free_queue
+
+    def recycle(self, buf):
+        with self.cond:
+            buf.refs -= 1
+            if buf.refs == 0:
+                self.free_queue.put(buf.slot)
+
+
+class SharedSlotBuffer():
+    """ FrameBuffer which is a view of one slot of the shared memory """
+
+    def __init__(self, pool, slot, array) -> None:
+        self.pool   = pool
+        self.slot   = slot
+        self.array  = array
+        self.refs   = 1
+
+    def retain(self):
+        with self.pool.cond:
+            self.refs += 1
+        return self
+
+    def release(self):
+        self.pool.recycle(self)
+
+    @property
+    def shape(self):
+        return self.array.shape
+
+
+class SharedFrameReader():
+    """ The reader of StreamRunner in the worker process, read the frame from the shared memory slot """
+
+    def __init__(self, frames, ready_queue, free_queue) -> None:
+        self.frames         = frames
+        self.ready_queue    = ready_queue
+        self.pool           = SharedSlotPool(free_queue)
+        self.reloaded       = False
+
+    def read(self, timeout=1.0):
+        try:
+            slot, reloaded = self.ready_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        self.reloaded = self.reloaded or reloaded
+        return SharedSlotBuffer(self.pool, slot, self.frames[slot])
+
+    def is_reloaded(self) -> bool:
+        reloaded, self.reloaded = self.reloaded, False
+        return reloaded
+
+
+def process_stream(task_uuid, model_conf, af, platform, app_dir, start_time,
+                   shm_name, shape, dtype, ready_queue, free_queue, report_queue, stop_event, watched, sub_watched, headless, mjpeg_active, jpeg_queue, options):
+    """ The entrance of the worker process: load model and application, then run the stream pipeline.
+    The status is sent back through `report_queue` and merged in every REPORT_INTERVAL. """
+
+    # The report is called by the stages and the main loop, so the pending message is guarded
+    pending, t_report, report_lock = dict(), 0, threading.Lock()
+
+    def report(mesg):
+        nonlocal t_report
+        with report_lock:
+            pending.update(mesg)
+            if time.time() - t_report < REPORT_INTERVAL:
+                return
+            mesg = dict(pending)
+            pending.clear()
+            t_report = time.time()
+        report_queue.put(mesg)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    trg, writer = None, None
+
+    try:
+        from ..ai.get_api import get_api
+
+        # The model keeps sync mode, StreamRunner overlaps the inference with the capture
+        trg = get_api(af)(model_conf)
+        pipe_conf = model_conf.get(PIPELINE, {})
+
+        application = init_application(model_conf, app_dir)
+
+        # The caps of the pipeline take an integer FPS
+        out_fps = max(1, int(round(options[SRC_FPS])))
+
+        # The substream is resized from the rendered frame, it has its own bitrate
+        is_watched = watched.is_set if watched is not None else None
+        is_sub_watched, substream = None, None
+        if is_substream_enabled(pipe_conf, options[SUBSTREAM]):
+            is_sub_watched  = sub_watched.is_set if sub_watched is not None else None
+            sub_conf        = dict(pipe_conf, **{ BITRATE: pipe_conf.get(SUB_BITRATE, options[SUB_BITRATE]) })
+            substream = Substream(
+                factory = lambda wid, hei: RtspWritter( task_uuid = task_uuid,
+                    platform = platform,
+                    src_hei = hei,
+                    src_wid = wid,
+                    src_fps = out_fps,
+                    queue_size = options[RTSP_QUEUE],
+                    policy = options[RTSP_POLICY],
+                    encoder = get_encoder(sub_conf, wid, hei, out_fps, 
+                        mode = options[ENCODER], cpu_limit = options[CPU_LIMIT], platform = platform),
+                    path = SUB_PATH ),
+                scale = pipe_conf.get(SUB_SCALE, options[SUB_SCALE]),
+                is_watched = is_sub_watched )
+
+        # The JPEG is encoded here and passed to the broadcaster of the main process
+        mjpeg = MjpegRelay(jpeg_queue, mjpeg_active.is_set, options[MJPEG_QUALITY]) if jpeg_queue is not None else None
+
+        writer = OutputWriter(
+            factory = lambda: RtspWritter( task_uuid = task_uuid,
+                platform = platform,
+                src_hei = shape[1],
+                src_wid = shape[2],
+                src_fps = out_fps,
+                queue_size = options[RTSP_QUEUE],
+                policy = options[RTSP_POLICY],
+                encoder = get_encoder(pipe_conf, shape[2], shape[1], out_fps, 
+                    mode = options[ENCODER], cpu_limit = options[CPU_LIMIT], platform = platform) ),
+            is_headless = headless.is_set,
+            is_watched = is_watched,
+            substream = substream,
+            mjpeg = mjpeg )
+
+        runner = StreamRunner(
+            trg             = trg,
+            application     = application,
+            reader          = SharedFrameReader(frames, ready_queue, free_queue),
+            writer          = writer,
+            report          = report,
+            start_time      = start_time,
+            pipe_conf       = model_conf.get(PIPELINE),
+            queue_size      = options[QUEUE_SIZE],
+            drop_policy     = options[DROP_POLICY],
+            draw_pool_size  = options[DRAW_POOL_SIZE],
+            pacing          = options[PACING],
+            src_fps         = options[SRC_FPS],
+            app_conf        = model_conf.get(APPLICATION),
+            stride          = options[STRIDE],
+            max_stride      = options[MAX_STRIDE],
+            tracker         = options[TRACKER],
+            roi             = options[ROI],
+            tiling          = options[TILING],
+            is_watched      = any_watched(is_watched, is_sub_watched, 
+                                mjpeg_active.is_set if jpeg_queue is not None else None) )
+
+        runner.run(keep_running = lambda: not stop_event.is_set())
+
+    except Exception as e:
+        logging.exception(e)
+        with report_lock:
+            pending[ERROR] = json_exception(e)
+
+    finally:
+        with report_lock:
+            pending[STATUS] = STOP
+            mesg = dict(pending)
+        report_queue.put(mesg)
+
+        if trg is not None: trg.release()
+        if writer is not None: writer.release()
+
+        # The memory is unmapped when the process exits if any view still exists
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+class TaskProcess():
+    """ Run the AI task in a worker process to escape the GIL.
+
+    It has the same interface with threading.Thread ( start, is_alive, join ),
+    so it could be kept in app.config["TASK"][uuid]["stream"].
+    The frames from the source hub are copied into shared memory slots by a feeder thread,
+    and the report of the worker process is passed to `on_report` by a relay thread.
+
+    - Arguments
+        - task_uuid
+        - hub
+            - type: SourceHub
+        - model_conf
+            - type: dict
+        - af
+            - type: str
+            - desc: AI framework
+        - platform, app_dir, start_time
+        - keep_running
+            - type: function
+            - desc: the feeder stops when it returns False
+        - on_report
+            - type: function
+            - desc: receive the report dictionary from the worker process
+        - on_exit
+            - type: function
+            - desc: called when the worker process stopped
+        - read_mode
+            - type: str
+            - desc: the read mode of the source hub
+        - slots
+            - type: int
+            - desc: the number of frames in the shared memory
+        - method
+            - type: str
+            - desc: the start method of multiprocessing, "spawn" or "forkserver", 
+                    "fork" copies the locks of the other threads of the web service
+        - is_watched
+            - type: function
+            - desc: return True if someone is watching the output, it is passed to the worker process by the feeder
+        - is_sub_watched
+            - type: function
+            - desc: return True if someone is watching the substream, it is passed to the worker process by the feeder
+        - is_headless
+            - type: function
+            - desc: return True if the task has no video output, it is passed to the worker process by the feeder
+        - mjpeg
+            - type: MjpegBroadcaster
+            - desc: publish the JPEG which is encoded by the worker process while it has clients
+        - options
+            - type: dict
+            - desc: the default options of StreamRunner
+    """
+    def __init__(self, task_uuid, hub, model_conf, af, platform, app_dir, start_time,
+                 keep_running, on_report, on_exit, read_mode="latest", slots=4, method="spawn", 
+                 is_watched=None, is_sub_watched=None, is_headless=None, mjpeg=None, options=None) -> None:
+
+        self.task_uuid      = task_uuid
+        self.hub            = hub
+        self.model_conf     = model_conf
+        self.af             = af
+        self.platform       = platform
+        self.app_dir        = app_dir
+        self.start_time     = start_time
+        self.keep_running   = keep_running
+        self.on_report      = on_report
+        self.on_exit        = on_exit
+        self.read_mode      = read_mode
+        self.slots          = max(2, int(slots))
+        self.options        = options if options else dict()
+        self.is_watched     = is_watched
+        self.is_sub_watched = is_sub_watched
+        self.is_headless    = is_headless
+        self.mjpeg          = mjpeg
+        self.dropped        = 0
+
+        self.ctx            = mp.get_context(method)
+        self.stop_event     = self.ctx.Event()
+        self.ready_queue    = self.ctx.Queue()
+        self.free_queue     = self.ctx.Queue()
+        self.report_queue   = self.ctx.Queue()
+        self.watched        = self.ctx.Event() if is_watched is not None else None
+        self.sub_watched    = self.ctx.Event() if is_sub_watched is not None else None
+        self.headless       = self.ctx.Event()
+        self.mjpeg_active   = self.ctx.Event()
+        self.jpeg_queue     = self.ctx.Queue(JPEG_QUEUE_SIZE) if mjpeg is not None else None
+
+        self.sub, self.shm, self.frames, self.proc = None, None, None, None
+        self.shm_lock = threading.Lock()
+        self.feeder = threading.Thread( target=self.feed_thread, daemon=True )
+        self.relay  = threading.Thread( target=self.relay_thread, daemon=True )
+        self.jpeg_relay = threading.Thread( target=self.jpeg_thread, daemon=True )
+
+    def start(self):
+
+        # Get the first frame to allocate the shared memory
+        self.sub = self.hub.subscribe(self.task_uuid, self.read_mode)
+        buf = self.sub.read(timeout=FIRST_FRAME_TIMEOUT)
+        if buf is None:
+            self.hub.unsubscribe(self.task_uuid)
+            raise RuntimeError('Could not get the first frame from source')
+        shape, dtype = (self.slots, ) + buf.shape, buf.array.dtype
+        buf.release()
+
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+        self.frames = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        [ self.free_queue.put(slot) for slot in range(self.slots) ]
+
+        self.proc = self.ctx.Process(
+            target  = process_stream,
+            args    = ( self.task_uuid, self.model_conf, self.af, self.platform, self.app_dir, self.start_time,
+                        self.shm.name, shape, dtype, self.ready_queue, self.free_queue, self.report_queue,
+                        self.stop_event, self.watched, self.sub_watched, self.headless, 
+                        self.mjpeg_active, self.jpeg_queue, self.options ),
+            name    = f"{self.task_uuid}",
+            daemon  = True )
+        self.proc.start()
+        logging.info('Start the worker process of the task ( {}, pid: {} )'.format(self.task_uuid, self.proc.pid))
+
+        self.feeder.start()
+        self.relay.start()
+        if self.mjpeg is not None:
+            self.jpeg_relay.start()
+
+    def feed_thread(self):
+        """ Copy the frame from source hub into the free slot of shared memory """
+        reloaded = False
+        try:
+            while(self.keep_running() and self.proc.is_alive() and not self.stop_event.is_set()):
+
+                reloaded = reloaded or self.sub.is_reloaded()
+                if self.watched is not None:
+                    self.watched.set() if self.is_watched() else self.watched.clear()
+                if self.sub_watched is not None:
+                    self.sub_watched.set() if self.is_sub_watched() else self.sub_watched.clear()
+                if self.is_headless is not None:
+                    self.headless.set() if self.is_headless() else self.headless.clear()
+                if self.mjpeg is not None:
+                    self.mjpeg_active.set() if self.mjpeg.has_clients() else self.mjpeg_active.clear()
+                buf = self.sub.read(timeout=0.5)
+                if buf is None: continue
+
+                # Drop the frame if the worker process is busy
+                try:
+                    slot = self.free_queue.get_nowait()
+                except queue.Empty:
+                    buf.release()
+                    self.dropped += 1
+                    continue
+
+                if buf.shape == self.frames[slot].shape:
+                    np.copyto(self.frames[slot], buf.array)
+                else:
+                    cv2.resize(buf.array, self.frames[slot].shape[1::-1], dst=self.frames[slot])
+                buf.release()
+
+                self.ready_queue.put((slot, reloaded))
+                reloaded = False
+
+        except Exception as e:
+            logging.exception(e)
+            self.on_report({ ERROR: json_exception(e) })
+
+        finally:
+            self.stop_event.set()
+            self.hub.unsubscribe(self.task_uuid)
+
+    def relay_thread(self):
+        """ Pass the report of the worker process to `on_report` """
+        while True:
+            try:
+                mesg = self.report_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.proc.is_alive(): continue
+                break
+
+            if PERF in mesg:
+                mesg[PERF][DROPPED] = self.dropped
+            self.on_report(mesg)
+            if mesg.get(STATUS) == STOP:
+                break
+
+        self.join()
+        self.on_exit()
+
+    def jpeg_thread(self):
+        """ Pass the JPEG of the worker process to the MJPEG broadcaster """
+        while True:
+            try:
+                jpeg = self.jpeg_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.proc.is_alive(): continue
+                break
+            self.mjpeg.publish_jpeg(jpeg)
+
+    def is_alive(self) -> bool:
+        return (self.proc is not None) and self.proc.is_alive()
+
+    def join(self, timeout=None):
+        """ Stop the worker process and release the shared memory """
+        self.stop_event.set()
+
+        if self.proc is not None:
+            self.proc.join(STOP_TIMEOUT if timeout is None else timeout)
+            if self.proc.is_alive():
+                logging.warning('Terminate the worker process ( {} )'.format(self.proc.pid))
+                self.proc.terminate()
+                self.proc.join()
+
+        for thread in [ self.feeder, self.relay, self.jpeg_relay ]:
+            if thread.is_alive() and threading.current_thread() is not thread:
+                thread.join()
+
+        with self.shm_lock:
+            if self.shm is not None:
+                self.frames = None
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = None